@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+
+from PublicInspectionArcGIS.SqliteDataAccess import OID_FIELD
+from PublicInspectionArcGIS.QueryMetrics import QueryMetrics
+from PublicInspectionArcGIS.CalculateBoundaries import CalculateBoundaries
+from PublicInspectionArcGIS.CaptureSignature import CaptureSignatures
+from PublicInspectionArcGIS.CalculateCertificate import CalculateCertificate
+from PublicInspectionArcGIS.CalculateDashboard import CalculateDashboard
+
+from PIL import Image
+
+SIGNATURE_SAMPLE = 200
+CERTIFICATE_SAMPLE = 50
+BOUNDARY_WORKERS = 2
+MISSING_APPROVALS_EVERY = 10
+CERTIFICATE_IMAGES = ["logo.png", "Mapa.png"]
+
+class RolledBack :
+    """Edit session whose changes are discarded, so write paths can be measured without altering the cached database."""
+
+    def __init__(self, da) :
+        self.da = da
+
+    def __enter__(self) :
+        self.da._startEditing()
+        return self.da
+
+    def __exit__(self, exc_type, exc_value, traceback) :
+        self.da._stopEditing(save_changes=False)
+
+def write_image(path) :
+    Image.new("RGB", (4, 4), "white").save(path)
+
+class Benchmarks :
+    """Runs the tool classes' own methods on a SqliteDataAccess, with the Shapely geometry engine in place of arcpy."""
+
+    def __init__(self, configuration, da) :
+        self.configuration = configuration
+        self.da = da
+
+    def key(self, name) :
+        return self.configuration.getConfigKey(name)
+
+    @contextmanager
+    def tool(self, tool_class, **kwargs) :
+        with tempfile.TemporaryDirectory() as folder :
+            yield tool_class(self.configuration, da=self.da, folder=folder, **kwargs)
+
+    def set_boundaries(self, workers = 1, use_topology = False) :
+        with self.tool(CalculateBoundaries) as tool, RolledBack(self.da) :
+            tool.workers = workers
+            tool.use_topology = use_topology
+            tool.set_boundaries()
+            return {
+                "boundaries": len(self.da.search(self.key("BOUNDARY_NAME"), [self.key("BOUNDARY_ID_FIELD")])),
+                "anchors": len(self.da.search(self.key("POINTS_NAME"), [self.key("POINTS_ID_FIELD")], "{} = 'Anchor'".format(self.key("POINTS_TYPE_FIELD"))))
+            }
+
+    def boundaries(self) :
+        return self.set_boundaries()
+
+    def topology(self) :
+        return self.set_boundaries(use_topology=True)
+
+    def parallel(self) :
+        return self.set_boundaries(workers=BOUNDARY_WORKERS)
+
+    def signatures(self) :
+        parties = self.da.search(self.key("PARTY_NAME"), [self.key("PARTY_ID_FIELD"), self.key("RIGHT_FK_FIELD")])
+        rights = {r[self.key("RIGHT_ID_FIELD")]: r[self.key("SPATIAL_UNIT_FK_FIELD")]
+            for r in self.da.search(self.key("RIGHT_NAME"), [self.key("RIGHT_ID_FIELD"), self.key("SPATIAL_UNIT_FK_FIELD")])}
+        step = max(1, len(parties) // SIGNATURE_SAMPLE)
+
+        approvals = 0
+        with self.tool(CaptureSignatures) as tool, RolledBack(self.da) :
+            tool.neighboring_approvals = []
+            for party in parties[::step][:SIGNATURE_SAMPLE] :
+                tool.spatialunit = {self.key("SPATIAL_UNIT_ID_FIELD"): rights.get(party[self.key("RIGHT_FK_FIELD")])}
+                party_approvals = tool.get_party_approvals(party[self.key("PARTY_ID_FIELD")])
+                if party_approvals :
+                    tool.approve_party(party_approvals)
+                    approvals += len(party_approvals)
+            return dict(tool.da.stats(), approvals=approvals)
+
+    def certificates(self) :
+        with self.tool(CalculateCertificate) as tool :
+            legal_ids = tool.get_approved_legal_ids()
+            if not legal_ids :
+                legal_ids = [su[self.key("SPATIAL_UNIT_LEGAL_ID_FIELD")] for su in tool.get_spatialunits(fields=[self.key("SPATIAL_UNIT_LEGAL_ID_FIELD")])]
+            certificates = tool.get_certificates(legal_ids)
+
+            sample = certificates[:CERTIFICATE_SAMPLE]
+            for path in (tool.image_path, tool.signatures_path, tool.certificates_path) :
+                os.makedirs(path)
+            for name in CERTIFICATE_IMAGES :
+                write_image(os.path.join(tool.image_path, name))
+            for party_id in set([c["party"]["id"] for c in sample] + [n["party_id"] for c in sample for n in c["neighbors"]]) :
+                write_image(os.path.join(tool.signatures_path, "{}.png".format(party_id)))
+
+            timings = tool.render_certificates(sample)
+            return {
+                "certificates": len(certificates),
+                "neighbors": sum(len(c["neighbors"]) for c in certificates),
+                "rendered": sum(1 for legal_id, seconds, error in timings if not error)
+            }
+
+    def dashboard(self) :
+        with self.tool(CalculateDashboard) as tool :
+            statistics = tool.get_statistics()
+            return {"surveyed": statistics["surveyed"], "boundaries": statistics["boundaries"]}
+
+    def approvals(self) :
+        with self.tool(CalculateBoundaries) as tool, RolledBack(self.da) :
+            self.da._deleteRows(self.key("APPROVAL_NAME"), "{} % {} = 0".format(OID_FIELD, MISSING_APPROVALS_EVERY))
+            return tool.set_approvals()
+
+BENCHMARKS = ["boundaries", "topology", "parallel", "signatures", "certificates", "dashboard", "approvals"]
+
+def peak_memory(function) :
+    tracemalloc.start()
+    try :
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally :
+        tracemalloc.stop()
+
+def run(benchmarks, name, trace_memory = True) :
+    function = getattr(benchmarks, name)
+    QueryMetrics.begin(name)
+    started = time.perf_counter()
+    try :
+        details = function()
+    finally :
+        seconds = time.perf_counter() - started
+        metrics = QueryMetrics.end()
+
+    totals = metrics.toDict()
+    return {
+        "benchmark": name,
+        "seconds": seconds,
+        "peak_kib": peak_memory(function) / 1024.0 if trace_memory else None,
+        "cursors": totals["cursors"],
+        "rows": totals["rows"],
+        "details": details
+    }
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+import struct
+import uuid
+from datetime import datetime
+
+from PublicInspectionArcGIS.SqliteDataAccess import SqliteDataAccess
+
+GRID_LAYOUT = "grid"
+VORONOI_LAYOUT = "voronoi"
+LAYOUTS = [GRID_LAYOUT, VORONOI_LAYOUT]
+
+CELL_SIZE = 100.0
+ORIGIN = (500000.0, 1000000.0)
+JITTER = 0.4
+NEIGHBOR_CELLS = 2
+MIN_EDGE_LENGTH = 1e-6
+POINT_DECIMALS = 6
+SRS_ID = 3116
+SCHEMA_VERSION = 2
+
+FIRST_NAMES = ["Ana", "Luis", "Maria", "Jose", "Carmen", "Pedro", "Lucia", "Jorge", "Rosa", "Diego"]
+LAST_NAMES = ["Garcia", "Rodriguez", "Martinez", "Lopez", "Gomez", "Diaz", "Torres", "Rojas", "Vargas", "Castro"]
+GENDERS = ["Male", "Female"]
+APPROVAL_VALUES = ["Yes", "Yes", "Yes", "No", "No Processed"]
+
+def polygon_wkb(rings) :
+    parts = [struct.pack("<BII", 1, 3, len(rings))]
+    for ring in rings :
+        parts.append(struct.pack("<I", len(ring)))
+        parts.extend(struct.pack("<dd", x, y) for x, y in ring)
+    return b"".join(parts)
+
+def linestring_wkb(path) :
+    return struct.pack("<BII", 1, 2, len(path)) + b"".join(struct.pack("<dd", x, y) for x, y in path)
+
+def multilinestring_wkb(paths) :
+    return struct.pack("<BII", 1, 5, len(paths)) + b"".join(linestring_wkb(path) for path in paths)
+
+def point_wkb(x, y) :
+    return struct.pack("<BIdd", 1, 1, x, y)
+
+def polygon_rings(wkb) :
+    wkb = bytes(wkb)
+    ring_count, = struct.unpack_from("<I", wkb, 5)
+    offset = 9
+    rings = []
+    for _ in range(ring_count) :
+        point_count, = struct.unpack_from("<I", wkb, offset)
+        offset += 4
+        values = struct.unpack_from("<{}d".format(2 * point_count), wkb, offset)
+        offset += 16 * point_count
+        rings.append(list(zip(values[0::2], values[1::2])))
+    return rings
+
+def ring_area(ring) :
+    return abs(sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:]))) / 2.0
+
+def clip(polygon, site, other, label) :
+    sx, sy = site
+    ox, oy = other
+    nx, ny = ox - sx, oy - sy
+    offset = ((ox * ox + oy * oy) - (sx * sx + sy * sy)) / 2.0
+
+    def side(point) :
+        return point[0] * nx + point[1] * ny - offset
+
+    clipped = []
+    for index, (point, edge_label) in enumerate(polygon) :
+        next_point = polygon[(index + 1) % len(polygon)][0]
+        d0, d1 = side(point), side(next_point)
+        if d0 <= 0 :
+            clipped.append((point, edge_label))
+            if d1 > 0 :
+                t = d0 / (d0 - d1)
+                clipped.append(((point[0] + t * (next_point[0] - point[0]), point[1] + t * (next_point[1] - point[1])), label))
+        elif d1 <= 0 :
+            t = d0 / (d0 - d1)
+            clipped.append(((point[0] + t * (next_point[0] - point[0]), point[1] + t * (next_point[1] - point[1])), edge_label))
+    return clipped
+
+class SyntheticData :
+    """Deterministic parcel layouts written to a SqliteDataAccess with the config.json schema.
+
+    Each unit is a labelled polygon, a list of (vertex, label) where label is the neighbouring unit
+    that shares the edge starting at that vertex, or None on the outer border of the layout."""
+
+    def __init__(self, configuration, layout = GRID_LAYOUT, seed = 1) :
+        if layout not in LAYOUTS :
+            raise ValueError("Unknown layout '{}'".format(layout))
+        self.configuration = configuration
+        self.layout = layout
+        self.seed = seed
+        self.random = random.Random(seed)
+
+    def key(self, name) :
+        return self.configuration.getConfigKey(name)
+
+    def global_id(self) :
+        return "{{{}}}".format(str(uuid.UUID(int=self.random.getrandbits(128), version=4)).upper())
+
+    @staticmethod
+    def dimensions(count) :
+        columns = int(math.ceil(math.sqrt(count)))
+        return columns, int(math.ceil(count / float(columns)))
+
+    def grid_units(self, count) :
+        columns, rows = SyntheticData.dimensions(count)
+        x0, y0 = ORIGIN
+        units = []
+        for index in range(count) :
+            column, row = index % columns, index // columns
+
+            def neighbor(c, r) :
+                other = r * columns + c
+                return other if 0 <= c < columns and 0 <= r < rows and other < count else None
+
+            xmin, ymin = x0 + column * CELL_SIZE, y0 + row * CELL_SIZE
+            xmax, ymax = xmin + CELL_SIZE, ymin + CELL_SIZE
+            units.append([
+                ((xmin, ymin), neighbor(column, row - 1)),
+                ((xmax, ymin), neighbor(column + 1, row)),
+                ((xmax, ymax), neighbor(column, row + 1)),
+                ((xmin, ymax), neighbor(column - 1, row))
+            ])
+        return units
+
+    def voronoi_units(self, count) :
+        columns, rows = SyntheticData.dimensions(count)
+        x0, y0 = ORIGIN
+        sites = []
+        for index in range(count) :
+            column, row = index % columns, index // columns
+            sites.append((
+                x0 + (column + 0.5 + self.random.uniform(-JITTER, JITTER)) * CELL_SIZE,
+                y0 + (row + 0.5 + self.random.uniform(-JITTER, JITTER)) * CELL_SIZE))
+
+        units = []
+        for index, site in enumerate(sites) :
+            column, row = index % columns, index // columns
+            last_row_columns = count - (rows - 1) * columns
+            xmax = x0 + columns * CELL_SIZE if row < rows - 2 or column < last_row_columns else x0 + last_row_columns * CELL_SIZE
+            polygon = [((x0, y0), None), ((x0 + columns * CELL_SIZE, y0), None), ((x0 + columns * CELL_SIZE, y0 + rows * CELL_SIZE), None), ((x0, y0 + rows * CELL_SIZE), None)]
+            for r in range(row - NEIGHBOR_CELLS, row + NEIGHBOR_CELLS + 1) :
+                for c in range(column - NEIGHBOR_CELLS, column + NEIGHBOR_CELLS + 1) :
+                    other = r * columns + c
+                    if 0 <= c < columns and 0 <= r < rows and other < count and other != index :
+                        polygon = clip(polygon, site, sites[other], other)
+            units.append([(point, label) for position, (point, label) in enumerate(polygon)
+                if math.dist(point, polygon[(position + 1) % len(polygon)][0]) > MIN_EDGE_LENGTH])
+        return SyntheticData.snap(units)
+
+    @staticmethod
+    def snap(units) :
+        vertices = {}
+        return [[(vertices.setdefault((round(x, POINT_DECIMALS), round(y, POINT_DECIMALS)), (x, y)), label) for (x, y), label in unit] for unit in units]
+
+    def units(self, count) :
+        return self.grid_units(count) if self.layout == GRID_LAYOUT else self.voronoi_units(count)
+
+    @staticmethod
+    def ring(unit) :
+        ring = [point for point, label in unit]
+        return ring + ring[:1]
+
+    @staticmethod
+    def edges(unit) :
+        for index, (point, label) in enumerate(unit) :
+            yield point, unit[(index + 1) % len(unit)][0], label
+
+    def create_tables(self, da) :
+        da.createTable(self.key("SPATIAL_UNIT_NAME"), [
+            (self.key("SPATIAL_UNIT_LEGAL_ID_FIELD"), "TEXT"),
+            (self.key("SPATIAL_UNIT_NAME_FIELD"), "TEXT"),
+            (self.key("SPATIAL_UNIT_SHAPE_AREA"), "DOUBLE")], "POLYGON", SRS_ID)
+        da.createTable(self.key("BOUNDARY_NAME"), [
+            (self.key("BOUNDARY_DESCRIPTION_FIELD"), "TEXT"),
+            (self.key("BOUNDARY_STATE_FIELD"), "TEXT")], "MULTILINESTRING", SRS_ID)
+        da.createTable(self.key("SPATIAL_UNIT_BOUNDARY_NAME"), [
+            (self.key("SPATIAL_UNIT_FK_FIELD"), "GUID"),
+            (self.key("BOUNDARY_FK_FIELD"), "GUID")])
+        da.createTable(self.key("RIGHT_NAME"), [
+            (self.key("SPATIAL_UNIT_FK_FIELD"), "GUID")])
+        da.createTable(self.key("PARTY_NAME"), [
+            (self.key("RIGHT_FK_FIELD"), "GUID"),
+            (self.key("PARTY_FIRST_NAME_FIELD"), "TEXT"),
+            (self.key("PARTY_LAST_NAME_FIELD"), "TEXT"),
+            (self.key("PARTY_ID_NUMBER_FIELD"), "TEXT"),
+            (self.key("PARTY_GENDER_FIELD"), "TEXT")])
+        da.createTable(self.key("APPROVAL_NAME"), [
+            (self.key("BOUNDARY_FK_FIELD"), "GUID"),
+            (self.key("PARTY_FK_FIELD"), "GUID"),
+            (self.key("APPROVAL_IS_APPROVED_FIELD"), "TEXT"),
+            (self.key("APPROVAL_DATE_FIELD"), "DATE")])
+        da.createTable(self.key("APPROVAL_SIGNATURE_NAME"), [
+            (self.key("APPROVAL_FK_FIELD"), "GUID")])
+        da.createTable(self.key("POINTS_NAME"), [
+            (self.key("POINTS_TYPE_FIELD"), "TEXT")], "POINT", SRS_ID)
+
+    @staticmethod
+    def boundary_state(values) :
+        if all(v == "No Processed" for v in values) :
+            return "No Processed"
+        if all(v == "Yes" for v in values) :
+            return "Approved"
+        if any(v == "No" for v in values) :
+            return "Rejected"
+        return "In Process"
+
+    def generate(self, database_path, count) :
+        da = SqliteDataAccess(database_path)
+        self.create_tables(da)
+        units = self.units(count)
+        spatialunit_ids = [self.global_id() for _ in units]
+
+        spatialunits = []
+        for index, unit in enumerate(units) :
+            ring = SyntheticData.ring(unit)
+            spatialunits.append((spatialunit_ids[index], "LID-{:07d}".format(index), "Predio {}".format(index), ring_area(ring), polygon_wkb([ring])))
+
+        rights = []
+        parties = []
+        parties_by_unit = []
+        for index in range(len(units)) :
+            right_id = self.global_id()
+            rights.append((right_id, spatialunit_ids[index]))
+            unit_parties = []
+            for _ in range(self.random.choice([1, 1, 2])) :
+                party_id = self.global_id()
+                unit_parties.append(party_id)
+                parties.append((party_id, right_id, self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES),
+                    "{:010d}".format(self.random.randrange(10 ** 9, 10 ** 10)), self.random.choice(GENDERS)))
+            parties_by_unit.append(unit_parties)
+
+        boundaries = []
+        links = []
+        approvals = []
+        approval_date = datetime(2024, 1, 1)
+
+        def add_boundary(wkb, owners) :
+            boundary_id = self.global_id()
+            values = []
+            for owner in owners :
+                links.append((self.global_id(), spatialunit_ids[owner], boundary_id))
+                for party_id in parties_by_unit[owner] :
+                    value = self.random.choice(APPROVAL_VALUES)
+                    values.append(value)
+                    approvals.append((self.global_id(), boundary_id, party_id, value, approval_date))
+            boundaries.append((boundary_id, "", SyntheticData.boundary_state(values), wkb))
+
+        for index, unit in enumerate(units) :
+            outer = []
+            for start, end, label in SyntheticData.edges(unit) :
+                if label is None :
+                    outer.append([start, end])
+                elif index < label :
+                    add_boundary(multilinestring_wkb([[start, end]]), [index, label])
+            if outer :
+                add_boundary(multilinestring_wkb(outer), [index])
+
+        vertices = {}
+        for unit in units :
+            for (x, y), label in unit :
+                vertices.setdefault((round(x, POINT_DECIMALS), round(y, POINT_DECIMALS)), (x, y))
+        points = [(self.global_id(), "Vertex", point_wkb(x, y)) for x, y in vertices.values()]
+
+        da.insert(self.key("SPATIAL_UNIT_NAME"), [self.key("SPATIAL_UNIT_ID_FIELD"), self.key("SPATIAL_UNIT_LEGAL_ID_FIELD"), self.key("SPATIAL_UNIT_NAME_FIELD"),
+            self.key("SPATIAL_UNIT_SHAPE_AREA"), "SHAPE@"], spatialunits)
+        da.insert(self.key("BOUNDARY_NAME"), [self.key("BOUNDARY_ID_FIELD"), self.key("BOUNDARY_DESCRIPTION_FIELD"),
+            self.key("BOUNDARY_STATE_FIELD"), "SHAPE@"], boundaries)
+        da.insert(self.key("SPATIAL_UNIT_BOUNDARY_NAME"), ["GlobalID", self.key("SPATIAL_UNIT_FK_FIELD"), self.key("BOUNDARY_FK_FIELD")], links)
+        da.insert(self.key("RIGHT_NAME"), [self.key("RIGHT_ID_FIELD"), self.key("SPATIAL_UNIT_FK_FIELD")], rights)
+        da.insert(self.key("PARTY_NAME"), [self.key("PARTY_ID_FIELD"), self.key("RIGHT_FK_FIELD"), self.key("PARTY_FIRST_NAME_FIELD"),
+            self.key("PARTY_LAST_NAME_FIELD"), self.key("PARTY_ID_NUMBER_FIELD"), self.key("PARTY_GENDER_FIELD")], parties)
+        da.insert(self.key("APPROVAL_NAME"), [self.key("APPROVAL_ID_FIELD"), self.key("BOUNDARY_FK_FIELD"), self.key("PARTY_FK_FIELD"),
+            self.key("APPROVAL_IS_APPROVED_FIELD"), self.key("APPROVAL_DATE_FIELD")], approvals)
+        da.insert(self.key("APPROVAL_SIGNATURE_NAME"), [self.key("APPROVAL_FK_FIELD")], [(approval[0],) for approval in approvals])
+        da.insert(self.key("POINTS_NAME"), [self.key("POINTS_ID_FIELD"), self.key("POINTS_TYPE_FIELD"), "SHAPE@"], points)
+
+        for table, column in [
+                (self.key("SPATIAL_UNIT_NAME"), self.key("SPATIAL_UNIT_LEGAL_ID_FIELD")),
+                (self.key("SPATIAL_UNIT_BOUNDARY_NAME"), self.key("SPATIAL_UNIT_FK_FIELD")),
+                (self.key("SPATIAL_UNIT_BOUNDARY_NAME"), self.key("BOUNDARY_FK_FIELD")),
+                (self.key("RIGHT_NAME"), self.key("SPATIAL_UNIT_FK_FIELD")),
+                (self.key("PARTY_NAME"), self.key("RIGHT_FK_FIELD")),
+                (self.key("APPROVAL_NAME"), self.key("BOUNDARY_FK_FIELD")),
+                (self.key("APPROVAL_NAME"), self.key("PARTY_FK_FIELD")),
+                (self.key("APPROVAL_SIGNATURE_NAME"), self.key("APPROVAL_FK_FIELD"))] :
+            da.connection.execute("CREATE INDEX IF NOT EXISTS \"idx_{0}_{1}\" ON \"{0}\" ({1})".format(table, column))
+        return da
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from PublicInspectionArcGIS.Utils import STREAM_HANDLER, ToolboxLogger, Configuration, JsonFile, TimeUtil
+from PublicInspectionArcGIS.SqliteDataAccess import SqliteDataAccess
+from PublicInspectionArcGIS.GeometryEngine import GeometryEngine, SHAPELY_ENGINE
+
+from benchmarks.SyntheticData import SyntheticData, LAYOUTS, GRID_LAYOUT, SCHEMA_VERSION
+from benchmarks.Benchmarks import Benchmarks, BENCHMARKS, run
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+
+def parse_arguments() :
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks the tool engines on synthetic parcel layouts.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Spatial unit counts")
+    parser.add_argument("--layout", choices=LAYOUTS, default=GRID_LAYOUT)
+    parser.add_argument("--bench", choices=BENCHMARKS, nargs="+", default=BENCHMARKS)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "publicinspection-benchmarks"), help="Folder for the generated databases")
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the second, tracemalloc-traced pass that measures peak memory")
+    parser.add_argument("--verbose", action="store_true", help="Show the tools' INFO messages")
+    return parser.parse_args()
+
+def database(configuration, arguments, size) :
+    if not os.path.exists(arguments.workdir) :
+        os.makedirs(arguments.workdir)
+    path = os.path.join(arguments.workdir, "{}_{}_{}_v{}.sqlite".format(arguments.layout, size, arguments.seed, SCHEMA_VERSION))
+    if os.path.exists(path) :
+        return path
+
+    if os.path.exists(path + ".tmp") :
+        os.remove(path + ".tmp")
+    timer = TimeUtil()
+    generated = SyntheticData(configuration, arguments.layout, arguments.seed).generate(path + ".tmp", size)
+    generated.close()
+    os.replace(path + ".tmp", path)
+    timer.stopTimer()
+    ToolboxLogger.info("Generated {} ({} units) in {}".format(path, size, timer.timeSpan))
+    return path
+
+def main() :
+    arguments = parse_arguments()
+    ToolboxLogger.initLogger(handler_type=STREAM_HANDLER)
+    ToolboxLogger.setInfoLevel()
+    configuration = Configuration(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "PublicInspectionArcGIS", "config.json"))
+
+    paths = [database(configuration, arguments, size) for size in arguments.sizes]
+    if not arguments.verbose :
+        ToolboxLogger.setWarningLevel()
+
+    results = []
+    print("{:<14}{:>8}{:>12}{:>14}{:>10}{:>12}".format("benchmark", "units", "seconds", "peak KiB", "cursors", "rows"))
+    for size, path in zip(arguments.sizes, paths) :
+        da = SqliteDataAccess(path, GeometryEngine.create(SHAPELY_ENGINE))
+        try :
+            for name in arguments.bench :
+                result = dict(run(Benchmarks(configuration, da), name, not arguments.no_memory), layout=arguments.layout, units=size, seed=arguments.seed)
+                results.append(result)
+                print("{:<14}{:>8}{:>12.3f}{:>14}{:>10}{:>12}".format(name, size, result["seconds"],
+                    "{:.0f}".format(result["peak_kib"]) if result["peak_kib"] is not None else "-", result["cursors"], result["rows"]))
+        finally :
+            da.close()
+
+    if arguments.output :
+        JsonFile.writeFile(arguments.output, results)
+
+if __name__ == "__main__" :
+    main()
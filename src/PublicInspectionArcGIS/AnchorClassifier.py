@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+try :
+    from scipy.spatial import cKDTree
+except ImportError :
+    cKDTree = None
+
+MAX_DISTANCE_CELLS = 4000000
+
+class AnchorClassifier :
+    """Marks points lying within tolerance of any boundary endpoint."""
+
+    def __init__(self, coordinates, tolerance, use_kdtree = True) :
+        self.points = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        self.tolerance = tolerance
+        self._endpoints = []
+        self._tree = cKDTree(self.points) if use_kdtree and cKDTree is not None and len(self.points) > 0 else None
+
+    def __len__(self) :
+        return len(self.points)
+
+    def add_endpoints(self, endpoints) :
+        self._endpoints.extend(endpoints)
+
+    def anchor_mask(self, endpoints = None) :
+        endpoints = np.asarray(self._endpoints if endpoints is None else endpoints, dtype=float).reshape(-1, 2)
+        mask = np.zeros(len(self.points), dtype=bool)
+        if len(self.points) == 0 or len(endpoints) == 0 :
+            return mask
+
+        if self._tree is not None :
+            for neighbors in self._tree.query_ball_point(endpoints, self.tolerance) :
+                mask[neighbors] = True
+            return mask
+
+        chunk_size = max(1, MAX_DISTANCE_CELLS // len(self.points))
+        tolerance2 = self.tolerance * self.tolerance
+        for start in range(0, len(endpoints), chunk_size) :
+            chunk = endpoints[start:start + chunk_size]
+            deltas = chunk[:, np.newaxis, :] - self.points[np.newaxis, :, :]
+            distances2 = np.einsum("ijk,ijk->ij", deltas, deltas)
+            mask |= (distances2 <= tolerance2).any(axis=0)
+        return mask
+
+    def anchors(self, endpoints = None) :
+        return np.flatnonzero(self.anchor_mask(endpoints)).tolist()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from PublicInspectionArcGIS.Utils import ToolboxLogger
+from PublicInspectionArcGIS.DataAccess import DataAccess
+
+class ApprovalReconciler :
+    """Adds the Approval and ApprovalSignature rows missing for the (boundary, party) pairs implied by
+    SpatialUnit_Boundary -> Right -> Party: one read per table, hash joins in memory, two batched inserts."""
+
+    def __init__(self, configuration, da) :
+        self.da = da
+        self.SPATIAL_UNIT_BOUNDARY_NAME = configuration.getConfigKey("SPATIAL_UNIT_BOUNDARY_NAME")
+        self.SPATIAL_UNIT_FK_FIELD = configuration.getConfigKey("SPATIAL_UNIT_FK_FIELD")
+        self.BOUNDARY_NAME = configuration.getConfigKey("BOUNDARY_NAME")
+        self.BOUNDARY_ID_FIELD = configuration.getConfigKey("BOUNDARY_ID_FIELD")
+        self.BOUNDARY_FK_FIELD = configuration.getConfigKey("BOUNDARY_FK_FIELD")
+        self.RIGHT_NAME = configuration.getConfigKey("RIGHT_NAME")
+        self.RIGHT_ID_FIELD = configuration.getConfigKey("RIGHT_ID_FIELD")
+        self.RIGHT_FK_FIELD = configuration.getConfigKey("RIGHT_FK_FIELD")
+        self.PARTY_NAME = configuration.getConfigKey("PARTY_NAME")
+        self.PARTY_ID_FIELD = configuration.getConfigKey("PARTY_ID_FIELD")
+        self.PARTY_FK_FIELD = configuration.getConfigKey("PARTY_FK_FIELD")
+        self.APPROVAL_NAME = configuration.getConfigKey("APPROVAL_NAME")
+        self.APPROVAL_ID_FIELD = configuration.getConfigKey("APPROVAL_ID_FIELD")
+        self.APPROVAL_FK_FIELD = configuration.getConfigKey("APPROVAL_FK_FIELD")
+        self.APPROVAL_SIGNATURE_NAME = configuration.getConfigKey("APPROVAL_SIGNATURE_NAME")
+
+    def search(self, table, fields, field = None, values = None) :
+        if values is None :
+            return self.da.search(table, fields) or []
+        values = list(dict.fromkeys(v for v in values if v is not None))
+        if not values :
+            return []
+        return self.da.search(table, fields, DataAccess.getWhereClause(field, values)) or []
+
+    def links(self, spatialunit_ids = None) :
+        links = self.search(self.SPATIAL_UNIT_BOUNDARY_NAME, [self.SPATIAL_UNIT_FK_FIELD, self.BOUNDARY_FK_FIELD], self.SPATIAL_UNIT_FK_FIELD, spatialunit_ids)
+        links = [(link[self.SPATIAL_UNIT_FK_FIELD], link[self.BOUNDARY_FK_FIELD]) for link in links]
+        boundaries_ids = [boundary_id for spatialunit_id, boundary_id in links] if spatialunit_ids is not None else None
+        boundaries = set(row[self.BOUNDARY_ID_FIELD] for row in self.search(self.BOUNDARY_NAME, [self.BOUNDARY_ID_FIELD], self.BOUNDARY_ID_FIELD, boundaries_ids))
+        return [(spatialunit_id, boundary_id) for spatialunit_id, boundary_id in links if boundary_id in boundaries]
+
+    def expected_pairs(self, links, scoped = True) :
+        rights_by_spatialunit = {}
+        spatialunits_ids = [spatialunit_id for spatialunit_id, boundary_id in links] if scoped else None
+        for right in self.search(self.RIGHT_NAME, [self.RIGHT_ID_FIELD, self.SPATIAL_UNIT_FK_FIELD], self.SPATIAL_UNIT_FK_FIELD, spatialunits_ids) :
+            rights_by_spatialunit.setdefault(right[self.SPATIAL_UNIT_FK_FIELD], []).append(right[self.RIGHT_ID_FIELD])
+
+        parties_by_right = {}
+        rights_ids = [right_id for rights in rights_by_spatialunit.values() for right_id in rights] if scoped else None
+        for party in self.search(self.PARTY_NAME, [self.PARTY_ID_FIELD, self.RIGHT_FK_FIELD], self.RIGHT_FK_FIELD, rights_ids) :
+            parties_by_right.setdefault(party[self.RIGHT_FK_FIELD], []).append(party[self.PARTY_ID_FIELD])
+
+        pairs = {}
+        for spatialunit_id, boundary_id in links :
+            for right_id in rights_by_spatialunit.get(spatialunit_id, []) :
+                for party_id in parties_by_right.get(right_id, []) :
+                    pairs[(boundary_id, party_id)] = None
+        return list(pairs)
+
+    def existing_pairs(self, boundaries_ids = None) :
+        approvals = self.search(self.APPROVAL_NAME, [self.BOUNDARY_FK_FIELD, self.PARTY_FK_FIELD], self.BOUNDARY_FK_FIELD, boundaries_ids)
+        return set((approval[self.BOUNDARY_FK_FIELD], approval[self.PARTY_FK_FIELD]) for approval in approvals)
+
+    def insert(self, pairs) :
+        if not pairs :
+            return []
+        with self.da.batch() as batch :
+            batch.insert(self.APPROVAL_NAME, [self.BOUNDARY_FK_FIELD, self.PARTY_FK_FIELD], pairs)
+            approvals = batch.flush().get(self.APPROVAL_NAME, [])
+            ToolboxLogger.debug("{} {}", self.APPROVAL_NAME, len(approvals))
+
+            values = [tuple([approval[self.APPROVAL_ID_FIELD]]) for approval in approvals]
+            batch.insert(self.APPROVAL_SIGNATURE_NAME, [self.APPROVAL_FK_FIELD], values)
+        return approvals
+
+    def reconcile(self, spatialunit_ids = None, links = None) :
+        scoped = spatialunit_ids is not None or links is not None
+        if links is None :
+            links = self.links(spatialunit_ids)
+        expected = self.expected_pairs(links, scoped)
+        present = self.existing_pairs([boundary_id for spatialunit_id, boundary_id in links] if scoped else None)
+        missing = [pair for pair in expected if pair not in present]
+        self.insert(missing)
+
+        counts = {"added": len(missing), "present": len(expected) - len(missing)}
+        ToolboxLogger.debug("Approvals added: {} already present: {}", counts["added"], counts["present"])
+        return counts
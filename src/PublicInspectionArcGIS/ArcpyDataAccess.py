@@ -1,46 +1,78 @@
 # -*- coding: utf-8 -*-
 import os
+import time
 import arcpy
+import numpy as np
 
 from arcpy import da
 from PublicInspectionArcGIS.Utils import ToolboxLogger
-from PublicInspectionArcGIS.DataAccess import DataAccess
+from PublicInspectionArcGIS.DataAccess import DataAccess, GEOGRAPHIC_METERS_PER_UNIT
+from PublicInspectionArcGIS.Row import Row
+from PublicInspectionArcGIS.ColumnFrame import ColumnFrame
+from PublicInspectionArcGIS.WorkspaceMetadata import WorkspaceMetadata
+from PublicInspectionArcGIS.QueryMetrics import QueryMetrics
+
+TABLE_FILE_EXTENSION = ".gdbtable"
+VERSION_CHECK_SECONDS = 1.0
+NUMPY_NULL_VALUES = {
+    "Double": np.nan,
+    "Single": np.nan,
+    "Integer": -1,
+    "SmallInteger": -1,
+    "OID": -1
+}
 
 class ArcpyDataAccess(DataAccess) :
     def __init__(self, workspace_path) :
         DataAccess.__init__(self)
         self.workspace_path = workspace_path
-        self.__catalog_list = []
-        self.__populate_catalog_list(self.workspace_path)
-    
-    def __populate_catalog_list(self, workspace) :
-        for d in arcpy.Describe(workspace).children :
-            if d.datatype == "FeatureDataset" :
-                catalog_sub_list = self.__populate_catalog_list(d.catalogPath)
-                self.__catalog_list += catalog_sub_list
-            else :
-                catalog_item = {}
-                catalog_item["name"] = d.name 
-                catalog_item["path"] = d.catalogPath
-                self.__catalog_list.append(catalog_item)
-        return self.__catalog_list
+        self._editor = None
+        self._edit_depth = 0
+        self._save_changes = True
+        self._field_indexes = {}
+        self._version = None
+        self._version_checked = None
+        self.metadata = WorkspaceMetadata.get(self.workspace_path)
 
     def findTablePath(self, name) :
-        items = [x for x in self.__catalog_list if x["name"] == name]
-        item = items[0] if items else None
-        return item["path"]
+        return self.metadata.findTablePath(name)
+
+    def workspaceVersion(self) :
+        """Latest modification time of the workspace's .gdbtable files, so lock files do not count as changes.
+        The folder is scanned at most once every VERSION_CHECK_SECONDS, and again after each edit session."""
+        now = time.monotonic()
+        if self._version_checked is not None and now - self._version_checked < VERSION_CHECK_SECONDS :
+            return self._version
+        try :
+            with os.scandir(self.workspace_path) as entries :
+                self._version = max((entry.stat().st_mtime for entry in entries if entry.name.endswith(TABLE_FILE_EXTENSION)), default=None)
+        except OSError :
+            self._version = None
+        self._version_checked = now
+        return self._version
+
+    def isGeographic(self, table) :
+        return arcpy.Describe(self.findTablePath(table)).spatialReference.type == "Geographic"
+
+    def metersPerUnit(self, table) :
+        spatial_reference = arcpy.Describe(self.findTablePath(table)).spatialReference
+        if spatial_reference.type == "Geographic" :
+            return GEOGRAPHIC_METERS_PER_UNIT
+        return spatial_reference.metersPerUnit
+
+    def _fieldIndex(self, cursor) :
+        fields = tuple(cursor.fields)
+        index = self._field_indexes.get(fields)
+        if index is None :
+            index = Row.fieldIndex(fields)
+            self._field_indexes[fields] = index
+        return index
 
     def _getValue(self, cursor, row, fieldName):
-        fields = tuple(f.lower() for f in cursor.fields)
-        index = fields.index(fieldName.lower())
-        if index > -1:
-            return row[index]
+        return row[self._fieldIndex(cursor)[fieldName.lower()]]
 
     def _setValue(self, cursor, row, fieldName, value):
-        fields = tuple(f.lower() for f in cursor.fields)
-        index = fields.index(fieldName.lower())
-        if index > -1:
-            row[index] = value
+        row[self._fieldIndex(cursor)[fieldName.lower()]] = value
     
     def query(self, table, fields="*", filter=None, geometry=False) :
         return self.search(table, fields, filter, geometry)
@@ -48,77 +80,171 @@ class ArcpyDataAccess(DataAccess) :
     def add(self, table, fields, values) : 
         return self.insert(table, fields, values)
 
+    def _searchChunked(self, table, fields, filter, geometry) :
+        """Runs an IN filter longer than MAX_IN_VALUES as one search per chunk and merges the chunks back into
+        OID order, the order a single search would have returned."""
+        if fields == "*" :
+            fields = ["*", "SHAPE@"] if geometry else ["*"]
+        elif isinstance(fields, str) :
+            fields = [fields]
+
+        registers = []
+        for clause in self.chunkInClause(filter) :
+            registers.extend(self.search(table, list(fields) + ["OID@"], clause) or [])
+        if not registers :
+            return registers
+
+        registers.sort(key=lambda row : row["OID@"])
+        row_type = Row.getType(table, registers[0].keys()[:-1])
+        return [row_type(row.values()[:-1]) for row in registers]
+
     def search(self, table, fields="*", filter=None, geometry=False) :
+        if self.splitInClause(filter) is not None :
+            return self._searchChunked(table, fields, filter, geometry)
+
         table_path = self.findTablePath(table)
         if(fields == "*" and geometry) :
             fields = ["*", "SHAPE@"]
         try:
+            measure = QueryMetrics.measure(table, "search", filter)
             if filter == None:
                 origin_cursor = da.SearchCursor(table_path, fields)
             else:
                 origin_cursor = da.SearchCursor(table_path, fields, filter)
+            measure.opened()
 
-            output_registers = []
-            fields = tuple(f for f in origin_cursor.fields)
-
-            for origin_register in origin_cursor:
-                output_register = {}
-                for f in origin_cursor.fields:
-                    index = fields.index(f)
-                    output_register[f] = origin_register[index]
-                output_registers.append(output_register)
+            row_type = Row.getType(table, origin_cursor.fields)
+            output_registers = [row_type(list(origin_register)) for origin_register in origin_cursor]
             
             del origin_cursor
+            measure.done(len(output_registers))
 
             return output_registers
         except Exception as e:
             ToolboxLogger.debug("ERROR: ---->{}".format(e))
 
-    def insert(self, table, fields, values) :
+    def iter_search(self, table, fields="*", filter=None, geometry=False, page_size=None) :
+        clauses = self.chunkInClause(filter)
+        if clauses is not None :
+            for clause in clauses :
+                yield from self.iter_search(table, fields, clause, geometry, page_size)
+            return
+
+        table_path = self.findTablePath(table)
+        if fields == "*" :
+            fields = ["*", "SHAPE@"] if geometry else ["*"]
+        elif isinstance(fields, str) :
+            fields = [fields]
+
+        if not page_size :
+            measure = QueryMetrics.measure(table, "iter_search", filter)
+            count = 0
+            try :
+                with da.SearchCursor(table_path, fields, filter) as cursor :
+                    measure.opened()
+                    row_type = Row.getType(table, cursor.fields)
+                    for row in cursor :
+                        count += 1
+                        yield row_type(list(row))
+            finally :
+                measure.done(count)
+            return
+
+        oid_field = self._getOIDField(table_path)
+        last_id = None
+        while True :
+            where = filter
+            if last_id is not None :
+                where = "({}) AND {} > {}".format(filter, oid_field, last_id) if filter else "{} > {}".format(oid_field, last_id)
+
+            count = 0
+            measure = QueryMetrics.measure(table, "iter_search", where)
+            try :
+                with da.SearchCursor(table_path, ["OID@"] + list(fields), where, sql_clause=(None, "ORDER BY {}".format(oid_field))) as cursor :
+                    measure.opened()
+                    row_type = Row.getType(table, cursor.fields[1:])
+                    for row in cursor :
+                        last_id = row[0]
+                        count += 1
+                        yield row_type(list(row[1:]))
+                        if count >= page_size :
+                            break
+            finally :
+                measure.done(count)
+            if count < page_size :
+                return
+
+    def frame(self, table, fields, filter=None, categorical=()) :
+        if self.splitInClause(filter) is not None :
+            return DataAccess.frame(self, table, fields, filter, categorical)
+
         table_path = self.findTablePath(table)
-        table_fields = arcpy.ListFields(table_path)
-        oid_field = [f.name for f in table_fields if f.type == "OID"][0]
-        domain_fields = [f for f in table_fields if f.domain != '']
-        for domain_field in domain_fields:
-            if not fields.__contains__(domain_field.name) and domain_field.defaultValue != '':
-                fields.append(domain_field.name)
-                for value in values:
-                    index = values.index(value)
-                    value_list = list(value)
-                    value_list.append(domain_field.defaultValue)
-                    values[index] = tuple(value_list)
-
-        edit = da.Editor(self.workspace_path)
-        edit.startEditing(with_undo=False, multiuser_mode=False)
-        edit.startOperation()
+        field_types = self.metadata.fieldTypes(table_path)
+        null_value = {f: NUMPY_NULL_VALUES.get(field_types.get(f.lower()), "") for f in fields}
+        measure = QueryMetrics.measure(table, "frame", filter)
+        array = da.TableToNumPyArray(table_path, fields, filter if filter else "", skip_nulls=False, null_value=null_value)
+        measure.opened()
+        measure.done(len(array))
+        return ColumnFrame.fromArray(array, categorical)
+
+    def _startEditing(self) :
+        if self._edit_depth == 0 :
+            self._editor = da.Editor(self.workspace_path)
+            self._editor.startEditing(with_undo=False, multiuser_mode=False)
+            self._editor.startOperation()
+            self._save_changes = True
+        self._edit_depth += 1
 
+    def _stopEditing(self, save_changes=True) :
+        self._edit_depth -= 1
+        self._save_changes = self._save_changes and save_changes
+        if self._edit_depth == 0 :
+            if self._save_changes :
+                self._editor.stopOperation()
+            else :
+                self._editor.abortOperation()
+            self._editor.stopEditing(save_changes=self._save_changes)
+            self._editor = None
+            self._version_checked = None
+
+    def _getOIDField(self, table_path) :
+        return self.metadata.oidField(table_path)
+
+    def _insertRows(self, table, fields, values) :
+        table_path = self.findTablePath(table)
+        fields = list(fields)
+        values = list(values)
+        for field_name, default_value in self.metadata.domainDefaults(table_path):
+            if not fields.__contains__(field_name):
+                fields.append(field_name)
+                values = [tuple(value) + (default_value,) for value in values]
+
+        measure = QueryMetrics.measure(table, "insert")
         cursor = da.InsertCursor(table_path, fields)
+        measure.opened()
 
         inserted_id = []
         for row in values:
             id = cursor.insertRow(row)
             inserted_id.append(id) 
 
-        del row
         del cursor
+        measure.done(len(inserted_id))
+        return inserted_id
 
-        edit.stopOperation()
-        edit.stopEditing(save_changes=True)        
+    def _updateRows(self, table, fields, values, filter = None) :
+        clauses = self.chunkInClause(filter)
+        if clauses is not None :
+            return sum(self._updateRows(table, fields, values, clause) for clause in clauses)
 
-        register = self.search(table, "*", "{} = {}".format(oid_field, inserted_id[0]), geometry=fields.count("SHAPE@") > 0)
-        return register
-
-    def update(self, table, fields, values, filter = None) :
         table_path = self.findTablePath(table)
 
-        edit = da.Editor(self.workspace_path)
-        edit.startEditing(with_undo=False, multiuser_mode=False)
-        edit.startOperation()
-
+        measure = QueryMetrics.measure(table, "update", filter)
         if filter:
             cursor = da.UpdateCursor(table_path, fields, filter)
         else :
             cursor = da.UpdateCursor(table_path, fields)
+        measure.opened()
 
         count = 0        
         for row in cursor:
@@ -129,30 +255,67 @@ class ArcpyDataAccess(DataAccess) :
             cursor.updateRow(row)
         if count == 0:
             ToolboxLogger.debug("No rows were updated")
-            ToolboxLogger.debug("Table: {}, Fields: {}, Values: {}, Filter: {}".format(table, fields, values, filter))
+            ToolboxLogger.debug("Table: {}, Fields: {}, Values: {}, Filter: {}", table, fields, values, filter)
         del cursor
+        measure.done(count)
+        return count
 
-        edit.stopOperation()
-        edit.stopEditing(save_changes=True)
+    def _deleteRows(self, table, filter = None) :
+        clauses = self.chunkInClause(filter)
+        if clauses is not None :
+            return sum(self._deleteRows(table, clause) for clause in clauses)
 
-    def delete(self, table, fields = None, filter = None):
         table_path = self.findTablePath(table)
-        if fields == None :
-            fields = "*"
-
-        edit = da.Editor(self.workspace_path)
-        edit.startEditing(with_undo=False, multiuser_mode=False)
-        edit.startOperation()
 
+        measure = QueryMetrics.measure(table, "delete", filter)
         if filter:
-            cursor = da.UpdateCursor(table_path, fields, filter)
+            cursor = da.UpdateCursor(table_path, "*", filter)
         else :
-            cursor = da.UpdateCursor(table_path, fields)
+            cursor = da.UpdateCursor(table_path, "*")
+        measure.opened()
         
+        count = 0
         for row in cursor:
+            count += 1
             cursor.deleteRow()
 
         del cursor
+        measure.done(count)
+        return count
+
+    def _readInserted(self, table, ids, geometry = False) :
+        if not ids :
+            return []
+        oid_field = self._getOIDField(self.findTablePath(table))
+        registers = self.search(table, "*", DataAccess.getWhereClause(oid_field, list(ids)), geometry=geometry) or []
+        registers_by_id = {register[oid_field]: register for register in registers}
+        return [registers_by_id[id] for id in ids if id in registers_by_id]
+
+    def insert(self, table, fields, values) :
+        self._startEditing()
+        try :
+            inserted_id = self._insertRows(table, fields, values)
+        except Exception :
+            self._stopEditing(save_changes=False)
+            raise
+        self._stopEditing(save_changes=True)
+
+        return self._readInserted(table, inserted_id[:1], geometry=fields.count("SHAPE@") > 0)
 
-        edit.stopOperation()
-        edit.stopEditing(save_changes=True)
+    def update(self, table, fields, values, filter = None) :
+        self._startEditing()
+        try :
+            self._updateRows(table, fields, values, filter)
+        except Exception :
+            self._stopEditing(save_changes=False)
+            raise
+        self._stopEditing(save_changes=True)
+
+    def delete(self, table, fields = None, filter = None):
+        self._startEditing()
+        try :
+            self._deleteRows(table, filter)
+        except Exception :
+            self._stopEditing(save_changes=False)
+            raise
+        self._stopEditing(save_changes=True)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import math
+
+from PublicInspectionArcGIS.SpatialIndex import SpatialIndex
+
+class BoundaryTopology :
+    """Derives shared and outer boundaries from polygon rings by hashing their snapped segments.
+
+    Units are added as lists of rings (lists of (x, y)); shared edges have two owners and
+    outer edges one, each merged into polylines given as lists of paths."""
+
+    def __init__(self, tolerance) :
+        self.tolerance = tolerance
+        self.vertices = []
+        self._vertex_cells = {}
+        self._rings = []
+        self.conflicts = 0
+
+    def _cell(self, x, y) :
+        return (math.floor(x / self.tolerance), math.floor(y / self.tolerance))
+
+    def snap(self, x, y) :
+        cx, cy = self._cell(x, y)
+        tolerance2 = self.tolerance * self.tolerance
+        for dx in (-1, 0, 1) :
+            for dy in (-1, 0, 1) :
+                for vertex in self._vertex_cells.get((cx + dx, cy + dy), []) :
+                    vx, vy = self.vertices[vertex]
+                    if (vx - x) * (vx - x) + (vy - y) * (vy - y) <= tolerance2 :
+                        return vertex
+        vertex = len(self.vertices)
+        self.vertices.append((x, y))
+        self._vertex_cells.setdefault((cx, cy), []).append(vertex)
+        return vertex
+
+    def add_unit(self, key, rings) :
+        for ring in rings :
+            vertices = []
+            for x, y in ring :
+                vertex = self.snap(x, y)
+                if not vertices or vertices[-1] != vertex :
+                    vertices.append(vertex)
+            if len(vertices) > 1 and vertices[0] == vertices[-1] :
+                vertices.pop()
+            if len(vertices) > 2 :
+                self._rings.append((key, vertices))
+
+    def _split_points(self, index, v0, v1) :
+        x0, y0 = self.vertices[v0]
+        x1, y1 = self.vertices[v1]
+        dx, dy = x1 - x0, y1 - y0
+        length2 = dx * dx + dy * dy
+        if length2 == 0 :
+            return []
+
+        splits = []
+        tolerance2 = self.tolerance * self.tolerance
+        for vertex in index.query((min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)), self.tolerance) :
+            if vertex == v0 or vertex == v1 :
+                continue
+            x, y = self.vertices[vertex]
+            t = ((x - x0) * dx + (y - y0) * dy) / length2
+            if t <= 0 or t >= 1 :
+                continue
+            px, py = x0 + t * dx - x, y0 + t * dy - y
+            if px * px + py * py <= tolerance2 :
+                splits.append((t, vertex))
+        return [vertex for t, vertex in sorted(splits)]
+
+    def edges(self) :
+        segments = [(v0, vertices[(i + 1) % len(vertices)]) for key, vertices in self._rings for i, v0 in enumerate(vertices)]
+        lengths = [math.hypot(self.vertices[v1][0] - self.vertices[v0][0], self.vertices[v1][1] - self.vertices[v0][1]) for v0, v1 in segments]
+        cell_size = max(self.tolerance, sum(lengths) / len(lengths)) if lengths else self.tolerance
+        index = SpatialIndex([(x, y, x, y) for x, y in self.vertices], cell_size)
+
+        owners = {}
+        for key, vertices in self._rings :
+            for i, v0 in enumerate(vertices) :
+                v1 = vertices[(i + 1) % len(vertices)]
+                chain = [v0] + self._split_points(index, v0, v1) + [v1]
+                for a, b in zip(chain, chain[1:]) :
+                    edge_owners = owners.setdefault((min(a, b), max(a, b)), [])
+                    if key not in edge_owners :
+                        edge_owners.append(key)
+        return owners
+
+    def _merge(self, edges) :
+        adjacency = {}
+        for a, b in edges :
+            adjacency.setdefault(a, []).append(b)
+            adjacency.setdefault(b, []).append(a)
+
+        visited = set()
+        paths = []
+
+        def walk(start, next) :
+            path = [start]
+            previous, current = start, next
+            visited.add((min(start, next), max(start, next)))
+            while True :
+                path.append(current)
+                if len(adjacency[current]) != 2 :
+                    break
+                candidates = [v for v in adjacency[current] if (min(current, v), max(current, v)) not in visited]
+                if not candidates :
+                    break
+                previous, current = current, candidates[0]
+                visited.add((min(previous, current), max(previous, current)))
+            return path
+
+        for vertex in sorted(adjacency) :
+            if len(adjacency[vertex]) != 2 :
+                for next in sorted(adjacency[vertex]) :
+                    if (min(vertex, next), max(vertex, next)) not in visited :
+                        paths.append(walk(vertex, next))
+        for vertex in sorted(adjacency) :
+            for next in sorted(adjacency[vertex]) :
+                if (min(vertex, next), max(vertex, next)) not in visited :
+                    paths.append(walk(vertex, next))
+
+        return [[self.vertices[v] for v in path] for path in paths]
+
+    def build(self) :
+        groups = {}
+        for edge, edge_owners in self.edges().items() :
+            if len(edge_owners) > 2 :
+                self.conflicts += 1
+                continue
+            groups.setdefault(tuple(sorted(edge_owners)), []).append(edge)
+
+        shared = {}
+        outer = {}
+        for owners, edges in sorted(groups.items()) :
+            paths = self._merge(sorted(edges))
+            if len(owners) == 2 :
+                shared[owners] = paths
+            else :
+                outer[owners[0]] = paths
+        return shared, outer
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import multiprocessing
+
+from PublicInspectionArcGIS.GeometryEngine import GeometryEngine
+
+def compute_shared_boundaries(task) :
+    """Worker entry point: task is (engine name, geometries by key as engine.dumps data, [(key0, key1)])."""
+    engine_name, geometries_data, pairs = task
+    engine = GeometryEngine.create(engine_name)
+    geometries = {key: engine.loads(data) for key, data in geometries_data.items()}
+    return [(key0, key1, engine.dumps(intersect)) for key0, key1, intersect in engine.shared_boundaries(geometries, pairs)]
+
+def configure_executable() :
+    if os.path.basename(sys.executable).lower() == "arcgispro.exe" :
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "python.exe"))
@@ -1,221 +1,324 @@
-import arcpy
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration
-from PublicInspectionArcGIS.ArcpyDataAccess import ArcpyDataAccess
+from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration, ToolRunHooks
+from PublicInspectionArcGIS.DataAccess import DataAccess
 from PublicInspectionArcGIS.PublicInspection import PublicInspection
+from PublicInspectionArcGIS.SpatialIndex import SpatialIndex
+from PublicInspectionArcGIS.AnchorClassifier import AnchorClassifier
+from PublicInspectionArcGIS.FingerprintStore import FingerprintStore
+from PublicInspectionArcGIS.BoundaryTopology import BoundaryTopology
+from PublicInspectionArcGIS.GeometryEngine import GeometryEngine, SHAPELY_ENGINE
+from PublicInspectionArcGIS.BoundaryWorker import compute_shared_boundaries, configure_executable
 
 class CalculateBoundaries(PublicInspection):
-    def __init__(self, configuration : Configuration, aprx : arcpy.mp.ArcGISProject) :
-        super().__init__(configuration, aprx)
+    def __init__(self, configuration : Configuration, aprx = None, da : DataAccess = None, folder = None) :
+        super().__init__(configuration, aprx, da, folder)
         self.GEOMETRY_FIELD = configuration.getConfigKey("GEOMETRY_FIELD")
         self.legal_id = None
+        self.tolerance = 5 / 111135
+        self.anchor_classifier = None
+        self.workers = 1
+        self.incremental = False
+        self.use_topology = False
+        self.WORKER_GEOMETRY_ENGINE = configuration.getConfigKey("WORKER_GEOMETRY_ENGINE")
+        self.FINGERPRINTS_RELATIVE_PATH = configuration.getConfigKey("FINGERPRINTS_RELATIVE_PATH")
+        self.fingerprintsPath = os.path.join(self.folder, self.FINGERPRINTS_RELATIVE_PATH)
 
-        ToolboxLogger.info("Proyect File:           {}".format(aprx.filePath))
-        ToolboxLogger.info("Inspection Data Source: {}".format(self.inspectionDataSource))
-        ToolboxLogger.debug("Data Access Object:     {}".format(self.da))
+        self.describe()
     
+    def add_boundary_endpoints(self, boundary) :
+        self.anchor_classifier.add_endpoints(self.geometry_engine.endpoints(boundary[self.GEOMETRY_FIELD]))
+
     @ToolboxLogger.log_method
-    def update_point_type(self, points, boundary) :
-        self.fail_boundaries = []
-        boundary_geometry = boundary[self.GEOMETRY_FIELD]
-        boundary_first_point = boundary_geometry.firstPoint
-        boundary_last_point = boundary_geometry.lastPoint
-        count = 0
-        for point in points :
-            point_geometry = point[self.GEOMETRY_FIELD]
-            point_buffer = point_geometry.buffer(5 / 111135)
-            
-            intersect_first_point = point_buffer.intersect(boundary_first_point, 1)
-            intersect_last_point = point_buffer.intersect(boundary_last_point, 1)
-            if (intersect_first_point.firstPoint or intersect_first_point.lastPoint or intersect_last_point.firstPoint or intersect_last_point.lastPoint):
-                ToolboxLogger.debug("Point '{}' is an Anchor".format(point[self.POINTS_ID_FIELD]))
-                count += 1
-                if point[self.POINTS_TYPE_FIELD] == "Vertex" :
-                    #self.update_points(fields=[self.POINTS_TYPE_FIELD], values=["Anchor"], filter="{} = '{}'".format(self.POINTS_ID_FIELD, point[self.POINTS_ID_FIELD]))
-                    point[self.POINTS_TYPE_FIELD] = "Anchor"
-                    ToolboxLogger.debug("Point '{}' updated".format(point[self.POINTS_ID_FIELD]))
-                    ToolboxLogger.info("Anchor Point updated...")
-                if count == 2:
-                    ToolboxLogger.debug("Break search")
-                    break
+    def set_point_types(self, points) :
+        anchors = self.anchor_classifier.anchors()
+        ToolboxLogger.debug("Anchor Points for update: {}".format(len(anchors)))
+        ToolboxLogger.debug("Vertex Points: {}".format(len(points) - len(anchors)))
+
+        point_ids = [points[index][self.POINTS_ID_FIELD] for index in anchors]
+        if point_ids :
+            self.update_points(
+                fields=[self.POINTS_TYPE_FIELD], 
+                values=["Anchor"], 
+                filter=DataAccess.getWhereClause(self.POINTS_ID_FIELD, point_ids))
+
+    def get_shared_boundaries(self, geometries, pairs) :
+        intersects = self.geometry_engine.shared_boundaries(geometries, pairs)
+        if ToolboxLogger.isDebugEnabled() :
+            for key0, key1, intersect in intersects :
+                ToolboxLogger.debug("Boundary Length: {}", self.geometry_engine.length(intersect))
+        return intersects
 
     @ToolboxLogger.log_method
-    def set_spatialunit_boundaries(self, su0, spatial_units, points) :
-            ToolboxLogger.debug("Spatial Unit 0: {}".format(su0[self.SPATIAL_UNIT_ID_FIELD]))
-            geometry = su0[self.GEOMETRY_FIELD]
-
-            ToolboxLogger.info("Intersecting Spatial Units to get Boundaries...") 
-            for su1 in spatial_units:
-                geometry1 = su1[self.GEOMETRY_FIELD]
-                equals = geometry.equals(geometry1)
-                disjoint = geometry.disjoint(geometry1)
-                if not equals and not disjoint:
-                    ToolboxLogger.debug("Spatial Unit 1: {}".format(su1[self.SPATIAL_UNIT_ID_FIELD]))
-                    intersect = geometry.intersect(geometry1, 2)
-                    ToolboxLogger.debug("Boundary Length: {}".format(intersect.length))
-
-                    if intersect.length > 0:
-                        spatialunits_boundaries = self.get_spatialunits_boundaries(
-                            filter="{0} = '{1}' or {0} = '{2}'".format(
-                                self.SPATIAL_UNIT_FK_FIELD, su0[self.SPATIAL_UNIT_ID_FIELD], su1[self.SPATIAL_UNIT_ID_FIELD])
-                            )
-                        boundaries_ids = [boundary[self.BOUNDARY_FK_FIELD] for boundary in spatialunits_boundaries]
-                        spatialunits_boundaries_meet_criteria = [boundary for boundary in spatialunits_boundaries if boundaries_ids.count(boundary[self.BOUNDARY_FK_FIELD]) == 2]
-
-                        if len(spatialunits_boundaries_meet_criteria) == 2 \
-                                and spatialunits_boundaries_meet_criteria[0][self.BOUNDARY_FK_FIELD] == spatialunits_boundaries_meet_criteria[1][self.BOUNDARY_FK_FIELD] :
-                            ToolboxLogger.debug("Boundary by Spatial Unit: {}".format(spatialunits_boundaries_meet_criteria))
-                            boundary = self.get_boundaries(filter="{} = '{}'".format(self.BOUNDARY_ID_FIELD, spatialunits_boundaries_meet_criteria[0][self.BOUNDARY_FK_FIELD]))[0]
-                            boundary[self.GEOMETRY_FIELD] = intersect
-                            self.update_boundaries(fields=[self.GEOMETRY_FIELD], values=[intersect], filter="{} = '{}'".format(self.BOUNDARY_ID_FIELD, boundary[self.BOUNDARY_ID_FIELD]))
-                            ToolboxLogger.debug("Boundary '{}' updated".format(boundary[self.BOUNDARY_ID_FIELD]))
-                        else :
-                            boundary = self.add_boundary(intersect, "{} - {}".format(su0[self.SPATIAL_UNIT_NAME_FIELD], su1[self.SPATIAL_UNIT_NAME_FIELD]))
-                            self.add_spatialunit_boundary(su0, boundary)
-                            self.add_spatialunit_boundary(su1, boundary)
-
-                            self.add_approvals(su0, boundary)
-                            self.add_approvals(su1, boundary)
-                        self.update_point_type(points, boundary)
-                    else :
-                        ToolboxLogger.debug("NULL Geometry!")
-
-            spatial_unit_id = su0[self.SPATIAL_UNIT_ID_FIELD]
-            spatial_units_boundaries = self.get_spatialunits_boundaries(
-                filter="{} = '{}'".format(self.SPATIAL_UNIT_FK_FIELD, spatial_unit_id))
-
-            if spatial_units_boundaries :
-                spatialunits_boundaries_id = [row[self.BOUNDARY_FK_FIELD] for row in spatial_units_boundaries]
-                ToolboxLogger.debug("Boundary Ids: {}".format(len(spatialunits_boundaries_id)))
-
-                spatialunits_boundaries = self.get_spatialunits_boundaries(
-                    filter=ArcpyDataAccess.getWhereClause(self.BOUNDARY_FK_FIELD, spatialunits_boundaries_id))
-                boundaries_ids = [boundary[self.BOUNDARY_FK_FIELD] for boundary in spatialunits_boundaries]
-
-                boundaries_ids_meet_criteria = [id for id in boundaries_ids if boundaries_ids.count(id) == 2]
-                spatialunits_boundaries_meet_criteria = [boundary for boundary in spatialunits_boundaries if boundary[self.BOUNDARY_FK_FIELD] in boundaries_ids_meet_criteria]
-
-                related_boundaries_ids = [boundary[self.BOUNDARY_FK_FIELD] for boundary in spatialunits_boundaries_meet_criteria]
-                related_boundaries = self.get_boundaries(filter=ArcpyDataAccess.getWhereClause(self.BOUNDARY_ID_FIELD, related_boundaries_ids), geometry=True)
-
-                not_null_related_boundaries = [g[self.GEOMETRY_FIELD] for g in related_boundaries if g[self.GEOMETRY_FIELD]]
-                ToolboxLogger.debug("Boundary Geometries Length: {}".format(len(not_null_related_boundaries)))
-
-                boundary_union = not_null_related_boundaries.pop(0)
-                for boundary in not_null_related_boundaries :
-                    boundary_union = boundary_union.union(boundary)
-            
-                geometry0_boundary = geometry.boundary()
-                intersect = geometry0_boundary.difference(boundary_union)
-                if intersect.length > 0 :
-                    boundaries_ids_meet_criteria = [id for id in boundaries_ids if boundaries_ids.count(id) == 1]
-                    spatialunits_boundaries_meet_criteria = [boundary for boundary in spatialunits_boundaries if boundary[self.BOUNDARY_FK_FIELD] in boundaries_ids_meet_criteria]
-                    if len(spatialunits_boundaries_meet_criteria) == 1:
-                        ToolboxLogger.debug("Boundary by Spatial Unit: {}".format(spatialunits_boundaries_meet_criteria))
-                        boundaries = self.get_boundaries(
-                            filter="{} = '{}'".format(self.BOUNDARY_ID_FIELD, spatialunits_boundaries_meet_criteria[0][self.BOUNDARY_FK_FIELD]),
-                            geometry=True)
-                        boundary = boundaries[0]
-                        print(boundary[self.GEOMETRY_FIELD])
-                        boundary[self.GEOMETRY_FIELD] = intersect
-
-                        self.update_boundaries(fields=[self.GEOMETRY_FIELD], values=[intersect], filter="{} = '{}'".format(self.BOUNDARY_ID_FIELD, boundary[self.BOUNDARY_ID_FIELD]))
-                        ToolboxLogger.debug("Boundary '{}' updated".format(boundary[self.BOUNDARY_ID_FIELD]))
-                    else :
-                        boundary = self.add_boundary(intersect, "{}".format(su0[self.SPATIAL_UNIT_NAME_FIELD]))
-                        self.add_spatialunit_boundary(su0, boundary)
-                        self.add_approvals(su0, boundary)
-                    self.update_point_type(points, boundary)
-   
+    def save_shared_boundary(self, su0, su1, intersect) :
+        ToolboxLogger.debug("Spatial Unit 1: {}", su1[self.SPATIAL_UNIT_ID_FIELD])
+        spatialunits_boundaries = self.get_spatialunits_boundaries(
+            filter="{0} = '{1}' or {0} = '{2}'".format(
+                self.SPATIAL_UNIT_FK_FIELD, su0[self.SPATIAL_UNIT_ID_FIELD], su1[self.SPATIAL_UNIT_ID_FIELD])
+            )
+        boundaries_ids = [boundary[self.BOUNDARY_FK_FIELD] for boundary in spatialunits_boundaries]
+        spatialunits_boundaries_meet_criteria = [boundary for boundary in spatialunits_boundaries if boundaries_ids.count(boundary[self.BOUNDARY_FK_FIELD]) == 2]
+
+        if len(spatialunits_boundaries_meet_criteria) == 2 \
+                and spatialunits_boundaries_meet_criteria[0][self.BOUNDARY_FK_FIELD] == spatialunits_boundaries_meet_criteria[1][self.BOUNDARY_FK_FIELD] :
+            ToolboxLogger.debug("Boundary by Spatial Unit: {}", spatialunits_boundaries_meet_criteria)
+            boundary = self.get_boundaries(filter="{} = '{}'".format(self.BOUNDARY_ID_FIELD, spatialunits_boundaries_meet_criteria[0][self.BOUNDARY_FK_FIELD]))[0]
+            boundary[self.GEOMETRY_FIELD] = intersect
+            self.update_boundaries(fields=[self.GEOMETRY_FIELD], values=[intersect], filter="{} = '{}'".format(self.BOUNDARY_ID_FIELD, boundary[self.BOUNDARY_ID_FIELD]))
+            ToolboxLogger.debug("Boundary '{}' updated", boundary[self.BOUNDARY_ID_FIELD])
+        else :
+            with self.da.batch() :
+                boundary = self.add_boundary(intersect, "{} - {}".format(su0[self.SPATIAL_UNIT_NAME_FIELD], su1[self.SPATIAL_UNIT_NAME_FIELD]), [su0, su1])
+                self.add_boundary_approvals([su0, su1], boundary)
+        self.add_boundary_endpoints(boundary)
+
+    @ToolboxLogger.log_method
+    def set_outer_boundary(self, su0) :
+        spatial_unit_id = su0[self.SPATIAL_UNIT_ID_FIELD]
+        spatial_units_boundaries = self.get_spatialunits_boundaries(
+            filter="{} = '{}'".format(self.SPATIAL_UNIT_FK_FIELD, spatial_unit_id))
+
+        if spatial_units_boundaries :
+            spatialunits_boundaries_id = [row[self.BOUNDARY_FK_FIELD] for row in spatial_units_boundaries]
+            ToolboxLogger.debug("Boundary Ids: {}".format(len(spatialunits_boundaries_id)))
+
+            spatialunits_boundaries = self.get_spatialunits_boundaries(
+                filter=DataAccess.getWhereClause(self.BOUNDARY_FK_FIELD, spatialunits_boundaries_id))
+            boundaries_ids = [boundary[self.BOUNDARY_FK_FIELD] for boundary in spatialunits_boundaries]
+
+            boundaries_ids_meet_criteria = [id for id in boundaries_ids if boundaries_ids.count(id) == 2]
+            spatialunits_boundaries_meet_criteria = [boundary for boundary in spatialunits_boundaries if boundary[self.BOUNDARY_FK_FIELD] in boundaries_ids_meet_criteria]
+
+            related_boundaries_ids = [boundary[self.BOUNDARY_FK_FIELD] for boundary in spatialunits_boundaries_meet_criteria]
+            intersect = self.get_outer_boundary(su0, related_boundaries_ids)
+            if intersect is not None :
+                self.save_outer_boundary(su0, intersect, spatialunits_boundaries)
+
+    def get_outer_boundary(self, su0, related_boundaries_ids) :
+        related_boundaries = self.get_boundaries(filter=DataAccess.getWhereClause(self.BOUNDARY_ID_FIELD, related_boundaries_ids), geometry=True) if related_boundaries_ids else []
+        not_null_related_boundaries = [g[self.GEOMETRY_FIELD] for g in related_boundaries if g[self.GEOMETRY_FIELD]]
+        ToolboxLogger.debug("Boundary Geometries Length: {}".format(len(not_null_related_boundaries)))
+
+        return self.geometry_engine.outer_boundary(su0[self.GEOMETRY_FIELD], not_null_related_boundaries)
+
+    def get_spatialunit_links(self, su0) :
+        spatial_units_boundaries = self.get_spatialunits_boundaries(
+            filter="{} = '{}'".format(self.SPATIAL_UNIT_FK_FIELD, su0[self.SPATIAL_UNIT_ID_FIELD]))
+        if not spatial_units_boundaries :
+            return []
+        return self.get_spatialunits_boundaries(
+            filter=DataAccess.getWhereClause(self.BOUNDARY_FK_FIELD, [row[self.BOUNDARY_FK_FIELD] for row in spatial_units_boundaries]))
+
+    @ToolboxLogger.log_method
+    def save_outer_boundary(self, su0, intersect, spatialunits_boundaries = None) :
+        if spatialunits_boundaries is None :
+            spatialunits_boundaries = self.get_spatialunit_links(su0)
+        boundaries_ids = [boundary[self.BOUNDARY_FK_FIELD] for boundary in spatialunits_boundaries]
+
+        boundaries_ids_meet_criteria = [id for id in boundaries_ids if boundaries_ids.count(id) == 1]
+        spatialunits_boundaries_meet_criteria = [boundary for boundary in spatialunits_boundaries if boundary[self.BOUNDARY_FK_FIELD] in boundaries_ids_meet_criteria]
+        if len(spatialunits_boundaries_meet_criteria) == 1:
+            ToolboxLogger.debug("Boundary by Spatial Unit: {}", spatialunits_boundaries_meet_criteria)
+            boundaries = self.get_boundaries(
+                filter="{} = '{}'".format(self.BOUNDARY_ID_FIELD, spatialunits_boundaries_meet_criteria[0][self.BOUNDARY_FK_FIELD]),
+                geometry=True)
+            boundary = boundaries[0]
+            boundary[self.GEOMETRY_FIELD] = intersect
+
+            self.update_boundaries(fields=[self.GEOMETRY_FIELD], values=[intersect], filter="{} = '{}'".format(self.BOUNDARY_ID_FIELD, boundary[self.BOUNDARY_ID_FIELD]))
+            ToolboxLogger.debug("Boundary '{}' updated", boundary[self.BOUNDARY_ID_FIELD])
+        else :
+            with self.da.batch() :
+                boundary = self.add_boundary(intersect, "{}".format(su0[self.SPATIAL_UNIT_NAME_FIELD]), [su0])
+                self.add_approvals(su0, boundary)
+        self.add_boundary_endpoints(boundary)
+
+    @ToolboxLogger.log_method
+    def set_spatialunit_boundaries(self, su0, spatial_units) :
+        ToolboxLogger.debug("Spatial Unit 0: {}", su0[self.SPATIAL_UNIT_ID_FIELD])
+        geometry = su0[self.GEOMETRY_FIELD]
+
+        ToolboxLogger.info("Intersecting Spatial Units to get Boundaries...") 
+        geometries = [geometry] + [su1[self.GEOMETRY_FIELD] for su1 in spatial_units]
+        for key0, key1, intersect in self.get_shared_boundaries(geometries, [(0, key) for key in range(1, len(geometries))]) :
+            self.save_shared_boundary(su0, spatial_units[key1 - 1], intersect)
+
+        self.set_outer_boundary(su0)
+
+    def get_boundary_pairs(self, spatial_index, index, keys) :
+        return [(min(index, key), max(index, key)) for key in spatial_index.neighbors(index, self.tolerance) if key > index or key not in keys]
+
+    def get_fingerprints(self, spatial_units) :
+        fingerprints = {}
+        for su in spatial_units :
+            geometry = su[self.GEOMETRY_FIELD]
+            fingerprints[su[self.SPATIAL_UNIT_ID_FIELD]] = FingerprintStore.record(
+                self.geometry_engine.encode(geometry), su[self.SPATIAL_UNIT_LEGAL_ID_FIELD], self.get_envelope(geometry))
+        return fingerprints
+
+    @ToolboxLogger.log_method
+    def get_changed_keys(self, store, fingerprints, spatial_units, spatial_index) :
+        changed, previous_extents = store.changes(fingerprints)
+        ToolboxLogger.debug("Changed Spatial Units: {}, Removed or Moved: {}".format(len(changed), len(previous_extents)))
+
+        indexes = {su[self.SPATIAL_UNIT_ID_FIELD]: index for index, su in enumerate(spatial_units)}
+        keys = set()
+        for id in changed :
+            keys.add(indexes[id])
+            keys.update(spatial_index.neighbors(indexes[id], self.tolerance))
+        for extent in previous_extents :
+            keys.update(spatial_index.query(tuple(extent), self.tolerance))
+        return keys
+
+    def get_boundary_tasks(self, spatial_units, spatial_index, keys) :
+        tasks = []
+        for tile in spatial_index.partition(self.workers * 4) :
+            pairs = [pair for index in tile if index in keys for pair in self.get_boundary_pairs(spatial_index, index, keys)]
+            if pairs :
+                geometry_keys = set(key for pair in pairs for key in pair)
+                tasks.append((self.worker_engine(), {key: self.to_worker(spatial_units[key][self.GEOMETRY_FIELD]) for key in geometry_keys}, pairs))
+        return tasks
+
+    def worker_engine(self) :
+        if self.WORKER_GEOMETRY_ENGINE :
+            return self.WORKER_GEOMETRY_ENGINE
+        return SHAPELY_ENGINE if GeometryEngine.available(SHAPELY_ENGINE) else self.geometry_engine.name
+
+    def to_worker(self, geometry) :
+        return self.geometry_engine.dumps(geometry)
+
+    def from_worker(self, data, engine) :
+        return engine.loads(data)
+
+    @ToolboxLogger.log_method
+    def set_boundaries_parallel(self, spatial_units, spatial_index, keys) :
+        tasks = self.get_boundary_tasks(spatial_units, spatial_index, keys)
+        ToolboxLogger.info("Boundary Tasks: {} ({} workers, {} engine)".format(len(tasks), self.workers, self.worker_engine()))
+        engine = self.geometry_engine.like(spatial_units[0][self.GEOMETRY_FIELD]) if spatial_units else self.geometry_engine
+
+        intersects = {}
+        configure_executable()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor :
+            for results in executor.map(compute_shared_boundaries, tasks) :
+                for key0, key1, intersect in results :
+                    owner = key0 if key0 in keys else key1
+                    intersects.setdefault(owner, []).append((key0, key1, intersect))
+
+        with self.da.batch() :
+            for index in sorted(keys) :
+                ToolboxLogger.info("Spatial Unit: {}".format(index + 1))
+                for key0, key1, intersect in sorted(intersects.get(index, []), key=lambda result : (result[0], result[1])) :
+                    self.save_shared_boundary(spatial_units[key0], spatial_units[key1], self.from_worker(intersect, engine))
+                self.set_outer_boundary(spatial_units[index])
+
+    @ToolboxLogger.log_method
+    def set_boundaries_serial(self, spatial_units, spatial_index, keys) :
+        for index in sorted(keys) :
+            ToolboxLogger.info("Spatial Unit: {}".format(index + 1))
+            pairs = self.get_boundary_pairs(spatial_index, index, keys)
+            geometries = {key: spatial_units[key][self.GEOMETRY_FIELD] for pair in pairs for key in pair}
+            for key0, key1, intersect in self.get_shared_boundaries(geometries, pairs) :
+                self.save_shared_boundary(spatial_units[key0], spatial_units[key1], intersect)
+            self.set_outer_boundary(spatial_units[index])
+
+    @ToolboxLogger.log_method
+    def set_boundaries_topology(self, spatial_units, keys) :
+        topology = BoundaryTopology(self.tolerance)
+        for index, su in enumerate(spatial_units) :
+            topology.add_unit(index, self.geometry_engine.rings(su[self.GEOMETRY_FIELD]))
+        shared, outer = topology.build()
+        ToolboxLogger.info("Shared Boundaries: {}, Outer Boundaries: {}".format(len(shared), len(outer)))
+        if topology.conflicts :
+            ToolboxLogger.info("Segments with more than two owners: {}".format(topology.conflicts))
+
+        shared_by_unit = {}
+        for key0, key1 in shared :
+            owner = key0 if key0 in keys else key1
+            shared_by_unit.setdefault(owner, []).append((key0, key1))
+
+        with self.da.batch() :
+            for index in sorted(keys) :
+                ToolboxLogger.info("Spatial Unit: {}".format(index + 1))
+                like = spatial_units[index][self.GEOMETRY_FIELD]
+                for key0, key1 in shared_by_unit.get(index, []) :
+                    self.save_shared_boundary(spatial_units[key0], spatial_units[key1], self.geometry_engine.polyline(shared[(key0, key1)], like))
+                if index in outer :
+                    spatialunits_boundaries = self.get_spatialunit_links(spatial_units[index])
+                    if spatialunits_boundaries :
+                        self.save_outer_boundary(spatial_units[index], self.geometry_engine.polyline(outer[index], like), spatialunits_boundaries)
+
     @ToolboxLogger.log_method
     def set_boundaries(self) :
-        points = self.get_points(geometry=True)
-        if self.legal_id is None :
-            for point in points :
-                point[self.POINTS_TYPE_FIELD] = "Vertex"
+        points = self.get_points(fields=[self.POINTS_ID_FIELD, self.POINTS_TYPE_FIELD, "SHAPE@XY"])
+        points = [p for p in points if p["SHAPE@XY"] and p["SHAPE@XY"][0] is not None]
+        self.anchor_classifier = AnchorClassifier([p["SHAPE@XY"] for p in points], self.tolerance)
 
+        if self.legal_id is None :
             spatial_units = self.get_spatialunits(geometry=True)
             ToolboxLogger.info("Spatial Units: {}".format(len(spatial_units)))
             ToolboxLogger.info("Points: {}".format(len(points)))
 
-            index = 1
-            while(len(spatial_units) > 0) :
-                ToolboxLogger.info("Spatial Unit: {}".format(index))
-                index += 1
-                
-                su0 = spatial_units.pop(0)
-                self.set_spatialunit_boundaries(su0, spatial_units, points)
+            spatial_index = SpatialIndex([self.get_envelope(su[self.GEOMETRY_FIELD]) for su in spatial_units])
+            ToolboxLogger.debug("Spatial Index Cell Size: {}".format(spatial_index.cell_size))
+
+            store = FingerprintStore(self.fingerprintsPath)
+            fingerprints = self.get_fingerprints(spatial_units)
+            if self.incremental and len(store) > 0 :
+                keys = self.get_changed_keys(store, fingerprints, spatial_units, spatial_index)
+            else :
+                keys = set(range(len(spatial_units)))
+            ToolboxLogger.info("Spatial Units Skipped: {}".format(len(spatial_units) - len(keys)))
+
+            if self.use_topology :
+                self.set_boundaries_topology(spatial_units, keys)
+            elif self.workers > 1 :
+                self.set_boundaries_parallel(spatial_units, spatial_index, keys)
+            else :
+                self.set_boundaries_serial(spatial_units, spatial_index, keys)
+            store.save(fingerprints)
         else :
             ToolboxLogger.info("Points: {}".format(len(points)))
-            layer = arcpy.management.MakeFeatureLayer(
-                in_features=os.path.join(self.inspectionDataSource, self.SPATIAL_UNIT_NAME),
-                out_layer="{}_layer".format(self.SPATIAL_UNIT_NAME),
-                where_clause="{} = '{}'".format(self.SPATIAL_UNIT_LEGAL_ID_FIELD, self.legal_id),
-                workspace="in_memory")
-            
-            selected_units = arcpy.management.SelectLayerByLocation(
-                in_layer=os.path.join(self.inspectionDataSource, self.SPATIAL_UNIT_NAME),
-                overlap_type="WITHIN_A_DISTANCE", 
-                select_features=layer[0],
-                search_distance="5 Meters",
-                selection_type="NEW_SELECTION")
-
-            FIDSet = arcpy.Describe(selected_units[0]).FIDset
-            records = [int(FID) for FID in FIDSet.split(";")] if FIDSet else []
-            spatial_units = self.get_spatialunits(
-                filter="{} IN ({})".format("OBJECTID", ",".join([str(record) for record in records])),
-                geometry=True)
+            spatial_units = self.get_spatialunits_within_distance(self.legal_id, 5)
 
             su0 = [x for x in spatial_units if x[self.SPATIAL_UNIT_LEGAL_ID_FIELD] == self.legal_id][0]
             spatial_units = [x for x in spatial_units if x[self.SPATIAL_UNIT_LEGAL_ID_FIELD] != self.legal_id]
             ToolboxLogger.info("Spatial Units: {}".format(len(spatial_units) + 1))
 
-            self.set_spatialunit_boundaries(su0, spatial_units, points)
-
-        anchor_points_for_update = [p for p in points if p[self.POINTS_TYPE_FIELD] == "Anchor"]
-        ToolboxLogger.debug("Anchor Points for update: {}".format(len(anchor_points_for_update)))
-        ToolboxLogger.debug("Vertex Points: {}".format(len(points) - len(anchor_points_for_update)))
+            self.set_spatialunit_boundaries(su0, spatial_units)
 
-        point_ids = [p[self.POINTS_ID_FIELD] for p in anchor_points_for_update]
-        self.update_points(
-            fields=[self.POINTS_TYPE_FIELD], 
-            values=["Anchor"], 
-            filter=ArcpyDataAccess.getWhereClause(self.POINTS_ID_FIELD, point_ids))
+        self.set_point_types(points)
 
         anchor_points = self.get_points(filter="{} = 'Anchor'".format(self.POINTS_TYPE_FIELD))
         ToolboxLogger.debug("Anchor Points: {}".format(len(anchor_points)))
    
     @ToolboxLogger.log_method
-    def add_boundary(self, geometry, description):
-        values = []
-        value = tuple([geometry, description])
-        values.append(value)
+    def add_boundary(self, geometry, description, spatial_units):
+        with self.da.batch() as batch :
+            batch.insert(self.BOUNDARY_NAME, [self.GEOMETRY_FIELD, self.BOUNDARY_DESCRIPTION_FIELD], [tuple([geometry, description])])
+            boundaries = batch.flush().get(self.BOUNDARY_NAME)
+            boundary = boundaries[0] if boundaries else None
+            ToolboxLogger.debug("{} {}", self.BOUNDARY_NAME, boundary[self.BOUNDARY_ID_FIELD] if boundary else "")
 
-        boundaries = self.insert_boundaries([self.GEOMETRY_FIELD, self.BOUNDARY_DESCRIPTION_FIELD], values)
-        boundary = boundaries[0] if boundaries else None
-        ToolboxLogger.debug("{} {}".format(self.BOUNDARY_NAME, boundary[self.BOUNDARY_ID_FIELD] if boundary else ""))
+            if boundary :
+                values = [tuple([spatial_unit["GlobalID"], boundary[self.BOUNDARY_ID_FIELD]]) for spatial_unit in spatial_units]
+                batch.insert(self.SPATIAL_UNIT_BOUNDARY_NAME, [self.SPATIAL_UNIT_FK_FIELD, self.BOUNDARY_FK_FIELD], values)
 
         return boundary
 
-    @ToolboxLogger.log_method
-    def add_spatialunit_boundary(self, spatial_unit, boundary):
-        values = []
-        value = tuple([spatial_unit["GlobalID"], boundary[self.BOUNDARY_ID_FIELD]])
-        values.append(value)
-        
-        spatialunits_boundaries = self.insert_spatialunits_boundaries([self.SPATIAL_UNIT_FK_FIELD, self.BOUNDARY_FK_FIELD], values)
-        spatialUnit_boundary = spatialunits_boundaries[0] if spatialunits_boundaries else None    
-        return spatialUnit_boundary
-
-
     @ToolboxLogger.log_method
     def set_approvals(self) :
-        spatialunits = self.get_spatialunits()
-        for spatialunit in spatialunits:
-            self.set_approvals_by_spatialunit(spatialunit)
+        counts = self.approval_reconciler().reconcile()
+        ToolboxLogger.info("Approvals added: {} already present: {}", counts["added"], counts["present"])
+        return counts
 
+    @ToolRunHooks.run
     @ToolboxLogger.log_method
     def execute(self) :
-        self.set_boundaries()
+        if self.use_snapshot :
+            self.load_snapshot()
+        try :
+            self.set_boundaries()
+        finally :
+            self.release_snapshot()
         #self.set_approvals()
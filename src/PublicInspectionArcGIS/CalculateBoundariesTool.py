@@ -1,6 +1,6 @@
 import arcpy
 
-from PublicInspectionArcGIS.Utils import ARCGIS_HANDLER, STREAM_HANDLER, ToolboxLogger
+from PublicInspectionArcGIS.Utils import ARCGIS_HANDLER, STREAM_HANDLER, ToolboxLogger, ToolRunHooks
 from PublicInspectionArcGIS.ToolsLib import PublicInspectionTools
 
 class CalculateBoundariesTool(object):
@@ -9,6 +9,7 @@ class CalculateBoundariesTool(object):
         self.label = "Calculate All Boundaries"
         self.description = "Calculate Boundaries All Spatial Units for Public Inspection"
         self.alias = "CalculateBoundariesTool"
+        self.Params = {"workers": 0, "incremental": 1, "topology": 2}
         
         self.canRunInBackground = True
 
@@ -26,6 +27,37 @@ class CalculateBoundariesTool(object):
     def getParameterInfo(self):
         """Define parameter definitions"""
         params = []
+
+        param = arcpy.Parameter(
+            displayName="Worker Processes",
+            name="workers",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input",
+        )
+        param.value = 1
+        params.insert(self.Params["workers"], param)
+
+        param = arcpy.Parameter(
+            displayName="Only Changed Spatial Units",
+            name="incremental",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input",
+        )
+        param.value = False
+        params.insert(self.Params["incremental"], param)
+
+        param = arcpy.Parameter(
+            displayName="Use Shared Edge Topology",
+            name="topology",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input",
+        )
+        param.value = False
+        params.insert(self.Params["topology"], param)
+
         return params
 
     def isLicensed(self):
@@ -43,9 +75,14 @@ class CalculateBoundariesTool(object):
         parameter.  This method is called after internal validation."""
         return
 
+    @ToolRunHooks.run
     def execute(self, parameters, messages):
         """The source code of the tool."""
         if self.tool is not None:
+            workers = parameters[self.Params["workers"]].value
+            self.tool.workers = workers if workers else 1
+            self.tool.incremental = bool(parameters[self.Params["incremental"]].value)
+            self.tool.use_topology = bool(parameters[self.Params["topology"]].value)
             self.tool.execute()
 
         return
@@ -1,154 +1,187 @@
 
-import arcpy
 import os
-from arcpy import da
-from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration
-from PublicInspectionArcGIS.ArcpyDataAccess import ArcpyDataAccess
+from concurrent.futures import ProcessPoolExecutor
+from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration, ToolRunHooks
+from PublicInspectionArcGIS.DataAccess import DataAccess
 from PublicInspectionArcGIS.PublicInspection import PublicInspection
+from PublicInspectionArcGIS.CertificateRenderer import CertificateRenderer, CertificateError, NEIGHBOR_SLOTS, init_renderer, render_certificate
+from PublicInspectionArcGIS.BoundaryWorker import configure_executable
 from datetime import date
-from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfgen import canvas
 
 class CalculateCertificate(PublicInspection):
-    
-    def __init__(self, configuration : Configuration, aprx : arcpy.mp.ArcGISProject,legal_id:str= None,visitor_contact:str= None) :
-        super().__init__(configuration, aprx)
+
+    def __init__(self, configuration : Configuration, aprx = None, legal_id:str= None, visitor_contact:str= None, da : DataAccess = None, folder = None) :
+        super().__init__(configuration, aprx, da, folder)
         self.legal_id=legal_id
         self.visitor_contact=visitor_contact
-    
-    
+        self.legal_ids = None
+        self.all_approved = False
+        self.workers = 1
+
+        self.image_path = os.path.join(self.folder, "img")
+        self.signatures_path = os.path.join(self.folder, "Signatures")
+        self.certificates_path = os.path.join(self.folder, "certificate")
+
+    def get_by_ids(self, get_function, field, ids, fields="*") :
+        ids = list(dict.fromkeys(id for id in ids if id is not None))
+        if not ids :
+            return []
+        return get_function(fields=fields, filter=DataAccess.getWhereClause(field, ids))
+
+    @ToolboxLogger.log_method
+    def get_approved_legal_ids(self) :
+        boundaries = self.get_boundaries(fields=[self.BOUNDARY_ID_FIELD, self.BOUNDARY_STATE_FIELD])
+        approved = set(b[self.BOUNDARY_ID_FIELD] for b in boundaries if b[self.BOUNDARY_STATE_FIELD] == "Approved")
+
+        states = {}
+        for row in self.get_spatialunits_boundaries(fields=[self.SPATIAL_UNIT_FK_FIELD, self.BOUNDARY_FK_FIELD]) :
+            spatialunit_id = row[self.SPATIAL_UNIT_FK_FIELD]
+            states[spatialunit_id] = states.get(spatialunit_id, True) and row[self.BOUNDARY_FK_FIELD] in approved
+
+        spatialunits = self.get_spatialunits(fields=[self.SPATIAL_UNIT_ID_FIELD, self.SPATIAL_UNIT_LEGAL_ID_FIELD])
+        return [su[self.SPATIAL_UNIT_LEGAL_ID_FIELD] for su in spatialunits if states.get(su[self.SPATIAL_UNIT_ID_FIELD])]
+
+    @ToolboxLogger.log_method
+    def get_certificates(self, legal_ids) :
+        spatialunits = self.get_by_ids(self.get_spatialunits, self.SPATIAL_UNIT_LEGAL_ID_FIELD, legal_ids)
+        rights = self.get_by_ids(self.get_rights, self.SPATIAL_UNIT_FK_FIELD, [su[self.SPATIAL_UNIT_ID_FIELD] for su in spatialunits])
+        parties = self.get_by_ids(self.get_parties, self.RIGHT_FK_FIELD, [r[self.RIGHT_ID_FIELD] for r in rights])
+
+        spatialunits_boundaries = self.get_by_ids(self.get_spatialunits_boundaries, self.SPATIAL_UNIT_FK_FIELD,
+            [su[self.SPATIAL_UNIT_ID_FIELD] for su in spatialunits], fields=[self.SPATIAL_UNIT_FK_FIELD, self.BOUNDARY_FK_FIELD])
+        boundaries = self.get_by_ids(self.get_boundaries, self.BOUNDARY_ID_FIELD,
+            [row[self.BOUNDARY_FK_FIELD] for row in spatialunits_boundaries], fields=[self.BOUNDARY_ID_FIELD])
+        approvals = self.get_by_ids(self.get_approvals, self.BOUNDARY_FK_FIELD,
+            [b[self.BOUNDARY_ID_FIELD] for b in boundaries], fields=[self.BOUNDARY_FK_FIELD, self.PARTY_FK_FIELD])
+
+        approval_parties = {p[self.PARTY_ID_FIELD]: p for p in self.get_by_ids(self.get_parties, self.PARTY_ID_FIELD, [a[self.PARTY_FK_FIELD] for a in approvals])}
+        approval_rights = self.get_by_ids(self.get_rights, self.RIGHT_ID_FIELD, [p[self.RIGHT_FK_FIELD] for p in approval_parties.values()])
+        approval_spatialunits = {su[self.SPATIAL_UNIT_ID_FIELD]: su for su in self.get_by_ids(self.get_spatialunits, self.SPATIAL_UNIT_ID_FIELD,
+            [r[self.SPATIAL_UNIT_FK_FIELD] for r in approval_rights], fields=[self.SPATIAL_UNIT_ID_FIELD, self.SPATIAL_UNIT_NAME_FIELD])}
+
+        rights_by_spatialunit = {}
+        for right in rights :
+            rights_by_spatialunit.setdefault(right[self.SPATIAL_UNIT_FK_FIELD], []).append(right)
+        parties_by_right = {}
+        for party in parties :
+            parties_by_right.setdefault(party[self.RIGHT_FK_FIELD], []).append(party)
+        boundary_order = {b[self.BOUNDARY_ID_FIELD]: index for index, b in enumerate(boundaries)}
+        boundaries_by_spatialunit = {}
+        for row in spatialunits_boundaries :
+            if row[self.BOUNDARY_FK_FIELD] in boundary_order :
+                boundaries_by_spatialunit.setdefault(row[self.SPATIAL_UNIT_FK_FIELD], []).append(row[self.BOUNDARY_FK_FIELD])
+        approvals_by_boundary = {}
+        for approval in approvals :
+            approvals_by_boundary.setdefault(approval[self.BOUNDARY_FK_FIELD], []).append(approval)
+        spatialunits_by_right = {}
+        for right in approval_rights :
+            spatialunits_by_right.setdefault(right[self.RIGHT_ID_FIELD], []).append(approval_spatialunits.get(right[self.SPATIAL_UNIT_FK_FIELD]))
+
+        today = date.today()
+        certificates = []
+        for spatialunit in spatialunits :
+            spatialunit_rights = rights_by_spatialunit.get(spatialunit[self.SPATIAL_UNIT_ID_FIELD])
+            owners = parties_by_right.get(spatialunit_rights[-1][self.RIGHT_ID_FIELD]) if spatialunit_rights else None
+            if not owners :
+                ToolboxLogger.info("Spatial Unit '{}' has no parties".format(spatialunit[self.SPATIAL_UNIT_LEGAL_ID_FIELD]))
+                continue
+            owner = owners[-1]
+
+            neighbors = []
+            boundary_ids = sorted(boundaries_by_spatialunit.get(spatialunit[self.SPATIAL_UNIT_ID_FIELD], []), key=lambda id : boundary_order[id])
+            for slot, boundary_id in enumerate(boundary_ids, start=1) :
+                if slot not in NEIGHBOR_SLOTS :
+                    break
+                for approval in approvals_by_boundary.get(boundary_id, []) :
+                    party = approval_parties.get(approval[self.PARTY_FK_FIELD])
+                    if party is None or party[self.PARTY_FIRST_NAME_FIELD] == owner[self.PARTY_FIRST_NAME_FIELD] :
+                        continue
+                    for neighbor_spatialunit in spatialunits_by_right.get(party[self.RIGHT_FK_FIELD], []) :
+                        if neighbor_spatialunit :
+                            neighbors.append({
+                                "slot": slot,
+                                "party_id": party[self.PARTY_ID_FIELD],
+                                "first_name": party[self.PARTY_FIRST_NAME_FIELD],
+                                "last_name": party[self.PARTY_LAST_NAME_FIELD],
+                                "id_number": party[self.PARTY_ID_NUMBER_FIELD],
+                                "spatialunit_name": neighbor_spatialunit[self.SPATIAL_UNIT_NAME_FIELD]
+                            })
+
+            certificates.append({
+                "file_name": "{}.pdf".format(spatialunit[self.SPATIAL_UNIT_LEGAL_ID_FIELD]),
+                "legal_id": spatialunit[self.SPATIAL_UNIT_LEGAL_ID_FIELD],
+                "spatialunit_name": spatialunit[self.SPATIAL_UNIT_NAME_FIELD],
+                "location": "",
+                "registration_page": "",
+                "party": {
+                    "id": owner[self.PARTY_ID_FIELD],
+                    "first_name": owner[self.PARTY_FIRST_NAME_FIELD],
+                    "last_name": owner[self.PARTY_LAST_NAME_FIELD],
+                    "id_number": owner[self.PARTY_ID_NUMBER_FIELD]
+                },
+                "neighbors": neighbors,
+                "date": "{}/{}/{}".format(today.day, today.month, today.year),
+                "visitor_contact": self.visitor_contact if self.visitor_contact else ""
+            })
+        return certificates
+
+    @ToolboxLogger.log_method
+    def render_certificates(self, certificates) :
+        if self.workers > 1 and len(certificates) > 1 :
+            configure_executable()
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_renderer,
+                    initargs=(self.image_path, self.signatures_path, self.certificates_path)) as executor :
+                return list(executor.map(render_certificate, certificates, chunksize=8))
+
+        renderer = CertificateRenderer(self.image_path, self.signatures_path, self.certificates_path)
+        return [renderer.timed_render(certificate) for certificate in certificates]
+
+    def log_timings(self, timings) :
+        for legal_id, seconds, error in timings :
+            if error :
+                ToolboxLogger.error("Certificate '{}' failed: {}".format(legal_id, error))
+            else :
+                ToolboxLogger.debug("Certificate '{}': {:.3f}s", legal_id, seconds)
+
+        rendered = [t for t in timings if not t[2]]
+        if rendered :
+            slowest = max(rendered, key=lambda t : t[1])
+            total = sum(t[1] for t in rendered)
+            ToolboxLogger.info("Certificates: {} rendered, {} failed".format(len(rendered), len(timings) - len(rendered)))
+            ToolboxLogger.info("Render Time: total {:.2f}s, average {:.3f}s, slowest {:.3f}s ({})".format(total, total / len(rendered), slowest[1], slowest[0]))
+
+    @ToolboxLogger.log_method
+    def generate_certificates(self, legal_ids, required = True) :
+        """Renders the certificates of legal_ids and raises CertificateError if any render failed or, when
+        required, if a requested legal_id produced no certificate (unknown legal_id or no parties)."""
+        certificates = self.get_certificates(legal_ids)
+        ToolboxLogger.info("Certificates to render: {}".format(len(certificates)))
+        timings = self.render_certificates(certificates)
+        self.log_timings(timings)
+
+        failed = [(legal_id, error) for legal_id, seconds, error in timings if error]
+        if required :
+            generated = set(certificate["legal_id"] for certificate in certificates)
+            failed.extend((legal_id, "no certificate data") for legal_id in dict.fromkeys(legal_ids) if legal_id not in generated)
+        if failed :
+            raise CertificateError(failed)
+        return timings
+
     @ToolboxLogger.log_method
     def getdata(self) :
-       
-        image_path=os.path.join(self.folder,"img")
-        image_path_firm=os.path.join(self.folder,"Signatures")
-        SpatialUni = self.da.query(self.SPATIAL_UNIT_NAME, "*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_LEGAL_ID_FIELD,  self.legal_id))
-        for SpatialUnis in SpatialUni:
-            right = self.da.query(self.RIGHT_NAME, [self.RIGHT_ID_FIELD], ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_FK_FIELD, SpatialUnis[self.SPATIAL_UNIT_ID_FIELD]))
-        for rights in right:
-            partie = self.da.query(self.PARTY_NAME, "*", ArcpyDataAccess.getWhereClause(self.RIGHT_FK_FIELD, rights[self.RIGHT_ID_FIELD]))
-        for parties in partie:
-            id_firm=  parties[self.PARTY_ID_FIELD]
-            First_Name = parties[self.PARTY_FIRST_NAME_FIELD]
-            Last_Name = parties[self.PARTY_LAST_NAME_FIELD]
-            id_number = parties[self.PARTY_ID_NUMBER_FIELD]
-            Spatial = self.da.query(self.SPATIAL_UNIT_NAME, "*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_LEGAL_ID_FIELD,  self.legal_id))
-            for SpatialU in Spatial:
-                spatialunit_name=SpatialU[self.SPATIAL_UNIT_NAME_FIELD]
-                CadastralCertificate = SpatialU[self.SPATIAL_UNIT_LEGAL_ID_FIELD]
-             
-    
-            Namepdf="{}.pdf".format(CadastralCertificate)
-            Firmpdf="{}.png".format(id_firm) 
-            Name= First_Name 
-            last = Last_Name 
-            Document= id_number
-            NameSpacial=spatialunit_name  
-            Location=""    
-            CadastralCertificates=CadastralCertificate
-            RegistrationPage="" 
-  
-            PDF_path=os.path.join(self.folder,"certificate",Namepdf)
-            c = canvas.Canvas(PDF_path)
-            c.rect(10, 10, 575, 820)
-            c.drawImage(image_path+"/logo.png", 20, 750,width=200, height=70)
-            c.setFont("Times-Roman", 18)
-            c.drawString(220, 750,"Acta de Colindancia")
-            c.setFont("Times-Roman", 11)
-            c.rect(20, 655, 555, 80)
-            c.drawString(40, 720,"Nobre del Interesado: "+ Name +" " +last)
-            c.drawString(40, 700,"Documento: "+Document)
-            c.drawString(40, 680,"Firma: ")
-            c.drawString(340, 720,"Nombre del Predio: "+NameSpacial)
-            c.drawString(340, 700,"Ubicación: "+Location)
-            c.drawString(340, 680,"Cedula Catastral: "+CadastralCertificates)
-            c.drawString(340, 660,"Folio de Matricula: "+RegistrationPage)
-            c.drawImage(image_path_firm+"\\"+Firmpdf, 80, 660,width=190, height=40)
-            c.rect(20, 370, 555, 275)
-            c.drawImage(image_path+"/Mapa.png", 22, 373,width=550, height=270)
-            c.rect(20, 80, 555,275)
-            c.setFont("Times-Roman", 10)
-            c.drawString(22, 340,"Los abajo firmantes, como colindantes del predio objeto de levantamiento topográfico realizado en la fecha referida,manifiestan que han ")
-            c.drawString(22, 320,"asistido y aprobado el procedimiento realizado por el topógrafo, y estan de acuerdo con los linderos señalados durante este procedimiento")
-            SpatialUni = self.da.query(self.SPATIAL_UNIT_NAME, "*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_LEGAL_ID_FIELD,  self.legal_id))
-            for SpatialUnis in SpatialUni:
-                boundaries=self.get_boundaries_by_spatialunit(SpatialUnis)
-                # bundaries = self.da.query(self.BOUNDARY_NAME, [self.BOUNDARY_FK_FIELD], ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_FK_FIELD, SpatialUnis[self.SPATIAL_UNIT_ID_FIELD]))
-                sa=0
-            for boundary in boundaries: 
-                aprovals = self.da.query(self.APPROVAL_NAME,"*", ArcpyDataAccess.getWhereClause(self.BOUNDARY_FK_FIELD, boundary[self.BOUNDARY_ID_FIELD]))
-                sa=sa+1 
-                for aproval in aprovals:
-                    print( aproval[self.PARTY_ID_FIELD])
-                    print( aproval[self.PARTY_FK_FIELD])
-                    partiesa = self.da.query(self.PARTY_NAME,"*", ArcpyDataAccess.getWhereClause(self.PARTY_ID_FIELD, aproval[self.PARTY_FK_FIELD]))
-                
-                    for partiesas in partiesa:
-                        if partiesas[self.PARTY_FIRST_NAME_FIELD]==Name:
-                            print("")
-                        else:    
-                            
-                            if sa==1:
-                                
-                                rights = self.da.query(self.RIGHT_NAME,"*", ArcpyDataAccess.getWhereClause(self.RIGHT_ID_FIELD, partiesas[self.RIGHT_FK_FIELD]))
-                                for right in rights:
-                                    spatialUnits = self.da.query(self.SPATIAL_UNIT_NAME,"*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_ID_FIELD, right[self.SPATIAL_UNIT_FK_FIELD]))
-                                for spatialUnit in spatialUnits:
-                                    c.setFont("Times-Roman", 
-                                              10)
-                                    c.drawString(30, 280,"Nombre del Interesado: {} {}".format(partiesas[self.PARTY_FIRST_NAME_FIELD] , partiesas[self.PARTY_LAST_NAME_FIELD]))
-                                    c.drawString(260, 280,"Documento: {}".format(partiesas[self.PARTY_ID_NUMBER_FIELD]))
-                                    c.drawString(30, 260,"Nombre del Predio: {} ".format(spatialUnit[self.SPATIAL_UNIT_NAME_FIELD]))
-                                    c.drawString(360, 260,"Firma: ")
-                                    c.drawImage(image_path_firm+"\\{}.png".format(partiesas[self.PARTY_ID_FIELD]), 390, 255,width=180, height=40)
-                                    
-                              
-                            if sa==2:
-                                rights = self.da.query(self.RIGHT_NAME,"*", ArcpyDataAccess.getWhereClause(self.RIGHT_ID_FIELD, partiesas[self.RIGHT_FK_FIELD]))
-                                for right in rights:
-                                    spatialUnits = self.da.query(self.SPATIAL_UNIT_NAME,"*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_ID_FIELD, right[self.SPATIAL_UNIT_FK_FIELD]))
-                                for spatialUnit in spatialUnits:
-                                    c.setFont("Times-Roman", 10)
-                                    c.drawString(30, 235,"Nombre del Interesado: {} {}".format(partiesas[self.PARTY_FIRST_NAME_FIELD] , partiesas[self.PARTY_LAST_NAME_FIELD]))
-                                    c.drawString(260, 235,"Documento: {}".format(partiesas[self.PARTY_ID_NUMBER_FIELD]))
-                                    c.drawString(30, 215,"Nombre del Predio: {} ".format(spatialUnit[self.SPATIAL_UNIT_NAME_FIELD]))
-                                    c.drawString(360, 215,"Firma: ")
-                                    c.drawImage(image_path_firm+"\\{}.png".format(partiesas[self.PARTY_ID_FIELD]), 390, 210,width=180, height=40)
-                                  
-                            if sa==3:
-                                rights = self.da.query(self.RIGHT_NAME,"*", ArcpyDataAccess.getWhereClause(self.RIGHT_ID_FIELD, partiesas[self.RIGHT_FK_FIELD]))
-                                for right in rights:
-                                    spatialUnits = self.da.query(self.SPATIAL_UNIT_NAME,"*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_ID_FIELD, right[self.SPATIAL_UNIT_FK_FIELD]))
-                                for spatialUnit in spatialUnits:
-                                    c.setFont("Times-Roman", 10)
-                                    c.drawString(30, 190,"Nombre del Interesado: {} {}".format(partiesas[self.PARTY_FIRST_NAME_FIELD] , partiesas[self.PARTY_LAST_NAME_FIELD]))
-                                    c.drawString(260, 190,"Documento: {}".format(partiesas[self.PARTY_ID_NUMBER_FIELD]))
-                                    c.drawString(30, 170,"Nombre del Predio:{} ".format(spatialUnit[self.SPATIAL_UNIT_NAME_FIELD]))
-                                    c.drawString(360, 170,"Firma: ")
-                                    c.drawImage(image_path_firm+"\\{}.png".format(partiesas[self.PARTY_ID_FIELD]), 390, 165,width=180, height=40)
-                            if sa==4:
-                                rights = self.da.query(self.RIGHT_NAME,"*", ArcpyDataAccess.getWhereClause(self.RIGHT_ID_FIELD, partiesas[self.RIGHT_FK_FIELD]))
-                                for right in rights:
-                                    spatialUnits = self.da.query(self.SPATIAL_UNIT_NAME,"*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_ID_FIELD, right[self.SPATIAL_UNIT_FK_FIELD]))
-                                for spatialUnit in spatialUnits:
-                                    c.setFont("Times-Roman", 10)
-                                    c.drawString(30, 145,"Nombre del Interesado: {} {}".format(partiesas[self.PARTY_FIRST_NAME_FIELD] , partiesas[self.PARTY_LAST_NAME_FIELD]))
-                                    c.drawString(260, 145,"Documento: {}".format(partiesas[self.PARTY_ID_NUMBER_FIELD]))
-                                    c.drawString(30, 125,"Nombre del Predio: {} ".format(spatialUnit[self.SPATIAL_UNIT_NAME_FIELD]))
-                                    c.drawString(360, 130,"Firma: ")
-                                    c.drawImage(image_path_firm+"\\{}.png".format(partiesas[self.PARTY_ID_FIELD]), 390, 125,width=180, height=40)
-            today = date.today()               
-            c.rect(20, 20, 555, 60)
-            c.rect(20, 20, 278, 60)
-            c.drawString(30, 68,"Firma del Porfesional : ")
-            c.drawString(30, 30,"Fecha:  {}".format(today.day)+ "/{}".format(today.month)+"/{} ".format(today.year))
-            c.drawString(302, 68,"Observaciones:")
-            c.drawString(302, 30,"El contacto de la visita fue: "+ self.visitor_contact)
-            c.save()
-    
-    
+        return self.generate_certificates([self.legal_id])
+
+    @ToolRunHooks.run
     @ToolboxLogger.log_method
     def execute(self) :
-        self.getdata()
\ No newline at end of file
+        if self.use_snapshot :
+            self.load_snapshot()
+        try :
+            if self.all_approved :
+                return self.generate_certificates(self.get_approved_legal_ids(), required=False)
+            elif self.legal_ids :
+                return self.generate_certificates(self.legal_ids)
+            else :
+                return self.getdata()
+        finally :
+            self.release_snapshot()
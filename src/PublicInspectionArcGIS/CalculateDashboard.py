@@ -1,9 +1,9 @@
 # -*- coding:utf-8 -*-
-import arcpy
 import os
-from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration
-from PublicInspectionArcGIS.ArcpyDataAccess import ArcpyDataAccess
+from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration, ToolRunHooks, JsonFile
+from PublicInspectionArcGIS.DataAccess import DataAccess
 from PublicInspectionArcGIS.PublicInspection import PublicInspection
+from PublicInspectionArcGIS.DashboardStatistics import DashboardStatistics, GENDERS
 
 from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet
@@ -18,14 +18,30 @@ from reportlab.graphics.widgets.markers import makeMarker
 
 class CalculateDashboard(PublicInspection):
     
-    def __init__(self, configuration : Configuration, aprx : arcpy.mp.ArcGISProject,legal_id:str= None) :
-        super().__init__(configuration, aprx)
+    def __init__(self, configuration : Configuration, aprx = None, legal_id:str= None, da : DataAccess = None, folder = None) :
+        super().__init__(configuration, aprx, da, folder)
         self.legal_id=legal_id
-    
-    
+
     @ToolboxLogger.log_method
-    def getdata(self) :
+    def get_statistics(self) :
+        statistics = DashboardStatistics(
+            self.SPATIAL_UNIT_ID_FIELD, self.SPATIAL_UNIT_LEGAL_ID_FIELD, self.SPATIAL_UNIT_SHAPE_AREA,
+            self.SPATIAL_UNIT_FK_FIELD, self.BOUNDARY_ID_FIELD, self.BOUNDARY_FK_FIELD, self.BOUNDARY_STATE_FIELD, self.PARTY_GENDER_FIELD,
+            self.APPROVAL_IS_APPROVED_FIELD)
+
+        meters_per_unit = self.get_meters_per_unit()
+        return statistics.compute(
+            self.da.frame(self.PARTY_NAME, [self.PARTY_GENDER_FIELD], categorical=[self.PARTY_GENDER_FIELD]),
+            self.da.frame(self.BOUNDARY_NAME, [self.BOUNDARY_ID_FIELD, self.BOUNDARY_STATE_FIELD], categorical=[self.BOUNDARY_STATE_FIELD]),
+            self.da.frame(self.SPATIAL_UNIT_BOUNDARY_NAME, [self.SPATIAL_UNIT_FK_FIELD, self.BOUNDARY_FK_FIELD]),
+            self.da.frame(self.SPATIAL_UNIT_NAME, [self.SPATIAL_UNIT_ID_FIELD, self.SPATIAL_UNIT_LEGAL_ID_FIELD, self.SPATIAL_UNIT_SHAPE_AREA]),
+            self.da.frame(self.APPROVAL_NAME, [self.APPROVAL_IS_APPROVED_FIELD], categorical=[self.APPROVAL_IS_APPROVED_FIELD]),
+            area_factor=meters_per_unit * meters_per_unit / 10000)
 
+    @ToolboxLogger.log_method
+    def getdata(self) :
+        statistics = self.get_statistics()
+        JsonFile.writeFile(os.path.join(self.folder, "Dashboard", "Dashboard.json"), statistics)
 
         PDF_path=os.path.join(self.folder,"Dashboard",'Dashboard.pdf')
         doc = SimpleDocTemplate(PDF_path, pagesize=A4)
@@ -37,9 +53,7 @@ class CalculateDashboard(PublicInspection):
         # ==========
         d = Drawing(400, 200)
 
-        # spatial_units = self.da.query(self.SPATIAL_UNIT_NAME, geometry=True) 
-        partys = self.da.query(self.PARTY_NAME, "*")
-        RightholdersRegisteredp=format(len(partys))
+        RightholdersRegisteredp=format(statistics["rightholders"])
 
         d.add(String(100,220, 'Dashboard ', fontSize=38, fillColor=colors.black))
         # frame 1
@@ -51,16 +65,7 @@ class CalculateDashboard(PublicInspection):
         d.add(String(10,120, 'Rightholders', fontSize=18, fillColor=colors.black))
         d.add(String(10,100, 'Registered', fontSize=18, fillColor=colors.black))
         
-        Boundarys = self.da.query(self.BOUNDARY_NAME, "*")
-        Surveye=0
-        for Boundary in Boundarys:
-            if Boundary[self.BOUNDARY_STATE_FIELD]=="Approved":
-                Surveyeds = self.da.query(self.SPATIAL_UNIT_BOUNDARY_NAME, "*", ArcpyDataAccess.getWhereClause(self.BOUNDARY_FK_FIELD,  Boundary[self.BOUNDARY_ID_FIELD]))
-                for Surveyed in Surveyeds:
-                    Spatialunits = self.da.query(self.SPATIAL_UNIT_NAME, "*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_ID_FIELD,  Surveyed[self.SPATIAL_UNIT_FK_FIELD]))
-                    for Spatialunit in Spatialunits:
-                        if Spatialunit:
-                            Surveye= Surveye+1
+        Surveye=statistics["surveyed"]
 
         # frame 2
         r =(Rect(126, 80, 180, 100, fillColor=colors.violet))
@@ -76,7 +81,7 @@ class CalculateDashboard(PublicInspection):
         r.strokeColor = colors.aquamarine  # otra forma de agregar propiedades
         r.strokeWidth = 3
         d.add(r)
-        d.add(String(446,140, '0', fontSize=18, fillColor=colors.black))
+        d.add(String(446,140, "{:.2f}".format(statistics["hectares"]), fontSize=18, fillColor=colors.black))
         d.add(String(426,120, 'Hectares', fontSize=18, fillColor=colors.black))
         d.add(String(426,100, 'Covered', fontSize=18, fillColor=colors.black))
 
@@ -85,20 +90,11 @@ class CalculateDashboard(PublicInspection):
         #EJEMPLO 02: Gráficos Circulares
         #==========
         from reportlab.graphics.charts.piecharts import Pie
-        Boundarys = self.da.query(self.BOUNDARY_NAME, "*")
-        Approved=0
-        In_Process=0
-        No_Processed=0
-        Rejected=0
-        for Boundary in Boundarys:
-            if Boundary[self.BOUNDARY_STATE_FIELD]=="Approved":
-                Approved= Approved+1
-            if Boundary[self.BOUNDARY_STATE_FIELD]=="In Process":
-                In_Process=In_Process+1  
-            if Boundary[self.BOUNDARY_STATE_FIELD]=="No Processed":
-                No_Processed= No_Processed+1
-            if Boundary[self.BOUNDARY_STATE_FIELD]=="Rejected":
-                Rejected=Rejected+1  
+        boundary_states = statistics["boundary_states"]
+        Approved=boundary_states["Approved"]
+        In_Process=boundary_states["In Process"]
+        No_Processed=boundary_states["No Processed"]
+        Rejected=boundary_states["Rejected"]
 
         d = Drawing(-400, 50)
         pc = Pie()
@@ -167,15 +163,8 @@ class CalculateDashboard(PublicInspection):
 
         d = Drawing(400, 200)
          
-        Male=0
-        Female=0
-        for party in partys:
-            if party[self.PARTY_GENDER_FIELD]=="Male":
-                Male= Male+1
-            if party[self.PARTY_GENDER_FIELD]=="Female":
-                Female=Female+1  
         data = [
-                (Female,Male)
+                tuple(statistics["genders"][gender] for gender in GENDERS)
                 ]
         bc =  HorizontalBarChart()
         bc.x = 140
@@ -185,13 +174,13 @@ class CalculateDashboard(PublicInspection):
         bc.data = data
         bc.strokeColor = colors.black
         bc.valueAxis.valueMin = 0
-        bc.valueAxis.valueMax = 50
+        bc.valueAxis.valueMax = max(50, *data[0])
         bc.valueAxis.valueStep = 5  #paso de distancia entre punto y punto
         bc.categoryAxis.labels.boxAnchor = 'ne'
         bc.categoryAxis.labels.dx = -8
         bc.categoryAxis.labels.dy = -2
         bc.categoryAxis.labels.angle = 30
-        bc.categoryAxis.categoryNames = ['Male','Female']
+        bc.categoryAxis.categoryNames = list(GENDERS)
         bc.groupSpacing = 10
         bc.barSpacing = 1
         #bc.categoryAxis.style = 'stacked'  # Una variación del gráfico
@@ -201,10 +190,7 @@ class CalculateDashboard(PublicInspection):
 
         # EJEMPLO 05: Dibujando alguna forma y texto
         # ==========
-        SpatialUnitSmallests = self.da.query(self.SPATIAL_UNIT_NAME, "*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_ID_FIELD,  "{9E8EC63E-D162-42FE-B9FD-27DCDB987221}"))
-        for SpatialUnitSmallest in SpatialUnitSmallests:
-            UnitSmallest = SpatialUnitSmallest[self.SPATIAL_UNIT_SHAPE_AREA]
-            UnitSmallest =UnitSmallest*100
+        UnitSmallest = "{:.2f} has".format(statistics["smallest"]["hectares"]) if statistics["smallest"] else "-"
         d = Drawing(400, 10)
         # frame 4
         r =(Rect(-70, 80, 180, 100, fillColor=colors.yellow))
@@ -221,12 +207,9 @@ class CalculateDashboard(PublicInspection):
         d.add(r)
         d.add(String(226,140, 'Average', fontSize=18, fillColor=colors.black))
         d.add(String(180,120, 'Spatialunit Size', fontSize=18, fillColor=colors.black))
-        d.add(String(226,100, '0.8 has', fontSize=18, fillColor=colors.black))
+        d.add(String(226,100, "{:.2f} has".format(statistics["average_hectares"]), fontSize=18, fillColor=colors.black))
 
-        SpatialUnitUnitLargests = self.da.query(self.SPATIAL_UNIT_NAME, "*", ArcpyDataAccess.getWhereClause(self.SPATIAL_UNIT_ID_FIELD,  "{4FA0579E-5E66-4339-9520-02498A50BF07}"))
-        for SpatialUnitUnitLargest in SpatialUnitUnitLargests:
-            UnitLargest = SpatialUnitUnitLargest[self.SPATIAL_UNIT_SHAPE_AREA]
-            UnitLargest =UnitLargest*100
+        UnitLargest = "{:.2f} has".format(statistics["largest"]["hectares"]) if statistics["largest"] else "-"
         # frame 6
         r =(Rect(326, 80, 180, 100, fillColor=colors.coral))
         r.strokeColor = colors.coral  # otra forma de agregar propiedades
@@ -241,6 +224,7 @@ class CalculateDashboard(PublicInspection):
         doc.build(story)
         os.system(PDF_path)
         
+    @ToolRunHooks.run
     @ToolboxLogger.log_method
     def execute(self) :
         self.getdata()
\ No newline at end of file
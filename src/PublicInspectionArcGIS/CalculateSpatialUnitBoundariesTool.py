@@ -1,6 +1,6 @@
 import arcpy
 
-from PublicInspectionArcGIS.Utils import ARCGIS_HANDLER, STREAM_HANDLER, ToolboxLogger
+from PublicInspectionArcGIS.Utils import ARCGIS_HANDLER, STREAM_HANDLER, ToolboxLogger, ToolRunHooks
 from PublicInspectionArcGIS.ToolsLib import PublicInspectionTools
 
 class CalculateSpatialUnitBoundariesTool(object):
@@ -66,6 +66,7 @@ class CalculateSpatialUnitBoundariesTool(object):
         parameter.  This method is called after internal validation."""
         return
 
+    @ToolRunHooks.run
     def execute(self, parameters, messages):
         """The source code of the tool."""
         if self.tool is not None:
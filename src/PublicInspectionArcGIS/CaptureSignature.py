@@ -1,14 +1,19 @@
-import arcpy
 import os
 
+try :
+    import arcpy
+    from PublicInspectionArcGIS.ArcpyDataAccess import ArcpyDataAccess
+except ImportError :
+    arcpy = None
+
 from datetime import datetime
-from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration
-from PublicInspectionArcGIS.ArcpyDataAccess import ArcpyDataAccess
+from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration, ToolRunHooks
+from PublicInspectionArcGIS.DataAccess import DataAccess
 from PublicInspectionArcGIS.PublicInspection import PublicInspection
 
 class CaptureSignatures(PublicInspection) :
-    def __init__(self, configuration : Configuration, aprx : arcpy.mp.ArcGISProject) :
-        super().__init__(configuration, aprx)
+    def __init__(self, configuration : Configuration, aprx = None, da : DataAccess = None, folder = None) :
+        super().__init__(configuration, aprx, da, folder)
         self.party = None
         self.spatialunit = None
         self.neighboring_approvals = None
@@ -25,9 +30,9 @@ class CaptureSignatures(PublicInspection) :
         self.matchField = "MatchID"
         self.pictureField = "PicturePath"
 
-        ToolboxLogger.info("Proyect File:           {}".format(aprx.filePath))
-        ToolboxLogger.info("Inspection Data Source: {}".format(self.inspectionDataSource))
-        ToolboxLogger.debug("Data Access Object:     {}".format(self.da))
+        self.enable_query_cache()
+
+        self.describe()
     
     @ToolboxLogger.log_method
     def setMatchTable(self) :
@@ -164,54 +169,70 @@ class CaptureSignatures(PublicInspection) :
 
             if os.path.exists(signatureFilePath) :
                 ToolboxLogger.info("Signature File: {}".format(signatureFilename))
-                self.setMatchTable()  
-
-                approvals = self.get_approvals(
-                    fields=[self.APPROVAL_ID_FIELD, self.PARTY_FK_FIELD, self.BOUNDARY_FK_FIELD],
-                    filter="{} = '{}'".format(self.PARTY_FK_FIELD, party_id))
-
-                if len(approvals) == 0 :
-                    self.set_approvals_by_spatialunit(self.spatialunit)
-                    approvals = self.get_approvals(
-                        fields=[self.APPROVAL_ID_FIELD, self.PARTY_FK_FIELD, self.BOUNDARY_FK_FIELD],
-                        filter="{} = '{}'".format(self.PARTY_FK_FIELD, party_id))
-
-                approvals_ids = ["'{}'".format(i[self.APPROVAL_ID_FIELD]) for i in approvals]
-
-                approval_signatures = self.get_aprprovalsignatures(
-                    fields=[self.APPROVAL_SIGNATURE_ID_FIELD, self.APPROVAL_FK_FIELD],
-                    filter="{} IN ({})".format(self.APPROVAL_FK_FIELD, ",".join(approvals_ids)))
-                approval_signatures_ids = ["'{}'".format(i[self.APPROVAL_SIGNATURE_ID_FIELD]) for i in approval_signatures]
-
-                self.da.delete(self.APPROVAL_SIGNATURE_ATTACH_NAME, 
-                    filter= "{} = '{}' AND {} IN ({})".format(self.APPROVAL_SIGNATURE_ATTACH_ATT_NAME_FIELD, signatureFilename, self.APPROVAL_SIGNATURE_FK_FIELD, ",".join(approval_signatures_ids)))
-
-                match_da = ArcpyDataAccess(arcpy.env.scratchGDB)
-
-                for approval_signature in approval_signatures :
-                    values = []
-                    value = tuple([approval_signature[self.APPROVAL_SIGNATURE_ID_FIELD], signatureFilePath])
-                    values.append(value)
-
-                    if os.path.exists(fingerPrintFilePath) :
-                        value = tuple([approval_signature[self.APPROVAL_SIGNATURE_ID_FIELD], fingerPrintFilePath])
-                        values.append(value)
-
-                    match_da.insert(self.matchtableName, [self.matchField, self.pictureField], values)
-                match_da = None
-
-                arcpy.AddAttachments_management(self.da.findTablePath(self.APPROVAL_SIGNATURE_NAME), 
-                    self.APPROVAL_SIGNATURE_ID_FIELD, 
-                    self.matchTablePath, 
-                    self.matchField, 
-                    self.pictureField)
-                
-                self.update_approvalstate(approvals)
-                self.update_boundaries_states(self.set_boundaries_states(approvals))
+                approvals = self.get_party_approvals(party_id)
+                self.attach_signatures(approvals, signatureFilename, signatureFilePath, fingerPrintFilePath)
+                self.approve_party(approvals)
         else :
             ToolboxLogger.info("Party not found")
 
+    @ToolboxLogger.log_method
+    def get_party_approvals(self, party_id) :
+        approvals = self.get_approvals(
+            fields=[self.APPROVAL_ID_FIELD, self.PARTY_FK_FIELD, self.BOUNDARY_FK_FIELD],
+            filter="{} = '{}'".format(self.PARTY_FK_FIELD, party_id))
+
+        if len(approvals) == 0 :
+            self.set_approvals_by_spatialunit(self.spatialunit)
+            approvals = self.get_approvals(
+                fields=[self.APPROVAL_ID_FIELD, self.PARTY_FK_FIELD, self.BOUNDARY_FK_FIELD],
+                filter="{} = '{}'".format(self.PARTY_FK_FIELD, party_id))
+        return approvals
+
+    @ToolboxLogger.log_method
+    def attach_signatures(self, approvals, signatureFilename, signatureFilePath, fingerPrintFilePath) :
+        if arcpy is None :
+            ToolboxLogger.warning("Signature attachments require arcpy.")
+            return
+        self.setMatchTable()
+
+        approvals_ids = ["'{}'".format(i[self.APPROVAL_ID_FIELD]) for i in approvals]
+
+        approval_signatures = self.get_aprprovalsignatures(
+            fields=[self.APPROVAL_SIGNATURE_ID_FIELD, self.APPROVAL_FK_FIELD],
+            filter="{} IN ({})".format(self.APPROVAL_FK_FIELD, ",".join(approvals_ids)))
+        approval_signatures_ids = ["'{}'".format(i[self.APPROVAL_SIGNATURE_ID_FIELD]) for i in approval_signatures]
+
+        self.da.delete(self.APPROVAL_SIGNATURE_ATTACH_NAME, 
+            filter= "{} = '{}' AND {} IN ({})".format(self.APPROVAL_SIGNATURE_ATTACH_ATT_NAME_FIELD, signatureFilename, self.APPROVAL_SIGNATURE_FK_FIELD, ",".join(approval_signatures_ids)))
+
+        match_da = ArcpyDataAccess(arcpy.env.scratchGDB)
+
+        for approval_signature in approval_signatures :
+            values = []
+            value = tuple([approval_signature[self.APPROVAL_SIGNATURE_ID_FIELD], signatureFilePath])
+            values.append(value)
+
+            if os.path.exists(fingerPrintFilePath) :
+                value = tuple([approval_signature[self.APPROVAL_SIGNATURE_ID_FIELD], fingerPrintFilePath])
+                values.append(value)
+
+            match_da.insert(self.matchtableName, [self.matchField, self.pictureField], values)
+        match_da = None
+
+        arcpy.AddAttachments_management(self.da.findTablePath(self.APPROVAL_SIGNATURE_NAME), 
+            self.APPROVAL_SIGNATURE_ID_FIELD, 
+            self.matchTablePath, 
+            self.matchField, 
+            self.pictureField)
+
+    @ToolboxLogger.log_method
+    def approve_party(self, approvals) :
+        self.update_approvalstate(approvals)
+        self.update_boundaries_states(self.set_boundaries_states(approvals))
+
+    @ToolRunHooks.run
     @ToolboxLogger.log_method
     def execute(self) :
         self.set_party_signature_attachment()
+        self.log_query_cache()
 
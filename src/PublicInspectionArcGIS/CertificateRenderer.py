@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from collections import OrderedDict
+
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+NEIGHBOR_SLOTS = {
+    1: (280, 260, 255),
+    2: (235, 215, 210),
+    3: (190, 170, 165),
+    4: (145, 125, 125)
+}
+
+MAX_CACHED_IMAGES = 64
+
+_renderer = None
+
+class CertificateError(Exception) :
+    """Raised when requested certificates could not be generated."""
+
+    def __init__(self, failed) :
+        super().__init__("Certificates not generated: {}".format(", ".join("'{}' ({})".format(legal_id, error) for legal_id, error in failed)))
+        self.failed = failed
+
+class CertificateRenderer :
+    """Draws boundary agreement certificates from plain dicts, keeping the most recently used decoded images."""
+
+    def __init__(self, image_path, signatures_path, output_path, max_images = MAX_CACHED_IMAGES) :
+        self.image_path = image_path
+        self.signatures_path = signatures_path
+        self.output_path = output_path
+        self.max_images = max_images
+        self._images = OrderedDict()
+
+    def image(self, path) :
+        image = self._images.get(path)
+        if image is None :
+            image = ImageReader(path)
+            self._images[path] = image
+            if len(self._images) > self.max_images :
+                self._images.popitem(last=False)
+        else :
+            self._images.move_to_end(path)
+        return image
+
+    def signature(self, party_id) :
+        return self.image(os.path.join(self.signatures_path, "{}.png".format(party_id)))
+
+    def render(self, certificate) :
+        party = certificate["party"]
+        c = canvas.Canvas(os.path.join(self.output_path, certificate["file_name"]))
+        c.rect(10, 10, 575, 820)
+        c.drawImage(self.image(os.path.join(self.image_path, "logo.png")), 20, 750, width=200, height=70)
+        c.setFont("Times-Roman", 18)
+        c.drawString(220, 750, "Acta de Colindancia")
+        c.setFont("Times-Roman", 11)
+        c.rect(20, 655, 555, 80)
+        c.drawString(40, 720, "Nobre del Interesado: {} {}".format(party["first_name"], party["last_name"]))
+        c.drawString(40, 700, "Documento: {}".format(party["id_number"]))
+        c.drawString(40, 680, "Firma: ")
+        c.drawString(340, 720, "Nombre del Predio: {}".format(certificate["spatialunit_name"]))
+        c.drawString(340, 700, "Ubicación: {}".format(certificate["location"]))
+        c.drawString(340, 680, "Cedula Catastral: {}".format(certificate["legal_id"]))
+        c.drawString(340, 660, "Folio de Matricula: {}".format(certificate["registration_page"]))
+        c.drawImage(self.signature(party["id"]), 80, 660, width=190, height=40)
+        c.rect(20, 370, 555, 275)
+        c.drawImage(self.image(os.path.join(self.image_path, "Mapa.png")), 22, 373, width=550, height=270)
+        c.rect(20, 80, 555, 275)
+        c.setFont("Times-Roman", 10)
+        c.drawString(22, 340, "Los abajo firmantes, como colindantes del predio objeto de levantamiento topográfico realizado en la fecha referida,manifiestan que han ")
+        c.drawString(22, 320, "asistido y aprobado el procedimiento realizado por el topógrafo, y estan de acuerdo con los linderos señalados durante este procedimiento")
+
+        for neighbor in certificate["neighbors"] :
+            name_y, spatialunit_y, signature_y = NEIGHBOR_SLOTS[neighbor["slot"]]
+            c.setFont("Times-Roman", 10)
+            c.drawString(30, name_y, "Nombre del Interesado: {} {}".format(neighbor["first_name"], neighbor["last_name"]))
+            c.drawString(260, name_y, "Documento: {}".format(neighbor["id_number"]))
+            c.drawString(30, spatialunit_y, "Nombre del Predio: {} ".format(neighbor["spatialunit_name"]))
+            c.drawString(360, spatialunit_y, "Firma: ")
+            c.drawImage(self.signature(neighbor["party_id"]), 390, signature_y, width=180, height=40)
+
+        c.rect(20, 20, 555, 60)
+        c.rect(20, 20, 278, 60)
+        c.drawString(30, 68, "Firma del Porfesional : ")
+        c.drawString(30, 30, "Fecha:  {} ".format(certificate["date"]))
+        c.drawString(302, 68, "Observaciones:")
+        c.drawString(302, 30, "El contacto de la visita fue: {}".format(certificate["visitor_contact"]))
+        c.save()
+
+    def timed_render(self, certificate) :
+        start = time.perf_counter()
+        try :
+            self.render(certificate)
+            error = None
+        except Exception as e :
+            error = str(e)
+        return certificate["legal_id"], time.perf_counter() - start, error
+
+def init_renderer(image_path, signatures_path, output_path) :
+    global _renderer
+    _renderer = CertificateRenderer(image_path, signatures_path, output_path)
+
+def render_certificate(certificate) :
+    return _renderer.timed_render(certificate)
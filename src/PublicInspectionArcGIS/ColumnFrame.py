@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+class ColumnFrame :
+    """Column-oriented query result: one NumPy array per field, categorical fields stored as codes plus labels."""
+
+    def __init__(self, columns, labels = None) :
+        self.columns = columns
+        self.labels = labels if labels else {}
+        self._names = {name.lower(): name for name in columns}
+
+    @staticmethod
+    def encode(values, null_value = None) :
+        values = [None if v == null_value else v for v in values] if null_value is not None else list(values)
+        labels = sorted(set(values), key = lambda v : (v is not None, str(v)))
+        positions = {label: position for position, label in enumerate(labels)}
+        codes = np.fromiter((positions[v] for v in values), dtype=np.int64, count=len(values))
+        return codes, np.array(labels, dtype=object)
+
+    @classmethod
+    def fromColumns(cls, columns, categorical = (), null_value = None) :
+        categorical = set(c.lower() for c in categorical)
+        arrays = {}
+        labels = {}
+        for name, values in columns.items() :
+            if name.lower() in categorical :
+                arrays[name], labels[name] = ColumnFrame.encode(values, null_value)
+            else :
+                array = np.asarray(values)
+                if array.dtype == object :
+                    try :
+                        array = np.array([np.nan if v is None else v for v in values], dtype=float)
+                    except (TypeError, ValueError) :
+                        pass
+                arrays[name] = array
+        return cls(arrays, labels)
+
+    @classmethod
+    def fromRows(cls, rows, fields, categorical = ()) :
+        columns = {field: [] for field in fields}
+        appends = [(field, columns[field].append) for field in fields]
+        for row in rows :
+            for field, append in appends :
+                append(row[field])
+        return cls.fromColumns(columns, categorical)
+
+    @classmethod
+    def fromArray(cls, array, categorical = (), null_value = "") :
+        return cls.fromColumns({name: array[name] for name in array.dtype.names}, categorical, null_value)
+
+    def __len__(self) :
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def _name(self, name) :
+        return self._names[name.lower()]
+
+    def codes(self, name) :
+        return self.columns[self._name(name)]
+
+    def column(self, name) :
+        name = self._name(name)
+        if name in self.labels :
+            return self.labels[name][self.columns[name]]
+        return self.columns[name]
+
+    def value(self, name, position) :
+        return self.column(name)[position]
+
+    @staticmethod
+    def valueArray(values, dtype) :
+        values = list(values)
+        array = np.asarray(values) if values else np.array([], dtype=dtype)
+        if array.dtype.kind == dtype.kind or (array.dtype.kind in "iuf" and dtype.kind in "iuf") :
+            return array
+        return np.array(values, dtype=object)
+
+    def isin(self, name, values) :
+        name = self._name(name)
+        if name in self.labels :
+            label_mask = np.isin(self.labels[name], np.array(list(values), dtype=object))
+            return label_mask[self.columns[name]]
+        return np.isin(self.columns[name], ColumnFrame.valueArray(values, self.columns[name].dtype))
+
+    def equals(self, name, value) :
+        return self.isin(name, [value])
+
+    def unique(self, name, mask = None) :
+        name = self._name(name)
+        values = self.columns[name] if mask is None else self.columns[name][mask]
+        values = np.unique(values)
+        return self.labels[name][values] if name in self.labels else values
+
+    def count(self, name, mask = None) :
+        name = self._name(name)
+        codes = self.columns[name] if mask is None else self.columns[name][mask]
+        counts = np.bincount(codes, minlength=len(self.labels[name]))
+        return {label: int(count) for label, count in zip(self.labels[name], counts)}
+
+    def sum(self, name, by = None, mask = None) :
+        values = self.columns[self._name(name)].astype(float)
+        if by is None :
+            return float(np.nansum(values if mask is None else values[mask]))
+
+        by = self._name(by)
+        codes = self.columns[by]
+        if mask is not None :
+            codes, values = codes[mask], values[mask]
+        valid = ~np.isnan(values)
+        sums = np.bincount(codes[valid], weights=values[valid], minlength=len(self.labels[by]))
+        return {label: float(total) for label, total in zip(self.labels[by], sums)}
+
+    def argmin(self, name) :
+        values = self.columns[self._name(name)].astype(float)
+        return int(np.nanargmin(values)) if np.any(~np.isnan(values)) else None
+
+    def argmax(self, name) :
+        values = self.columns[self._name(name)].astype(float)
+        return int(np.nanargmax(values)) if np.any(~np.isnan(values)) else None
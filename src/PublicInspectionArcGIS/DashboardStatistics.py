@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import json
+import numpy as np
+
+BOUNDARY_STATES = ["Approved", "In Process", "No Processed", "Rejected"]
+GENDERS = ["Male", "Female"]
+APPROVED_STATE = "Approved"
+
+class DashboardStatistics :
+    """Computes the dashboard metrics as vectorized operations over one column frame per table.
+
+    "surveyed" is the number of distinct spatial units with at least one approved boundary, and "genders" is
+    keyed by label in GENDERS order, the order the dashboard bar chart labels its categories."""
+
+    def __init__(self, spatialunit_id_field, spatialunit_legal_id_field, spatialunit_area_field,
+            spatialunit_fk_field, boundary_id_field, boundary_fk_field, boundary_state_field, party_gender_field,
+            approval_is_approved_field = None) :
+        self.spatialunit_id_field = spatialunit_id_field
+        self.spatialunit_legal_id_field = spatialunit_legal_id_field
+        self.spatialunit_area_field = spatialunit_area_field
+        self.spatialunit_fk_field = spatialunit_fk_field
+        self.boundary_id_field = boundary_id_field
+        self.boundary_fk_field = boundary_fk_field
+        self.boundary_state_field = boundary_state_field
+        self.party_gender_field = party_gender_field
+        self.approval_is_approved_field = approval_is_approved_field
+
+    def count_labels(self, frame, field, labels) :
+        counts = {label: 0 for label in labels}
+        for label, count in frame.count(field).items() :
+            label = label if label is None or isinstance(label, str) else str(label)
+            counts[label] = counts.get(label, 0) + count
+        return counts
+
+    def party_statistics(self, parties) :
+        return {"rightholders": len(parties), "genders": self.count_labels(parties, self.party_gender_field, GENDERS)}
+
+    def boundary_statistics(self, boundaries) :
+        states = self.count_labels(boundaries, self.boundary_state_field, BOUNDARY_STATES)
+        approved = boundaries.column(self.boundary_id_field)[boundaries.equals(self.boundary_state_field, APPROVED_STATE)]
+        return {"boundaries": len(boundaries), "boundary_states": states}, approved
+
+    def approval_statistics(self, approvals) :
+        return {"approvals": len(approvals), "approval_states": self.count_labels(approvals, self.approval_is_approved_field, [])}
+
+    def surveyed_spatialunits(self, spatialunits_boundaries, approved_boundaries) :
+        mask = spatialunits_boundaries.isin(self.boundary_fk_field, approved_boundaries)
+        return spatialunits_boundaries.unique(self.spatialunit_fk_field, mask)
+
+    def spatialunit_statistics(self, spatialunits, surveyed, area_factor = 1.0) :
+        areas = spatialunits.column(self.spatialunit_area_field).astype(float)
+        area_count = int(np.count_nonzero(~np.isnan(areas)))
+        total_area = spatialunits.sum(self.spatialunit_area_field) * area_factor
+        smallest = spatialunits.argmin(self.spatialunit_area_field)
+        largest = spatialunits.argmax(self.spatialunit_area_field)
+
+        def area_record(position) :
+            if position is None :
+                return None
+            return {"legal_id": spatialunits.value(self.spatialunit_legal_id_field, position), "hectares": float(areas[position] * area_factor)}
+
+        return {
+            "spatialunits": len(spatialunits),
+            "surveyed": int(spatialunits.isin(self.spatialunit_id_field, surveyed).sum()),
+            "hectares": total_area,
+            "average_hectares": total_area / area_count if area_count else 0.0,
+            "smallest": area_record(smallest),
+            "largest": area_record(largest)
+        }
+
+    def compute(self, parties, boundaries, spatialunits_boundaries, spatialunits, approvals = None, area_factor = 1.0) :
+        statistics = self.party_statistics(parties)
+        boundary_statistics, approved = self.boundary_statistics(boundaries)
+        statistics.update(boundary_statistics)
+        if approvals is not None :
+            statistics.update(self.approval_statistics(approvals))
+        surveyed = self.surveyed_spatialunits(spatialunits_boundaries, approved)
+        statistics.update(self.spatialunit_statistics(spatialunits, surveyed, area_factor))
+        return statistics
+
+    @staticmethod
+    def toJson(statistics) :
+        return json.dumps(statistics, indent = 4)
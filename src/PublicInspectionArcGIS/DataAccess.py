@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
+import re
+import math
+from contextlib import contextmanager
+
+from PublicInspectionArcGIS.ColumnFrame import ColumnFrame
 
 DEFAULT_OPERATOR = "="
+MAX_IN_VALUES = 1000
+GEOGRAPHIC_METERS_PER_UNIT = 111135
+MIN_COS_LATITUDE = 0.01
 
 class QueryFilter:
     def __init__(self, query_filter) :
@@ -92,6 +100,188 @@ class QueryList :
         else :
             return None
 
+class KeyFilter :
+    """Where clause made only of '=' / IN terms joined by AND (or OR over the same field)."""
+
+    _TOKEN_PATTERN = re.compile(r"\s*(?:(?P<string>'(?:[^']|'')*')|(?P<number>-?\d+(?:\.\d+)?)|(?P<name>[A-Za-z_][\w.]*)|(?P<symbol>[(),=]))")
+
+    def __init__(self, terms) :
+        self.terms = terms
+
+    @classmethod
+    def parse(cls, where) :
+        if where is None :
+            return cls({})
+        tokens = cls._tokenize(where)
+        if tokens is None :
+            return None
+        try :
+            terms, position = cls._parseOr(tokens, 0)
+        except (IndexError, ValueError) :
+            return None
+        if position != len(tokens) :
+            return None
+        return cls(terms) if terms is not None else None
+
+    @classmethod
+    def _tokenize(cls, where) :
+        tokens = []
+        position = 0
+        where = where.strip()
+        while position < len(where) :
+            match = cls._TOKEN_PATTERN.match(where, position)
+            if not match or match.end() == position :
+                return None
+            position = match.end()
+            if match.group("string") is not None :
+                tokens.append(("value", match.group("string")[1:-1].replace("''", "'")))
+            elif match.group("number") is not None :
+                number = match.group("number")
+                tokens.append(("value", float(number) if "." in number else int(number)))
+            elif match.group("name") is not None :
+                name = match.group("name")
+                if name.upper() in ("AND", "OR", "IN") :
+                    tokens.append((name.upper(), name))
+                else :
+                    tokens.append(("name", name))
+            else :
+                tokens.append((match.group("symbol"), match.group("symbol")))
+        return tokens
+
+    @classmethod
+    def _parseOr(cls, tokens, position) :
+        terms, position = cls._parseAnd(tokens, position)
+        while position < len(tokens) and tokens[position][0] == "OR" :
+            other, position = cls._parseAnd(tokens, position + 1)
+            if terms is None or other is None or len(terms) != 1 or list(terms.keys()) != list(other.keys()) :
+                terms = None
+            else :
+                field = list(terms.keys())[0]
+                terms = {field: terms[field] | other[field]}
+        return terms, position
+
+    @classmethod
+    def _parseAnd(cls, tokens, position) :
+        terms, position = cls._parseFactor(tokens, position)
+        while position < len(tokens) and tokens[position][0] == "AND" :
+            other, position = cls._parseFactor(tokens, position + 1)
+            if terms is None or other is None :
+                terms = None
+            else :
+                for field, values in other.items() :
+                    terms[field] = terms[field] & values if field in terms else values
+        return terms, position
+
+    @classmethod
+    def _parseFactor(cls, tokens, position) :
+        kind, value = tokens[position]
+        if kind == "(" :
+            terms, position = cls._parseOr(tokens, position + 1)
+            if tokens[position][0] != ")" :
+                raise ValueError("Unbalanced parenthesis")
+            return terms, position + 1
+
+        if kind != "name" :
+            raise ValueError("Field name expected")
+        field = value.lower()
+        operator = tokens[position + 1][0]
+
+        if operator == "=" and tokens[position + 2][0] == "value" :
+            return {field: {tokens[position + 2][1]}}, position + 3
+
+        if operator == "IN" and tokens[position + 2][0] == "(" :
+            values = set()
+            position += 3
+            while tokens[position][0] == "value" :
+                values.add(tokens[position][1])
+                if tokens[position + 1][0] == "," :
+                    position += 2
+                else :
+                    position += 1
+            if tokens[position][0] != ")" :
+                raise ValueError("Value list expected")
+            return {field: values}, position + 1
+
+        raise ValueError("Unsupported operator")
+
+    @staticmethod
+    def _literal(value) :
+        return "'{}'".format(value.replace("'", "''")) if isinstance(value, str) else "{}".format(value)
+
+    @staticmethod
+    def sortValues(values) :
+        return sorted(values, key = lambda v : (isinstance(v, str), v))
+
+    def getWhereClause(self) :
+        clauses = []
+        for field, values in self.terms.items() :
+            values = KeyFilter.sortValues(values)
+            if len(values) == 1 :
+                clauses.append("{} = {}".format(field, KeyFilter._literal(values[0])))
+            else :
+                clauses.append("{} IN ({})".format(field, ", ".join(KeyFilter._literal(v) for v in values)))
+        return " AND ".join(clauses) if clauses else None
+
+    def matches(self, row, field_map = None) :
+        for field, values in self.terms.items() :
+            name = field_map[field] if field_map else field
+            if row[name] not in values :
+                return False
+        return True
+
+class EditBatch :
+    """Queues edits and applies them in a single edit session: inserts grouped per table and
+    field list (one cursor each), then updates and deletes in the order they were queued."""
+
+    def __init__(self, data_access) :
+        self.data_access = data_access
+        self._inserts = {}
+        self._changes = []
+
+    def insert(self, table, fields, values) :
+        self._inserts.setdefault((table, tuple(fields)), []).extend(values)
+
+    def update(self, table, fields, values, filter = None) :
+        self._changes.append(("update", table, list(fields), list(values), filter))
+
+    def delete(self, table, filter = None) :
+        self._changes.append(("delete", table, None, None, filter))
+
+    def __len__(self) :
+        return sum(len(rows) for rows in self._inserts.values()) + len(self._changes)
+
+    def flush(self) :
+        inserts = self._inserts
+        changes = self._changes
+        self._inserts = {}
+        self._changes = []
+
+        inserted_ids = {}
+        geometry_tables = set()
+        self.data_access._startEditing()
+        try :
+            for (table, fields), rows in inserts.items() :
+                inserted_ids.setdefault(table, []).extend(self.data_access._insertRows(table, list(fields), rows))
+                if "SHAPE@" in fields :
+                    geometry_tables.add(table)
+
+            for operation, table, fields, values, filter in changes :
+                if operation == "update" :
+                    self.data_access._updateRows(table, fields, values, filter)
+                else :
+                    self.data_access._deleteRows(table, filter)
+        except Exception :
+            self.data_access._stopEditing(save_changes=False)
+            raise
+        self.data_access._stopEditing(save_changes=True)
+
+        registers = {}
+        for table, ids in inserted_ids.items() :
+            registers[table] = self.data_access._readInserted(table, ids, table in geometry_tables)
+
+        self.data_access.flushed(registers, changes)
+        return registers
+
 class DataAccess :
 
     @classmethod
@@ -202,11 +392,98 @@ class DataAccess :
                 element_list.append(elements)
         return element_list
 
+    @classmethod
+    def splitInClause(cls, where, max_values = MAX_IN_VALUES) :
+        if not where or where.count(",") < max_values :
+            return None
+        key_filter = KeyFilter.parse(where)
+        if key_filter is None or not key_filter.terms :
+            return None
+
+        field = max(key_filter.terms, key = lambda f : len(key_filter.terms[f]))
+        if len(key_filter.terms[field]) <= max_values :
+            return None
+        others = KeyFilter({f: v for f, v in key_filter.terms.items() if f != field})
+        return field, KeyFilter.sortValues(key_filter.terms[field]), others
+
+    @classmethod
+    def joinWhereClause(cls, clause, others) :
+        other_clause = others.getWhereClause()
+        return "{} AND {}".format(other_clause, clause) if other_clause else clause
+
+    @classmethod
+    def chunkInClause(cls, where, max_values = MAX_IN_VALUES) :
+        split = cls.splitInClause(where, max_values)
+        if split is None :
+            return None
+        field, values, others = split
+        return [cls.joinWhereClause(KeyFilter({field: set(values[start:start + max_values])}).getWhereClause(), others)
+            for start in range(0, len(values), max_values)]
+
     def __init__(self) :
         pass
 
     def search(self, table, fields, filter = None) :
         pass
 
+    def iter_search(self, table, fields="*", filter=None, geometry=False, page_size=None) :
+        """Streams rows. Backends may run IN filters longer than MAX_IN_VALUES one chunk at a time, in which case
+        rows are in OID order within each chunk only; search() returns them in OID order."""
+        yield from self.search(table, fields, filter, geometry) or []
+
+    def frame(self, table, fields, filter=None, categorical=()) :
+        return ColumnFrame.fromRows(self.iter_search(table, fields, filter), fields, categorical)
+
+    def workspaceVersion(self) :
+        return None
+
+    def isGeographic(self, table) :
+        return False
+
+    def metersPerUnit(self, table) :
+        return 1.0
+
+    @staticmethod
+    def geographicMetersPerUnit(latitude = None) :
+        """Meters per degree. Without a latitude this is the mean length of a degree of latitude; with one it is
+        the length of a degree of longitude there, so a radius converted with it covers at least distance_m in
+        every direction."""
+        if latitude is None :
+            return GEOGRAPHIC_METERS_PER_UNIT
+        return GEOGRAPHIC_METERS_PER_UNIT * max(math.cos(math.radians(latitude)), MIN_COS_LATITUDE)
+
+    @contextmanager
+    def batch(self) :
+        batch = EditBatch(self)
+        self._startEditing()
+        try :
+            yield batch
+            batch.flush()
+        except Exception :
+            self._stopEditing(save_changes=False)
+            raise
+        self._stopEditing(save_changes=True)
+
+    def flushed(self, registers, changes) :
+        pass
+
+    def _startEditing(self) :
+        pass
+
+    def _stopEditing(self, save_changes=True) :
+        pass
+
+    def _insertRows(self, table, fields, values) :
+        pass
+
+    def _updateRows(self, table, fields, values, filter = None) :
+        pass
+
+    def _deleteRows(self, table, filter = None) :
+        pass
+
+    def _readInserted(self, table, ids, geometry = False) :
+        pass
+
     def update(self, tbl_destino, campo_busqueda, campos, registro_origen, valor_relacion, tipo_operacion) :
         pass
\ No newline at end of file
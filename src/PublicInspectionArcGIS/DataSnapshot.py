@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+from PublicInspectionArcGIS.Utils import ToolboxLogger
+from PublicInspectionArcGIS.DataAccess import DataAccess, KeyFilter
+from PublicInspectionArcGIS.Row import Row
+
+GEOMETRY_KEY = "SHAPE@"
+
+class TableSnapshot :
+    def __init__(self, name, rows, key_fields) :
+        self.name = name
+        self.key_fields = [f.lower() for f in key_fields]
+        self.load(rows)
+
+    def load(self, rows) :
+        self.rows = rows
+        self.field_map = {f.lower(): f for f in rows[0].keys()} if rows else {}
+        self.reindex()
+
+    def reindex(self) :
+        self._positions = {id(row): position for position, row in enumerate(self.rows)}
+        self._indexes = {}
+        for field in self.key_fields :
+            if field in self.field_map :
+                index = {}
+                name = self.field_map[field]
+                for row in self.rows :
+                    index.setdefault(row[name], []).append(row)
+                self._indexes[field] = index
+
+    def select(self, key_filter) :
+        if any(field not in self.field_map for field in key_filter.terms) :
+            return None
+
+        indexed_fields = [f for f in key_filter.terms if f in self._indexes]
+        if indexed_fields :
+            field = min(indexed_fields, key = lambda f : len(key_filter.terms[f]))
+            index = self._indexes[field]
+            candidates = []
+            for value in key_filter.terms[field] :
+                candidates.extend(index.get(value, []))
+            if len(key_filter.terms[field]) > 1 :
+                candidates.sort(key = lambda row : self._positions[id(row)])
+        else :
+            candidates = self.rows
+
+        return [row for row in candidates if key_filter.matches(row, self.field_map)]
+
+    def add(self, row) :
+        if not self.field_map :
+            self.field_map = {f.lower(): f for f in row.keys()}
+        self._positions[id(row)] = len(self.rows)
+        self.rows.append(row)
+        for field, index in self._indexes.items() :
+            index.setdefault(row[self.field_map[field]], []).append(row)
+
+    def update(self, rows, fields, values) :
+        names = [self.field_map.get(f.lower(), f) for f in fields]
+        for row in rows :
+            for name, value in zip(names, values) :
+                row[name] = value
+        if any(f.lower() in self._indexes for f in fields) :
+            self.reindex()
+
+    def remove(self, rows) :
+        removed = set(id(row) for row in rows)
+        self.load([row for row in self.rows if id(row) not in removed])
+
+class DataSnapshot(DataAccess) :
+    """Serves key lookups on preloaded tables from memory, delegating everything else to data_access."""
+
+    def __init__(self, data_access, tables, geometry_tables = None) :
+        DataAccess.__init__(self)
+        self.data_access = data_access
+        self.tables = {}
+        self.geometry_tables = geometry_tables if geometry_tables else []
+        self.hits = 0
+        self.misses = 0
+
+        for table, key_fields in tables.items() :
+            self.tables[table] = TableSnapshot(table, self._loadRows(table), key_fields)
+            ToolboxLogger.debug("Snapshot '{}': {} rows".format(table, len(self.tables[table].rows)))
+
+    def __getattr__(self, name) :
+        return getattr(self.__dict__["data_access"], name)
+
+    def _loadRows(self, table) :
+        rows = self.data_access.search(table, "*", None, table in self.geometry_tables)
+        return rows if rows else []
+
+    def reload(self, table) :
+        if table in self.tables :
+            self.tables[table].load(self._loadRows(table))
+
+    def findTablePath(self, name) :
+        return self.data_access.findTablePath(name)
+
+    def workspaceVersion(self) :
+        return self.data_access.workspaceVersion()
+
+    def query(self, table, fields="*", filter=None, geometry=False) :
+        return self.search(table, fields, filter, geometry)
+
+    def add(self, table, fields, values) :
+        return self.insert(table, fields, values)
+
+    def _project(self, snapshot, rows, fields, geometry) :
+        if fields == "*" :
+            names = [name for name in snapshot.field_map.values() if geometry or name != GEOMETRY_KEY]
+        else :
+            names = [snapshot.field_map.get(f.lower()) for f in fields]
+        row_type = Row.getType(snapshot.name, names)
+        return [row_type([row.get(name) for name in names]) for row in rows]
+
+    def _select(self, table, fields, filter, geometry) :
+        snapshot = self.tables.get(table)
+        if snapshot is None :
+            return None
+        if geometry and table not in self.geometry_tables :
+            return None
+        if fields != "*" and any(f.lower() not in snapshot.field_map for f in fields) :
+            return None
+
+        key_filter = KeyFilter.parse(filter)
+        if key_filter is None :
+            return None
+
+        rows = snapshot.select(key_filter)
+        if rows is None :
+            return None
+        return self._project(snapshot, rows, fields, geometry)
+
+    def search(self, table, fields="*", filter=None, geometry=False) :
+        rows = self._select(table, fields, filter, geometry)
+        if rows is None :
+            self.misses += 1
+            return self.data_access.search(table, fields, filter, geometry)
+
+        self.hits += 1
+        return rows
+
+    def iter_search(self, table, fields="*", filter=None, geometry=False, page_size=None) :
+        rows = self._select(table, fields, filter, geometry)
+        if rows is None :
+            self.misses += 1
+            yield from self.data_access.iter_search(table, fields, filter, geometry, page_size)
+        else :
+            self.hits += 1
+            yield from rows
+
+    def _mirrorInsert(self, table, registers, complete) :
+        snapshot = self.tables.get(table)
+        if snapshot is not None :
+            if complete and (table not in self.geometry_tables or all(GEOMETRY_KEY in r for r in registers)) :
+                for register in registers :
+                    snapshot.add(dict(register))
+            else :
+                self.reload(table)
+
+    def _mirrorChange(self, table, fields, values, filter) :
+        snapshot = self.tables.get(table)
+        if snapshot is not None :
+            key_filter = KeyFilter.parse(filter)
+            rows = snapshot.select(key_filter) if key_filter is not None else None
+            if rows is None :
+                self.reload(table)
+            elif fields is None :
+                snapshot.remove(rows)
+            else :
+                snapshot.update(rows, fields, values)
+
+    def _startEditing(self) :
+        self.data_access._startEditing()
+
+    def _stopEditing(self, save_changes=True) :
+        self.data_access._stopEditing(save_changes)
+
+    def _insertRows(self, table, fields, values) :
+        return self.data_access._insertRows(table, fields, values)
+
+    def _updateRows(self, table, fields, values, filter = None) :
+        return self.data_access._updateRows(table, fields, values, filter)
+
+    def _deleteRows(self, table, filter = None) :
+        return self.data_access._deleteRows(table, filter)
+
+    def _readInserted(self, table, ids, geometry = False) :
+        return self.data_access._readInserted(table, ids, geometry)
+
+    def flushed(self, registers, changes) :
+        for table, rows in registers.items() :
+            self._mirrorInsert(table, rows, True)
+        for operation, table, fields, values, filter in changes :
+            self._mirrorChange(table, fields, values, filter)
+
+    def insert(self, table, fields, values) :
+        registers = self.data_access.insert(table, fields, values)
+        self._mirrorInsert(table, registers if registers else [], len(values) == 1 and registers)
+        return registers
+
+    def update(self, table, fields, values, filter = None) :
+        self.data_access.update(table, fields, values, filter)
+        self._mirrorChange(table, fields, values, filter)
+
+    def delete(self, table, fields = None, filter = None) :
+        self.data_access.delete(table, fields, filter)
+        self._mirrorChange(table, None, None, filter)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+from PublicInspectionArcGIS.Utils import JsonFile
+
+class FingerprintStore :
+    """Per spatial unit geometry fingerprints persisted between runs in a JSON sidecar file."""
+
+    def __init__(self, path) :
+        self.path = path
+        records = JsonFile.readFile(path)
+        self.records = records if isinstance(records, dict) else {}
+
+    def __len__(self) :
+        return len(self.records)
+
+    @staticmethod
+    def fingerprint(wkb, legal_id) :
+        digest = hashlib.sha1(bytes(wkb) if wkb is not None else b"")
+        digest.update("{}".format(legal_id).encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def record(wkb, legal_id, extent) :
+        return {"fingerprint": FingerprintStore.fingerprint(wkb, legal_id), "extent": list(extent)}
+
+    def changes(self, current) :
+        changed = [key for key, record in current.items()
+            if key not in self.records or self.records[key]["fingerprint"] != record["fingerprint"]]
+        previous_extents = [self.records[key]["extent"] for key in self.records
+            if key not in current or self.records[key]["fingerprint"] != current[key]["fingerprint"]]
+        return changed, previous_extents
+
+    def save(self, current) :
+        self.records = dict(current)
+        JsonFile.writeFile(self.path, self.records)
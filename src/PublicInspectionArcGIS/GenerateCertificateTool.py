@@ -1,6 +1,6 @@
 import arcpy
 
-from PublicInspectionArcGIS.Utils import ARCGIS_HANDLER, STREAM_HANDLER, ToolboxLogger
+from PublicInspectionArcGIS.Utils import ARCGIS_HANDLER, STREAM_HANDLER, ToolboxLogger, ToolRunHooks
 from PublicInspectionArcGIS.ToolsLib import PublicInspectionTools
 
 class GenerateCertificateTool(object):
@@ -73,6 +73,7 @@ class GenerateCertificateTool(object):
         parameter.  This method is called after internal validation."""
         return
     
+    @ToolRunHooks.run
     def execute(self,parameters, messages):
         """The source code of the tool."""
         legal_id = parameters[self.Params["legal_id"]].valueAsText
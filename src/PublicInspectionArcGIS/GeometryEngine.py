@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+
+arcpy = None
+
+try :
+    import numpy as np
+    import shapely
+except ImportError :
+    shapely = None
+
+ARCPY_ENGINE = "arcpy"
+SHAPELY_ENGINE = "shapely"
+
+def import_arcpy() :
+    global arcpy
+    if arcpy is None :
+        import arcpy as module
+        arcpy = module
+    return arcpy
+
+class GeometryEngine :
+    """Geometry operations used by the boundary and point logic, implemented per geometry library.
+
+    encode/decode convert to and from WKB so an engine can serve as the SqliteDataAccess geometry
+    codec; dumps/loads serialize geometries for worker processes, also as WKB. arcpy is imported
+    only when an arcpy engine is created, so workers running the Shapely engine never load it."""
+
+    name = None
+
+    @staticmethod
+    def available(name) :
+        return importlib.util.find_spec(name) is not None
+
+    @staticmethod
+    def create(name = None, spatial_reference = None) :
+        if name is None :
+            name = ARCPY_ENGINE if GeometryEngine.available(ARCPY_ENGINE) else SHAPELY_ENGINE
+        if name == ARCPY_ENGINE :
+            return ArcpyGeometryEngine(spatial_reference)
+        if name == SHAPELY_ENGINE :
+            return ShapelyGeometryEngine()
+        raise ValueError("Unknown geometry engine '{}'".format(name))
+
+    def like(self, geometry) :
+        return self
+
+    def encode(self, geometry) :
+        raise NotImplementedError
+
+    def decode(self, wkb) :
+        raise NotImplementedError
+
+    def dumps(self, geometry) :
+        return self.encode(geometry)
+
+    def loads(self, data) :
+        return self.decode(data)
+
+    def envelope(self, geometry) :
+        raise NotImplementedError
+
+    def length(self, geometry) :
+        raise NotImplementedError
+
+    def endpoints(self, geometry) :
+        raise NotImplementedError
+
+    def rings(self, geometry) :
+        raise NotImplementedError
+
+    def polyline(self, paths, like = None) :
+        raise NotImplementedError
+
+    def shared_boundary(self, geometry, geometry1) :
+        raise NotImplementedError
+
+    def shared_boundaries(self, geometries, pairs) :
+        results = []
+        for key0, key1 in pairs :
+            intersect = self.shared_boundary(geometries[key0], geometries[key1])
+            if intersect is not None :
+                results.append((key0, key1, intersect))
+        return results
+
+    def union(self, geometries) :
+        geometries = [geometry for geometry in geometries if geometry is not None]
+        if not geometries :
+            return None
+        while len(geometries) > 1 :
+            geometries = [geometries[i].union(geometries[i + 1]) if i + 1 < len(geometries) else geometries[i] for i in range(0, len(geometries), 2)]
+        return geometries[0]
+
+    def outer_boundary(self, geometry, shared) :
+        raise NotImplementedError
+
+    def within_distance(self, geometry, candidates, distance) :
+        raise NotImplementedError
+
+class ArcpyGeometryEngine(GeometryEngine) :
+    """arcpy.Geometry adapter, one method call per geometry."""
+
+    name = ARCPY_ENGINE
+
+    def __init__(self, spatial_reference = None) :
+        try :
+            import_arcpy()
+        except ImportError :
+            raise ImportError("arcpy is required by the arcpy geometry engine")
+        self.spatial_reference = spatial_reference
+
+    def like(self, geometry) :
+        return ArcpyGeometryEngine(geometry.spatialReference)
+
+    def encode(self, geometry) :
+        if geometry is None or isinstance(geometry, (bytes, bytearray, memoryview)) :
+            return bytes(geometry) if geometry is not None else None
+        return bytes(geometry.WKB)
+
+    def decode(self, wkb) :
+        return arcpy.FromWKB(bytearray(wkb), self.spatial_reference)
+
+    def envelope(self, geometry) :
+        extent = geometry.extent
+        return (extent.XMin, extent.YMin, extent.XMax, extent.YMax)
+
+    def length(self, geometry) :
+        return geometry.length
+
+    def endpoints(self, geometry) :
+        return [(geometry.firstPoint.X, geometry.firstPoint.Y), (geometry.lastPoint.X, geometry.lastPoint.Y)]
+
+    def rings(self, geometry) :
+        rings = []
+        for part in geometry :
+            ring = []
+            for point in part :
+                if point is None :
+                    rings.append(ring)
+                    ring = []
+                else :
+                    ring.append((point.X, point.Y))
+            rings.append(ring)
+        return [ring for ring in rings if ring]
+
+    def polyline(self, paths, like = None) :
+        spatial_reference = like.spatialReference if like is not None else self.spatial_reference
+        return arcpy.Polyline(arcpy.Array([arcpy.Array([arcpy.Point(x, y) for x, y in path]) for path in paths]), spatial_reference)
+
+    def shared_boundary(self, geometry, geometry1) :
+        if not geometry.equals(geometry1) and not geometry.disjoint(geometry1) :
+            intersect = geometry.intersect(geometry1, 2)
+            if intersect.length > 0 :
+                return intersect
+        return None
+
+    def outer_boundary(self, geometry, shared) :
+        outer = geometry.boundary()
+        if shared :
+            outer = outer.difference(self.union(shared))
+        return outer if outer.length > 0 else None
+
+    def within_distance(self, geometry, candidates, distance) :
+        return [geometry.distanceTo(candidate) <= distance for candidate in candidates]
+
+class ShapelyGeometryEngine(GeometryEngine) :
+    """Shapely 2 adapter; pairwise operations run as vectorized ufuncs over geometry arrays."""
+
+    name = SHAPELY_ENGINE
+
+    def __init__(self) :
+        if shapely is None :
+            raise ImportError("shapely 2 is required by the shapely geometry engine")
+
+    def encode(self, geometry) :
+        if geometry is None or isinstance(geometry, (bytes, bytearray, memoryview)) :
+            return bytes(geometry) if geometry is not None else None
+        return shapely.to_wkb(geometry)
+
+    def decode(self, wkb) :
+        return shapely.from_wkb(bytes(wkb))
+
+    def envelope(self, geometry) :
+        return tuple(shapely.bounds(geometry).tolist())
+
+    def length(self, geometry) :
+        return float(shapely.length(geometry))
+
+    def endpoints(self, geometry) :
+        parts = shapely.get_parts(geometry)
+        first = shapely.get_point(parts[0], 0)
+        last = shapely.get_point(parts[-1], -1)
+        return [(first.x, first.y), (last.x, last.y)]
+
+    def rings(self, geometry) :
+        return [[tuple(point) for point in shapely.get_coordinates(ring).tolist()] for ring in shapely.get_rings(shapely.get_parts(geometry))]
+
+    def polyline(self, paths, like = None) :
+        return shapely.multilinestrings([shapely.linestrings(path) for path in paths])
+
+    @staticmethod
+    def linework(geometries) :
+        parts, index = shapely.get_parts(geometries, return_index=True)
+        lines = shapely.get_dimensions(parts) == 1
+        merged = np.full(len(geometries), None, dtype=object)
+        if lines.any() :
+            shapely.multilinestrings(parts[lines], indices=index[lines], out=merged)
+            present = ~shapely.is_missing(merged)
+            merged[present] = shapely.line_merge(merged[present])
+        return merged
+
+    def shared_boundaries(self, geometries, pairs) :
+        if not pairs :
+            return []
+        first = np.array([geometries[key0] for key0, key1 in pairs], dtype=object)
+        second = np.array([geometries[key1] for key0, key1 in pairs], dtype=object)
+        candidates = np.flatnonzero(shapely.intersects(first, second) & ~shapely.equals(first, second))
+
+        intersects = ShapelyGeometryEngine.linework(shapely.intersection(shapely.boundary(first[candidates]), shapely.boundary(second[candidates])))
+        lengths = shapely.length(intersects)
+        return [(pairs[position][0], pairs[position][1], intersect)
+            for position, intersect, length in zip(candidates.tolist(), intersects, lengths) if intersect is not None and length > 0]
+
+    def shared_boundary(self, geometry, geometry1) :
+        results = self.shared_boundaries({0: geometry, 1: geometry1}, [(0, 1)])
+        return results[0][2] if results else None
+
+    def union(self, geometries) :
+        return shapely.union_all(np.array(list(geometries), dtype=object))
+
+    def outer_boundary(self, geometry, shared) :
+        outer = shapely.boundary(geometry)
+        if shared :
+            outer = shapely.difference(outer, self.union(shared))
+        outer = ShapelyGeometryEngine.linework(np.array([outer], dtype=object))[0]
+        return outer if outer is not None and shapely.length(outer) > 0 else None
+
+    def within_distance(self, geometry, candidates, distance) :
+        return shapely.dwithin(geometry, np.array(list(candidates), dtype=object), distance).tolist()
@@ -1,14 +1,41 @@
 # -*- coding: utf-8 -*-
-import arcpy
 import os
-from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration
-from PublicInspectionArcGIS.ArcpyDataAccess import ArcpyDataAccess
+
+try :
+    import arcpy
+    from PublicInspectionArcGIS.ArcpyDataAccess import ArcpyDataAccess
+except ImportError :
+    arcpy = None
+    ArcpyDataAccess = None
+
+from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration, ToolRunHooks, SpanTraceHook, QueuedLoggingHook
+from PublicInspectionArcGIS.DataAccess import DataAccess
+from PublicInspectionArcGIS.SqliteDataAccess import SqliteDataAccess
+from PublicInspectionArcGIS.DataSnapshot import DataSnapshot
+from PublicInspectionArcGIS.QueryCache import QueryCache
+from PublicInspectionArcGIS.SpatialIndex import SpatialIndex
+from PublicInspectionArcGIS.GeometryEngine import GeometryEngine
+from PublicInspectionArcGIS.ApprovalReconciler import ApprovalReconciler
+from PublicInspectionArcGIS.QueryMetrics import QueryMetricsHook
+from PublicInspectionArcGIS.ToolProfiler import ToolProfilerHook
+
+ToolRunHooks.register(QueryMetricsHook())
+ToolRunHooks.register(SpanTraceHook())
+ToolRunHooks.register(QueuedLoggingHook())
+ToolRunHooks.register(ToolProfilerHook())
+
+SQLITE_EXTENSIONS = (".sqlite", ".gpkg")
 
 class PublicInspection(object) :
 
-    def __init__(self, configuration : Configuration, aprx : arcpy.mp.ArcGISProject) :
+    def __init__(self, configuration : Configuration, aprx = None, da : DataAccess = None, folder = None) :
+        self.configuration = configuration
         self.aprx = aprx
-        self.folder = self.aprx.homeFolder
+        if aprx is not None :
+            folder = aprx.homeFolder
+        elif folder is None and da is not None :
+            folder = os.path.dirname(os.path.abspath(da.workspace_path))
+        self.folder = folder
         self.pythonFolder = os.path.dirname(os.path.realpath(__file__))
 
         self.INSPECTION_DATASET_NAME = configuration.getConfigKey("INSPECTION_DATASET_NAME")
@@ -56,13 +83,75 @@ class PublicInspection(object) :
         self.POINTS_ID_FIELD = configuration.getConfigKey("POINTS_ID_FIELD")
         self.POINTS_TYPE_FIELD = configuration.getConfigKey("POINTS_TYPE_FIELD")
 
-        self.inspectionDataSource = os.path.join(self.folder, self.INSPECTION_DATASET_NAME)
-        if os.path.exists(self.inspectionDataSource) :
-            self.da = ArcpyDataAccess(self.inspectionDataSource)
+        self.QUERY_CACHE_MAX_ENTRIES = configuration.getConfigKey("QUERY_CACHE_MAX_ENTRIES")
+        self.QUERY_CACHE_MAX_ROWS = configuration.getConfigKey("QUERY_CACHE_MAX_ROWS")
+        self.METRICS_RELATIVE_PATH = configuration.getConfigKey("METRICS_RELATIVE_PATH")
+        self.metricsPath = os.path.join(self.folder, self.METRICS_RELATIVE_PATH) if self.METRICS_RELATIVE_PATH else None
+        self.TRACE_ENABLED = configuration.getConfigKey("TRACE_ENABLED")
+        self.TRACE_RELATIVE_PATH = configuration.getConfigKey("TRACE_RELATIVE_PATH")
+        self.tracePath = os.path.join(self.folder, self.TRACE_RELATIVE_PATH) if self.TRACE_RELATIVE_PATH else None
+        self.LOG_QUEUE_ENABLED = configuration.getConfigKey("LOG_QUEUE_ENABLED")
+        self.PROFILE_ENABLED = configuration.getConfigKey("PROFILE_ENABLED")
+        self.PROFILE_RELATIVE_PATH = configuration.getConfigKey("PROFILE_RELATIVE_PATH")
+        self.profilePath = os.path.join(self.folder, self.PROFILE_RELATIVE_PATH) if self.PROFILE_RELATIVE_PATH else None
+
+        self.GEOMETRY_ENGINE = configuration.getConfigKey("GEOMETRY_ENGINE")
+        self.geometry_engine = GeometryEngine.create(self.GEOMETRY_ENGINE)
+        self.use_snapshot = False
+        self._spatialunit_index = None
+        self._meters_per_unit = None
+        if da is not None :
+            self.inspectionDataSource = da.workspace_path
+            self.da = da
         else :
-            self.da = None
+            self.inspectionDataSource = os.path.join(self.folder, self.INSPECTION_DATASET_NAME)
+            self.da = self.open_data_access(self.inspectionDataSource) if os.path.exists(self.inspectionDataSource) else None
+
+    def open_data_access(self, path) :
+        if os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS :
+            return SqliteDataAccess(path, self.geometry_engine)
+        if ArcpyDataAccess is None :
+            raise ImportError("arcpy is required to open '{}'".format(path))
+        return ArcpyDataAccess(path)
+
+    def describe(self) :
+        if self.aprx is not None :
+            ToolboxLogger.info("Proyect File:           {}".format(self.aprx.filePath))
+        ToolboxLogger.info("Inspection Data Source: {}".format(self.inspectionDataSource))
+        ToolboxLogger.debug("Data Access Object:     {}".format(self.da))
+
+    @ToolboxLogger.log_method
+    def load_snapshot(self) :
+        if self.da is None or isinstance(self.da, DataSnapshot) :
+            return
+
+        tables = {
+            self.SPATIAL_UNIT_NAME: [self.SPATIAL_UNIT_ID_FIELD, self.SPATIAL_UNIT_LEGAL_ID_FIELD],
+            self.SPATIAL_UNIT_BOUNDARY_NAME: [self.SPATIAL_UNIT_FK_FIELD, self.BOUNDARY_FK_FIELD],
+            self.BOUNDARY_NAME: [self.BOUNDARY_ID_FIELD],
+            self.RIGHT_NAME: [self.RIGHT_ID_FIELD, self.SPATIAL_UNIT_FK_FIELD],
+            self.PARTY_NAME: [self.PARTY_ID_FIELD, self.RIGHT_FK_FIELD],
+            self.APPROVAL_NAME: [self.APPROVAL_ID_FIELD, self.BOUNDARY_FK_FIELD, self.PARTY_FK_FIELD]
+        }
+        self.da = DataSnapshot(self.da, tables, geometry_tables=[self.SPATIAL_UNIT_NAME, self.BOUNDARY_NAME])
+        ToolboxLogger.info("Snapshot loaded.")
+
+    @ToolboxLogger.log_method
+    def release_snapshot(self) :
+        if isinstance(self.da, DataSnapshot) :
+            ToolboxLogger.debug("Snapshot hits: {} misses: {}".format(self.da.hits, self.da.misses))
+            self.da = self.da.data_access
 
-    def expand_extent(self, extent : arcpy.Extent, factor : float) :
+    def enable_query_cache(self) :
+        if self.da is None or isinstance(self.da, QueryCache) :
+            return
+        self.da = QueryCache(self.da, self.QUERY_CACHE_MAX_ENTRIES, self.QUERY_CACHE_MAX_ROWS)
+
+    def log_query_cache(self) :
+        if isinstance(self.da, QueryCache) :
+            ToolboxLogger.debug("Query cache: {}".format(self.da.stats()))
+
+    def expand_extent(self, extent, factor : float) :
         x_factor = 0.5 * extent.width *(factor - 1.0)
         y_factor = 0.5 * extent.height *(factor - 1.0)
         return arcpy.Extent(extent.XMin - x_factor, extent.YMin - y_factor, extent.XMax + x_factor, extent.YMax + y_factor)
@@ -122,57 +211,21 @@ class PublicInspection(object) :
     def update_points(self, fields, values, filter = None) :
         self.da.update(self.POINTS_NAME, fields=fields, values=values, filter=filter)
 
-    @ToolboxLogger.log_method
-    def add_approvals(self, spatialunit, boundary):
-        rights = self.get_rights(fields=[self.RIGHT_ID_FIELD], 
-            filter="{} = '{}'".format(self.SPATIAL_UNIT_FK_FIELD, spatialunit[self.SPATIAL_UNIT_ID_FIELD]))
-        for right in rights:
-            parties = self.get_parties(fields=[self.PARTY_ID_FIELD],
-                filter = ArcpyDataAccess.getWhereClause(self.RIGHT_FK_FIELD, right[self.RIGHT_ID_FIELD]))
-            for party in parties:
-                approvals = self.get_approvals(fields=[self.APPROVAL_ID_FIELD], 
-                    filter = ArcpyDataAccess.getWhereClause([self.BOUNDARY_FK_FIELD, self.PARTY_FK_FIELD], [boundary[self.BOUNDARY_ID_FIELD], party[self.PARTY_ID_FIELD]]))
-                if len(approvals) < 1 :
-                    approval = self.add_approval(boundary, party)
-                    self.add_approvalsignature(approval)
-    
-    @ToolboxLogger.log_method
-    def add_approvalsignature(self, approval) :
-        values = []
-        value = tuple([approval[self.APPROVAL_ID_FIELD]])
-        values.append(value)
-
-        signatures = self.insert_approvalsignatures([self.APPROVAL_FK_FIELD], values)
-        signature = signatures[0] if signatures else None
-        ToolboxLogger.debug("{} {}".format(self.APPROVAL_SIGNATURE_NAME, approval[self.APPROVAL_SIGNATURE_ID_FIELD] if signature else ""))
-        return signature
+    def approval_reconciler(self) :
+        return ApprovalReconciler(self.configuration, self.da)
 
     @ToolboxLogger.log_method
-    def add_approval(self, boundary, party):
-        values = []
-        value = tuple([boundary[self.BOUNDARY_ID_FIELD], party[self.PARTY_ID_FIELD]])
-        values.append(value)
+    def add_boundary_approvals(self, spatialunits, boundary) :
+        links = [(spatialunit[self.SPATIAL_UNIT_ID_FIELD], boundary[self.BOUNDARY_ID_FIELD]) for spatialunit in spatialunits]
+        return self.approval_reconciler().reconcile(links=links)
 
-        approvals = self.insert_approvals([self.BOUNDARY_FK_FIELD, self.PARTY_FK_FIELD], values)
-        approval = approvals[0] if approvals else None
-        ToolboxLogger.debug("{} {}".format(self.APPROVAL_NAME, approval[self.APPROVAL_ID_FIELD] if boundary else ""))
-
-        return approval
+    @ToolboxLogger.log_method
+    def add_approvals(self, spatialunit, boundary) :
+        return self.add_boundary_approvals([spatialunit], boundary)
 
     @ToolboxLogger.log_method
     def set_approvals_by_spatialunit(self, spatialunit) :
-        spatial_unit_id = spatialunit[self.SPATIAL_UNIT_ID_FIELD]
-        spatial_units_boundaries = self.get_spatialunits_boundaries(filter="{} = '{}'".format(self.SPATIAL_UNIT_FK_FIELD, spatial_unit_id))
-        if spatial_units_boundaries :
-            boundaries_ids = [row[self.BOUNDARY_FK_FIELD] for row in spatial_units_boundaries]
-            ToolboxLogger.debug("Boundary Ids: {}".format(len(boundaries_ids)))
-
-            boundaries = self.get_boundaries(
-                fields=[self.BOUNDARY_ID_FIELD], 
-                filter=ArcpyDataAccess.getWhereClause(self.BOUNDARY_ID_FIELD, boundaries_ids))
-                
-            for boundary in boundaries:
-                self.add_approvals(spatialunit, boundary)
+        return self.approval_reconciler().reconcile([spatialunit[self.SPATIAL_UNIT_ID_FIELD]])
 
     @ToolboxLogger.log_method
     def get_spatialunit_by_legal_id(self, legal_id, geometry=False):
@@ -181,6 +234,58 @@ class PublicInspection(object) :
             geometry=geometry)
         return spatialunits[0] if len(spatialunits) > 0 else None
 
+    def get_envelope(self, geometry) :
+        return self.geometry_engine.envelope(geometry)
+
+    def get_meters_per_unit(self, latitude = None) :
+        """Meters per map unit of the spatial units. For geographic data the mean degree of latitude is used unless
+        a latitude is given, in which case the degree of longitude at that latitude is used instead."""
+        if self._meters_per_unit is None :
+            self._meters_per_unit = (self.da.metersPerUnit(self.SPATIAL_UNIT_NAME), self.da.isGeographic(self.SPATIAL_UNIT_NAME))
+        meters_per_unit, geographic = self._meters_per_unit
+        if geographic and latitude is not None :
+            return DataAccess.geographicMetersPerUnit(latitude)
+        return meters_per_unit
+
+    @ToolboxLogger.log_method
+    def get_spatialunit_index(self) :
+        version = self.da.workspaceVersion()
+        if self._spatialunit_index is None or self._spatialunit_index[0] != version :
+            spatialunits = self.get_spatialunits(fields=[self.SPATIAL_UNIT_ID_FIELD, "SHAPE@"])
+            spatialunits = [su for su in spatialunits if su["SHAPE@"]]
+            ids = [su[self.SPATIAL_UNIT_ID_FIELD] for su in spatialunits]
+            self._spatialunit_index = (version, SpatialIndex([self.get_envelope(su["SHAPE@"]) for su in spatialunits]), ids)
+            ToolboxLogger.debug("Spatial Unit Index: {}", len(ids))
+        return self._spatialunit_index[1:]
+
+    def invalidate_spatialunit_index(self) :
+        self._spatialunit_index = None
+
+    @ToolboxLogger.log_method
+    def get_spatialunits_within_distance(self, legal_id, distance_m) :
+        spatialunit = self.get_spatialunit_by_legal_id(legal_id, geometry=True)
+        if not spatialunit or not spatialunit["SHAPE@"] :
+            return []
+        geometry = spatialunit["SHAPE@"]
+        envelope = self.get_envelope(geometry)
+        distance = distance_m / self.get_meters_per_unit((envelope[1] + envelope[3]) / 2)
+
+        spatial_index, ids = self.get_spatialunit_index()
+        if spatialunit[self.SPATIAL_UNIT_ID_FIELD] not in ids :
+            self.invalidate_spatialunit_index()
+            spatial_index, ids = self.get_spatialunit_index()
+
+        candidate_ids = [ids[key] for key in spatial_index.query(envelope, distance)]
+        if not candidate_ids :
+            return [spatialunit]
+
+        candidates = self.get_spatialunits(
+            filter=DataAccess.getWhereClause(self.SPATIAL_UNIT_ID_FIELD, candidate_ids),
+            geometry=True)
+        candidates = [su for su in candidates if su["SHAPE@"]]
+        within = self.geometry_engine.within_distance(geometry, [su["SHAPE@"] for su in candidates], distance)
+        return [su for su, inside in zip(candidates, within) if inside]
+
     @ToolboxLogger.log_method
     def get_parties_by_spatialunit(self, spatialunit):
         spatialunit_id = spatialunit[self.SPATIAL_UNIT_ID_FIELD] if spatialunit else None
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+from PublicInspectionArcGIS.Utils import ToolboxLogger
+from PublicInspectionArcGIS.DataAccess import DataAccess
+from PublicInspectionArcGIS.Row import Row
+
+MAX_ENTRIES = 256
+MAX_ROWS = 50000
+
+class QueryCache(DataAccess) :
+    """LRU cache of search results in front of data_access, bounded by entry and row count and
+    invalidated per table on edits made through it or when the workspace version changes."""
+
+    def __init__(self, data_access, max_entries = MAX_ENTRIES, max_rows = MAX_ROWS) :
+        DataAccess.__init__(self)
+        self.data_access = data_access
+        self.max_entries = max_entries if max_entries else MAX_ENTRIES
+        self.max_rows = max_rows if max_rows else MAX_ROWS
+        self.entries = OrderedDict()
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.version = self._workspaceVersion()
+
+    def __getattr__(self, name) :
+        return getattr(self.__dict__["data_access"], name)
+
+    def __len__(self) :
+        return len(self.entries)
+
+    def _workspaceVersion(self) :
+        return self.data_access.workspaceVersion()
+
+    @staticmethod
+    def key(table, fields, filter, geometry) :
+        fields = fields if isinstance(fields, str) else tuple(fields)
+        return (table, fields, filter, bool(geometry))
+
+    @staticmethod
+    def copyRows(rows) :
+        return [row.clone() if isinstance(row, Row) else dict(row) for row in rows]
+
+    def _checkVersion(self) :
+        version = self._workspaceVersion()
+        if version != self.version :
+            self.version = version
+            if self.entries :
+                ToolboxLogger.debug("Query cache cleared: workspace changed")
+            self.invalidate()
+
+    def _evict(self) :
+        while self.entries and (len(self.entries) > self.max_entries or self.rows > self.max_rows) :
+            key, rows = self.entries.popitem(last=False)
+            self.rows -= len(rows)
+            self.evictions += 1
+
+    def invalidate(self, table = None) :
+        if table is None :
+            self.entries.clear()
+            self.rows = 0
+            return
+
+        for key in [key for key in self.entries if key[0] == table] :
+            self.rows -= len(self.entries.pop(key))
+
+    def stats(self) :
+        return {"entries": len(self.entries), "rows": self.rows, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def findTablePath(self, name) :
+        return self.data_access.findTablePath(name)
+
+    def query(self, table, fields="*", filter=None, geometry=False) :
+        return self.search(table, fields, filter, geometry)
+
+    def add(self, table, fields, values) :
+        return self.insert(table, fields, values)
+
+    def search(self, table, fields="*", filter=None, geometry=False) :
+        self._checkVersion()
+        key = QueryCache.key(table, fields, filter, geometry)
+        rows = self.entries.get(key)
+        if rows is not None :
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return QueryCache.copyRows(rows)
+
+        self.misses += 1
+        rows = self.data_access.search(table, fields, filter, geometry)
+        if rows is None or len(rows) > self.max_rows :
+            return rows
+
+        self.entries[key] = QueryCache.copyRows(rows)
+        self.rows += len(rows)
+        self._evict()
+        return rows
+
+    def iter_search(self, table, fields="*", filter=None, geometry=False, page_size=None) :
+        return self.data_access.iter_search(table, fields, filter, geometry, page_size)
+
+    def frame(self, table, fields, filter=None, categorical=()) :
+        return self.data_access.frame(table, fields, filter, categorical)
+
+    def _startEditing(self) :
+        self.data_access._startEditing()
+
+    def _stopEditing(self, save_changes=True) :
+        self.data_access._stopEditing(save_changes)
+
+    def _insertRows(self, table, fields, values) :
+        self.invalidate(table)
+        return self.data_access._insertRows(table, fields, values)
+
+    def _updateRows(self, table, fields, values, filter = None) :
+        self.invalidate(table)
+        return self.data_access._updateRows(table, fields, values, filter)
+
+    def _deleteRows(self, table, filter = None) :
+        self.invalidate(table)
+        return self.data_access._deleteRows(table, filter)
+
+    def _readInserted(self, table, ids, geometry = False) :
+        return self.data_access._readInserted(table, ids, geometry)
+
+    def flushed(self, registers, changes) :
+        for table in registers :
+            self.invalidate(table)
+        for operation, table, fields, values, filter in changes :
+            self.invalidate(table)
+        self.version = self._workspaceVersion()
+        self.data_access.flushed(registers, changes)
+
+    def insert(self, table, fields, values) :
+        self.invalidate(table)
+        registers = self.data_access.insert(table, fields, values)
+        self.version = self._workspaceVersion()
+        return registers
+
+    def update(self, table, fields, values, filter = None) :
+        self.invalidate(table)
+        self.data_access.update(table, fields, values, filter)
+        self.version = self._workspaceVersion()
+
+    def delete(self, table, fields = None, filter = None) :
+        self.invalidate(table)
+        self.data_access.delete(table, fields, filter)
+        self.version = self._workspaceVersion()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import time
+
+from PublicInspectionArcGIS.Utils import ToolboxLogger, JsonFile, TimeUtil
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+METRIC_PREFIX = "publicinspection_query"
+
+class OperationMeasure :
+    """Times one cursor: from creation to open, then from open to the last row."""
+
+    def __init__(self, metrics, table, operation, where) :
+        self.metrics = metrics
+        self.table = table
+        self.operation = operation
+        self.where = where
+        self.started = time.perf_counter()
+        self.opened_at = None
+
+    def opened(self) :
+        self.opened_at = time.perf_counter()
+
+    def done(self, rows) :
+        finished = time.perf_counter()
+        opened_at = self.opened_at if self.opened_at is not None else finished
+        self.metrics.record(self.table, self.operation, self.where, rows, opened_at - self.started, finished - opened_at)
+
+class NullMeasure :
+
+    def opened(self) :
+        pass
+
+    def done(self, rows) :
+        pass
+
+NULL_MEASURE = NullMeasure()
+
+class QueryMetrics :
+    """Data access totals of one tool run, grouped by table, operation and where-clause shape."""
+
+    _current = None
+
+    def __init__(self, tool_name = "") :
+        self.tool_name = tool_name
+        self.timer = TimeUtil()
+        self.operations = {}
+
+    @classmethod
+    def begin(cls, tool_name = "") :
+        cls._current = QueryMetrics(tool_name)
+        return cls._current
+
+    @classmethod
+    def end(cls) :
+        metrics = cls._current
+        cls._current = None
+        if metrics is not None :
+            metrics.timer.stopTimer()
+        return metrics
+
+    @classmethod
+    def measure(cls, table, operation, where = None) :
+        metrics = cls._current
+        if metrics is None :
+            return NULL_MEASURE
+        return OperationMeasure(metrics, table, operation, where)
+
+    @staticmethod
+    def shape(where) :
+        if not where :
+            return ""
+        shape = STRING_LITERAL.sub("?", where)
+        shape = NUMBER_LITERAL.sub("?", shape)
+        return " ".join(VALUE_LIST.sub("(?)", shape).split())
+
+    def record(self, table, operation, where, rows, open_seconds, iterate_seconds) :
+        key = (table, operation, QueryMetrics.shape(where))
+        totals = self.operations.get(key)
+        if totals is None :
+            totals = {"cursors": 0, "rows": 0, "open_seconds": 0.0, "iterate_seconds": 0.0}
+            self.operations[key] = totals
+        totals["cursors"] += 1
+        totals["rows"] += rows if rows else 0
+        totals["open_seconds"] += open_seconds
+        totals["iterate_seconds"] += iterate_seconds
+
+    def totals(self, by = ("table", "operation")) :
+        positions = [("table", "operation", "where").index(name) for name in by]
+        grouped = {}
+        for key, totals in self.operations.items() :
+            group = grouped.setdefault(tuple(key[p] for p in positions), {"cursors": 0, "rows": 0, "open_seconds": 0.0, "iterate_seconds": 0.0})
+            for name, value in totals.items() :
+                group[name] += value
+        return grouped
+
+    def toDict(self) :
+        seconds = self.timer.timeSpan.total_seconds() if self.timer.timeSpan else None
+        operations = [dict(table=table, operation=operation, where=where, **totals)
+            for (table, operation, where), totals in sorted(self.operations.items(), key=lambda item : -item[1]["open_seconds"] - item[1]["iterate_seconds"])]
+        return {
+            "tool": self.tool_name,
+            "started": self.timer.startTime.isoformat(),
+            "seconds": seconds,
+            "cursors": sum(o["cursors"] for o in operations),
+            "rows": sum(o["rows"] for o in operations),
+            "operations": operations
+        }
+
+    @staticmethod
+    def _label(value) :
+        return "{}".format(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    def toOpenMetrics(self) :
+        families = [
+            ("cursors", "counter", "Cursors opened", "cursors"),
+            ("rows", "counter", "Rows read or written", "rows"),
+            ("open_seconds", "counter", "Seconds spent opening cursors", "open_seconds"),
+            ("iterate_seconds", "counter", "Seconds spent iterating cursors", "iterate_seconds")
+        ]
+        totals = self.totals()
+        lines = []
+        for name, metric_type, help, field in families :
+            family = "{}_{}".format(METRIC_PREFIX, name)
+            lines.append("# TYPE {} {}".format(family, metric_type))
+            lines.append("# HELP {} {}".format(family, help))
+            for (table, operation), values in sorted(totals.items()) :
+                lines.append("{}_total{{tool=\"{}\",table=\"{}\",operation=\"{}\"}} {}".format(
+                    family, QueryMetrics._label(self.tool_name), QueryMetrics._label(table), QueryMetrics._label(operation), values[field]))
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, folder) :
+        if not os.path.exists(folder) :
+            os.makedirs(folder)
+        name = "{}_{}".format(self.tool_name, self.timer.startTime.strftime("%Y%m%d%H%M%S"))
+        json_path = os.path.join(folder, "{}.json".format(name))
+        JsonFile.writeFile(json_path, self.toDict())
+        with open(os.path.join(folder, "{}.txt".format(name)), "w") as f :
+            f.write(self.toOpenMetrics())
+        return json_path
+
+class QueryMetricsHook :
+    """Tool run hook that collects QueryMetrics during execute and writes them to the tool's metrics folder."""
+
+    def start(self, tool) :
+        QueryMetrics.begin(type(tool).__name__)
+
+    def finish(self, tool) :
+        metrics = QueryMetrics.end()
+        folder = getattr(tool, "metricsPath", None)
+        if metrics is None or not folder :
+            return
+        path = metrics.write(folder)
+        summary = metrics.toDict()
+        ToolboxLogger.info("Query Metrics: {} cursors, {} rows -> {}".format(summary["cursors"], summary["rows"], path))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+class Row :
+    """Positional row with case-insensitive, dict-like field access; unknown keys go to an extra dict."""
+
+    __slots__ = ("_values", "_extra")
+    _fields = ()
+    _index = {}
+    _types = {}
+
+    def __init__(self, values) :
+        self._values = values
+        self._extra = None
+
+    @staticmethod
+    def fieldIndex(fields) :
+        index = {}
+        for position, field in enumerate(fields) :
+            index.setdefault(field.lower(), position)
+        return index
+
+    @classmethod
+    def getType(cls, table, fields) :
+        key = (table, tuple(fields))
+        row_type = Row._types.get(key)
+        if row_type is None :
+            row_type = type("Row", (Row,), {"__slots__": (), "_fields": tuple(fields), "_index": Row.fieldIndex(fields)})
+            Row._types[key] = row_type
+        return row_type
+
+    def _position(self, key) :
+        return self._index.get(key.lower()) if isinstance(key, str) else None
+
+    def __getitem__(self, key) :
+        position = self._position(key)
+        if position is not None :
+            return self._values[position]
+        if self._extra is not None and key in self._extra :
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value) :
+        position = self._position(key)
+        if position is not None :
+            self._values[position] = value
+        else :
+            if self._extra is None :
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key) :
+        return self._position(key) is not None or (self._extra is not None and key in self._extra)
+
+    def __iter__(self) :
+        return iter(self.keys())
+
+    def __len__(self) :
+        return len(self._fields) + (len(self._extra) if self._extra else 0)
+
+    def __eq__(self, other) :
+        if isinstance(other, (Row, dict)) :
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self) :
+        return repr(dict(self.items()))
+
+    def get(self, key, default = None) :
+        try :
+            return self[key]
+        except KeyError :
+            return default
+
+    def keys(self) :
+        return list(self._fields) + (list(self._extra.keys()) if self._extra else [])
+
+    def values(self) :
+        return list(self._values) + (list(self._extra.values()) if self._extra else [])
+
+    def items(self) :
+        return list(zip(self.keys(), self.values()))
+
+    def copy(self) :
+        return dict(self.items())
+
+    def clone(self) :
+        row = type(self)(list(self._values))
+        if self._extra is not None :
+            row._extra = dict(self._extra)
+        return row
@@ -2,8 +2,12 @@ import arcpy
 import shutil
 import os
 
-from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration
+from PublicInspectionArcGIS.Utils import ToolboxLogger, Configuration, ToolRunHooks
 from PublicInspectionArcGIS.PublicInspection import PublicInspection
+from PublicInspectionArcGIS.ArcpyDataAccess import ArcpyDataAccess
+from PublicInspectionArcGIS.WorkspaceMetadata import WorkspaceMetadata
+
+PAGE_SIZE = 5000
 
 class SetupDataSources(PublicInspection) :
     def __init__(self, configuration : Configuration, aprx : arcpy.mp.ArcGISProject):
@@ -38,6 +42,11 @@ class SetupDataSources(PublicInspection) :
 
         if self.da is not None :
             ToolboxLogger.debug("Data Access Object:     {}".format(self.da))
+
+    def refreshDataAccess(self) :
+        WorkspaceMetadata.invalidate(self.inspectionDataSource)
+        self.da = ArcpyDataAccess(self.inspectionDataSource)
+        self.invalidate_spatialunit_index()
     
     @ToolboxLogger.log_method
     def createSurveyDataSource(self):
@@ -88,6 +97,7 @@ class SetupDataSources(PublicInspection) :
 
         arcpy.management.ImportXMLWorkspaceDocument(self.inspectionDataSource, xml_path, "SCHEMA_ONLY")
         ToolboxLogger.info("Inspection Parcel Fabric Schema Imported")
+        self.refreshDataAccess()
     
     @ToolboxLogger.log_method
     def appendDataset(self, input_ds):
@@ -161,22 +171,21 @@ class SetupDataSources(PublicInspection) :
                     destination_classnames = relationship_class.destinationClassNames
                     origin_pk_name =[k[0] for k in relationship_class.originClassKeys if k[1] == "OriginPrimary"][0]
                     origin_fk_name =[k[0] for k in relationship_class.originClassKeys if k[1] == "OriginForeign"][0]
-                    origin_registers = self.da.search(origin_classname, [origin_pk_name, fix_rs_field.name])
-                    ToolboxLogger.debug("Origin register count = {}.".format(len(origin_registers)))
                     for destination_classname in destination_classnames:
                         ToolboxLogger.debug("Destination Classname '{}'.".format(destination_classname))
 
-                        destination_registers = self.da.search(destination_classname)
+                        destination_register = next(self.da.iter_search(destination_classname, ["OID@"], page_size=1), None)
                         relationship_classes_fixed.append(relationship_class)
                         ToolboxLogger.debug("Fixing Relationship '{}'.".format(relationship_class.name))
 
-                        ToolboxLogger.debug("Destination register count = {}.".format(len(destination_registers)))
-                        if len(destination_registers) > 0:
-
-                            for register in origin_registers:
+                        if destination_register is not None:
+                            origin_count = 0
+                            for register in self.da.iter_search(origin_classname, [origin_pk_name, fix_rs_field.name], page_size=PAGE_SIZE):
                                 fix_rs_value = register[fix_rs_field.name]
+                                origin_count += 1
 
                                 self.da.update(destination_classname, [origin_fk_name], [register[origin_pk_name]], "{} = '{}'".format(origin_fk_name, fix_rs_value))
+                            ToolboxLogger.debug("Origin register count = {}.".format(origin_count))
    
     @ToolboxLogger.log_method           
     def cleanFixRelationshipsData(self, dataset) :
@@ -220,6 +229,7 @@ class SetupDataSources(PublicInspection) :
         self.cleanFixRelationshipsData(self.inspectionDataSource)
         self.cleanFixRelationshipsData(os.path.join(self.inspectionDataSource, "Parcel"))
         self.cleanFixRelationshipsData(os.path.join(self.inspectionDataSource, "ReferenceObjects"))
+        self.refreshDataAccess()
 
     @ToolboxLogger.log_method
     def appendParcelData(self) :
@@ -232,6 +242,7 @@ class SetupDataSources(PublicInspection) :
         tables = arcpy.ListTables()
         for input_tb in tables:
             self.appendDataset(input_tb)
+        self.refreshDataAccess()
 
     @ToolboxLogger.log_method
     def createParcelRecords(self) : 
@@ -377,6 +388,7 @@ class SetupDataSources(PublicInspection) :
         ToolboxLogger.info("Validation done")
         return len(validation_errors)==0, validation_errors
 
+    @ToolRunHooks.run
     @ToolboxLogger.log_method
     def execute(self) :
         ToolboxLogger.info("Load Data Source:       {}".format(self.loadDataSourcePath))
@@ -1,6 +1,6 @@
 import arcpy
 
-from PublicInspectionArcGIS.Utils import ARCGIS_HANDLER, STREAM_HANDLER, ToolboxLogger
+from PublicInspectionArcGIS.Utils import ARCGIS_HANDLER, STREAM_HANDLER, ToolboxLogger, ToolRunHooks
 from PublicInspectionArcGIS.ToolsLib import PublicInspectionTools
 
 class SetupDataSourcesTool(object):
@@ -54,6 +54,7 @@ class SetupDataSourcesTool(object):
         parameter.  This method is called after internal validation."""
         return
 
+    @ToolRunHooks.run
     def execute(self, parameters, messages):
         """The source code of the tool."""
         if self.tool is not None:
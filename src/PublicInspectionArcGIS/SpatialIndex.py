@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import math
+
+class SpatialIndex :
+    """Uniform grid over bounding boxes given as (xmin, ymin, xmax, ymax) tuples."""
+
+    def __init__(self, extents, cell_size = None) :
+        self._extents = [tuple(extent) for extent in extents]
+        self._cells = {}
+
+        if cell_size is None :
+            cell_size = SpatialIndex.defaultCellSize(self._extents)
+        self.cell_size = cell_size
+
+        for key, extent in enumerate(self._extents) :
+            for cell in self._coverCells(extent) :
+                self._cells.setdefault(cell, []).append(key)
+
+    @staticmethod
+    def defaultCellSize(extents) :
+        sizes = [max(e[2] - e[0], e[3] - e[1]) for e in extents]
+        sizes = [s for s in sizes if s > 0]
+        if not sizes :
+            return 1.0
+        return sum(sizes) / len(sizes)
+
+    @staticmethod
+    def expand(extent, tolerance) :
+        return (extent[0] - tolerance, extent[1] - tolerance, extent[2] + tolerance, extent[3] + tolerance)
+
+    @staticmethod
+    def overlaps(extent0, extent1) :
+        return not (extent0[2] < extent1[0] or extent1[2] < extent0[0] or extent0[3] < extent1[1] or extent1[3] < extent0[1])
+
+    def _coverCells(self, extent) :
+        x0 = math.floor(extent[0] / self.cell_size)
+        y0 = math.floor(extent[1] / self.cell_size)
+        x1 = math.floor(extent[2] / self.cell_size)
+        y1 = math.floor(extent[3] / self.cell_size)
+        for x in range(x0, x1 + 1) :
+            for y in range(y0, y1 + 1) :
+                yield (x, y)
+
+    def __len__(self) :
+        return len(self._extents)
+
+    def extent(self, key) :
+        return self._extents[key]
+
+    def query(self, extent, tolerance = 0.0) :
+        search_extent = SpatialIndex.expand(extent, tolerance)
+        keys = set()
+        for cell in self._coverCells(search_extent) :
+            for key in self._cells.get(cell, []) :
+                if key not in keys and SpatialIndex.overlaps(search_extent, self._extents[key]) :
+                    keys.add(key)
+        return sorted(keys)
+
+    def neighbors(self, key, tolerance = 0.0) :
+        return [k for k in self.query(self._extents[key], tolerance) if k != key]
+
+    def partition(self, tile_count) :
+        if not self._extents :
+            return []
+        xmin = min(e[0] for e in self._extents)
+        ymin = min(e[1] for e in self._extents)
+        xmax = max(e[2] for e in self._extents)
+        ymax = max(e[3] for e in self._extents)
+
+        columns = max(1, int(math.ceil(math.sqrt(tile_count))))
+        rows = max(1, int(math.ceil(tile_count / columns)))
+        width = (xmax - xmin) / columns or 1.0
+        height = (ymax - ymin) / rows or 1.0
+
+        tiles = {}
+        for key, extent in enumerate(self._extents) :
+            column = min(columns - 1, int(((extent[0] + extent[2]) / 2 - xmin) / width))
+            row = min(rows - 1, int(((extent[1] + extent[3]) / 2 - ymin) / height))
+            tiles.setdefault((row, column), []).append(key)
+        return [tiles[tile] for tile in sorted(tiles)]
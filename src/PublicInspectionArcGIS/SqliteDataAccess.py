@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import struct
+import uuid
+
+from PublicInspectionArcGIS.Utils import ToolboxLogger
+from PublicInspectionArcGIS.DataAccess import DataAccess, GEOGRAPHIC_METERS_PER_UNIT
+from PublicInspectionArcGIS.Row import Row
+from PublicInspectionArcGIS.QueryMetrics import QueryMetrics
+
+OID_FIELD = "OBJECTID"
+GLOBALID_FIELD = "GlobalID"
+GEOMETRY_COLUMN = "SHAPE"
+GEOMETRY_TOKEN = "SHAPE@"
+GEOMETRY_WKB_TOKEN = "SHAPE@WKB"
+GEOMETRY_XY_TOKEN = "SHAPE@XY"
+
+FIELD_TYPES = {
+    "TEXT": "TEXT",
+    "GUID": "TEXT",
+    "SHORT": "INTEGER",
+    "LONG": "INTEGER",
+    "FLOAT": "REAL",
+    "DOUBLE": "REAL",
+    "DATE": "TIMESTAMP"
+}
+
+ENVELOPE_SIZES = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+
+class WkbCodec :
+    """Default geometry codec: SHAPE@ values are WKB bytes."""
+
+    def encode(self, geometry) :
+        return bytes(geometry) if geometry is not None else None
+
+    def decode(self, wkb) :
+        return wkb
+
+class SqliteDataAccess(DataAccess) :
+    def __init__(self, database_path, geometry_codec = None) :
+        DataAccess.__init__(self)
+        self.workspace_path = database_path
+        self.geometry_codec = geometry_codec if geometry_codec else WkbCodec()
+        self.connection = sqlite3.connect(database_path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None)
+        self._edit_depth = 0
+        self._save_changes = True
+        self.__catalog = {}
+        self.__createMetadataTables()
+        self.__populate_catalog()
+
+    def close(self) :
+        self.connection.close()
+
+    def __createMetadataTables(self) :
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (
+            srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL,
+            organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT)""")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS gpkg_contents (
+            table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+            description TEXT DEFAULT '', last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+            min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER)""")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS gpkg_geometry_columns (
+            table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL,
+            srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL,
+            CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name))""")
+        self.connection.execute("""INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES
+            ('WGS 84 geodetic', 4326, 'EPSG', 4326, 'undefined', NULL)""")
+
+    def __populate_catalog(self) :
+        self.__catalog = {}
+        self.__geometry_columns = {}
+        for name, in self.connection.execute("SELECT table_name FROM gpkg_contents") :
+            self.__catalog[name] = name
+        for name, column in self.connection.execute("SELECT table_name, column_name FROM gpkg_geometry_columns") :
+            self.__geometry_columns[name] = column
+
+    def findTablePath(self, name) :
+        return self.__catalog[name]
+
+    def workspaceVersion(self) :
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def isGeographic(self, table) :
+        row = self.connection.execute("""SELECT c.srs_id, s.definition FROM gpkg_contents c
+            LEFT JOIN gpkg_spatial_ref_sys s ON s.srs_id = c.srs_id WHERE c.table_name = ?""", (self.findTablePath(table),)).fetchone()
+        return row is not None and (row[0] == 4326 or (row[1] or "").upper().startswith("GEOGCS"))
+
+    def metersPerUnit(self, table) :
+        return GEOGRAPHIC_METERS_PER_UNIT if self.isGeographic(table) else 1.0
+
+    def listTables(self) :
+        return list(self.__catalog.keys())
+
+    def createTable(self, name, fields, geometry_type = None, srs_id = 4326) :
+        columns = ["{} INTEGER PRIMARY KEY AUTOINCREMENT".format(OID_FIELD), "{} TEXT UNIQUE".format(GLOBALID_FIELD)]
+        for field in fields :
+            field_name, field_type = field[0], FIELD_TYPES[field[1].upper()]
+            default = field[2] if len(field) > 2 else None
+            if default is None :
+                columns.append("{} {}".format(field_name, field_type))
+            else :
+                columns.append("{} {} DEFAULT {}".format(field_name, field_type, "'{}'".format(default) if isinstance(default, str) else default))
+        if geometry_type :
+            columns.append("{} BLOB".format(GEOMETRY_COLUMN))
+
+        self.connection.execute("CREATE TABLE \"{}\" ({})".format(name, ", ".join(columns)))
+        self.connection.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, srs_id) VALUES (?, ?, ?, ?)",
+            (name, "features" if geometry_type else "attributes", name, srs_id))
+        if geometry_type :
+            self.connection.execute("INSERT INTO gpkg_geometry_columns VALUES (?, ?, ?, ?, 0, 0)", (name, GEOMETRY_COLUMN, geometry_type.upper(), srs_id))
+        self.__populate_catalog()
+
+    def _tableFields(self, table) :
+        return [row[1] for row in self.connection.execute("PRAGMA table_info(\"{}\")".format(self.findTablePath(table)))]
+
+    def _encodeGeometry(self, table, geometry) :
+        if geometry is None :
+            return None
+        wkb = self.geometry_codec.encode(geometry)
+        srs_id = self.connection.execute("SELECT srs_id FROM gpkg_contents WHERE table_name = ?", (table,)).fetchone()[0]
+        return struct.pack("<2sBBi", b"GP", 0, 1, srs_id if srs_id else 0) + wkb
+
+    @staticmethod
+    def _wkb(blob) :
+        if blob is None :
+            return None
+        blob = bytes(blob)
+        if blob[:2] != b"GP" :
+            return blob
+        flags = blob[3]
+        return blob[8 + ENVELOPE_SIZES[(flags >> 1) & 0x07]:]
+
+    @staticmethod
+    def _xy(wkb) :
+        if wkb is None :
+            return None
+        byte_order = "<" if wkb[0] == 1 else ">"
+        if struct.unpack_from(byte_order + "I", wkb, 1)[0] % 1000 != 1 :
+            return None
+        return struct.unpack_from(byte_order + "dd", wkb, 5)
+
+    def _columns(self, table, fields, geometry) :
+        if fields == "*" :
+            fields = [f for f in self._tableFields(table) if f.upper() != GEOMETRY_COLUMN]
+            if geometry and table in self.__geometry_columns :
+                fields.append(GEOMETRY_TOKEN)
+        elif isinstance(fields, str) :
+            fields = [fields]
+
+        columns = []
+        for field in fields :
+            if field.upper() in (GEOMETRY_TOKEN, GEOMETRY_WKB_TOKEN, GEOMETRY_XY_TOKEN) :
+                columns.append(self.__geometry_columns[table])
+            elif field.upper().startswith(GEOMETRY_TOKEN) :
+                raise ValueError("Unsupported geometry token '{}'".format(field))
+            else :
+                columns.append(field)
+        return list(fields), columns
+
+    def _decodeValue(self, field, value) :
+        if field.upper() == GEOMETRY_TOKEN :
+            wkb = self._wkb(value)
+            return self.geometry_codec.decode(wkb) if wkb is not None else None
+        if field.upper() == GEOMETRY_WKB_TOKEN :
+            return self._wkb(value)
+        if field.upper() == GEOMETRY_XY_TOKEN :
+            return self._xy(self._wkb(value))
+        return value
+
+    def _encodeValues(self, table, fields, values) :
+        return [self._encodeGeometry(table, v) if f.upper() in (GEOMETRY_TOKEN, GEOMETRY_WKB_TOKEN) else v for f, v in zip(fields, values)]
+
+    def query(self, table, fields="*", filter=None, geometry=False) :
+        return self.search(table, fields, filter, geometry)
+
+    def add(self, table, fields, values) :
+        return self.insert(table, fields, values)
+
+    def iter_search(self, table, fields="*", filter=None, geometry=False, page_size=None) :
+        clauses = self.chunkInClause(filter)
+        if clauses is not None :
+            filter = " OR ".join("({})".format(clause) for clause in clauses)
+
+        fields, columns = self._columns(table, fields, geometry)
+        sql = "SELECT {}, {} FROM \"{}\" WHERE ({})".format(OID_FIELD, ", ".join(columns), self.findTablePath(table), filter if filter else "1 = 1")
+
+        row_type = Row.getType(table, fields)
+        if not page_size :
+            measure = QueryMetrics.measure(table, "search", filter)
+            count = 0
+            try :
+                cursor = self.connection.execute(sql + " ORDER BY {}".format(OID_FIELD))
+                measure.opened()
+                for values in cursor :
+                    count += 1
+                    yield row_type([self._decodeValue(f, v) for f, v in zip(fields, values[1:])])
+            finally :
+                measure.done(count)
+            return
+
+        last_id = None
+        while True :
+            page_sql = sql if last_id is None else sql + " AND {} > {}".format(OID_FIELD, last_id)
+            measure = QueryMetrics.measure(table, "iter_search", page_sql)
+            rows = self.connection.execute(page_sql + " ORDER BY {} LIMIT {}".format(OID_FIELD, int(page_size))).fetchall()
+            measure.opened()
+            measure.done(len(rows))
+            for values in rows :
+                yield row_type([self._decodeValue(f, v) for f, v in zip(fields, values[1:])])
+            if len(rows) < page_size :
+                return
+            last_id = rows[-1][0]
+
+    def search(self, table, fields="*", filter=None, geometry=False) :
+        try :
+            return list(self.iter_search(table, fields, filter, geometry))
+        except Exception as e:
+            ToolboxLogger.debug("ERROR: ---->{}".format(e))
+
+    def _startEditing(self) :
+        if self._edit_depth == 0 :
+            self.connection.execute("BEGIN")
+            self._save_changes = True
+        self._edit_depth += 1
+
+    def _stopEditing(self, save_changes=True) :
+        self._edit_depth -= 1
+        self._save_changes = self._save_changes and save_changes
+        if self._edit_depth == 0 :
+            self.connection.execute("COMMIT" if self._save_changes else "ROLLBACK")
+
+    def _insertRows(self, table, fields, values) :
+        table_path = self.findTablePath(table)
+        fields = list(fields)
+        add_globalid = GLOBALID_FIELD.lower() not in [f.lower() for f in fields]
+        _, columns = self._columns(table, fields, False)
+        if add_globalid :
+            columns.append(GLOBALID_FIELD)
+
+        sql = "INSERT INTO \"{}\" ({}) VALUES ({})".format(table_path, ", ".join(columns), ", ".join(["?"] * len(columns)))
+        measure = QueryMetrics.measure(table, "insert")
+        measure.opened()
+        inserted_id = []
+        for row in values :
+            row = self._encodeValues(table, fields, row)
+            if add_globalid :
+                row.append("{{{}}}".format(str(uuid.uuid4()).upper()))
+            inserted_id.append(self.connection.execute(sql, row).lastrowid)
+        measure.done(len(inserted_id))
+        return inserted_id
+
+    def _updateRows(self, table, fields, values, filter = None) :
+        clauses = self.chunkInClause(filter)
+        if clauses is not None :
+            return sum(self._updateRows(table, fields, values, clause) for clause in clauses)
+
+        _, columns = self._columns(table, fields, False)
+        sql = "UPDATE \"{}\" SET {}".format(self.findTablePath(table), ", ".join(["{} = ?".format(c) for c in columns]))
+        if filter :
+            sql += " WHERE {}".format(filter)
+
+        measure = QueryMetrics.measure(table, "update", filter)
+        count = self.connection.execute(sql, self._encodeValues(table, fields, values)).rowcount
+        measure.opened()
+        measure.done(count)
+        if count == 0:
+            ToolboxLogger.debug("No rows were updated")
+            ToolboxLogger.debug("Table: {}, Fields: {}, Values: {}, Filter: {}", table, fields, values, filter)
+        return count
+
+    def _deleteRows(self, table, filter = None) :
+        clauses = self.chunkInClause(filter)
+        if clauses is not None :
+            return sum(self._deleteRows(table, clause) for clause in clauses)
+
+        sql = "DELETE FROM \"{}\"".format(self.findTablePath(table))
+        if filter :
+            sql += " WHERE {}".format(filter)
+        measure = QueryMetrics.measure(table, "delete", filter)
+        count = self.connection.execute(sql).rowcount
+        measure.opened()
+        measure.done(count)
+        return count
+
+    def _readInserted(self, table, ids, geometry = False) :
+        if not ids :
+            return []
+        registers = self.search(table, "*", DataAccess.getWhereClause(OID_FIELD, list(ids)), geometry=geometry) or []
+        registers_by_id = {register[OID_FIELD]: register for register in registers}
+        return [registers_by_id[id] for id in ids if id in registers_by_id]
+
+    def insert(self, table, fields, values) :
+        self._startEditing()
+        try :
+            inserted_id = self._insertRows(table, fields, values)
+        except Exception :
+            self._stopEditing(save_changes=False)
+            raise
+        self._stopEditing(save_changes=True)
+
+        return self._readInserted(table, inserted_id[:1], geometry=GEOMETRY_TOKEN in fields)
+
+    def update(self, table, fields, values, filter = None) :
+        self._startEditing()
+        try :
+            self._updateRows(table, fields, values, filter)
+        except Exception :
+            self._stopEditing(save_changes=False)
+            raise
+        self._stopEditing(save_changes=True)
+
+    def delete(self, table, fields = None, filter = None) :
+        self._startEditing()
+        try :
+            self._deleteRows(table, filter)
+        except Exception :
+            self._stopEditing(save_changes=False)
+            raise
+        self._stopEditing(save_changes=True)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import cProfile
+import threading
+import tracemalloc
+
+from PublicInspectionArcGIS.Utils import ToolboxLogger, TimeUtil
+
+PROFILE_ENV_VAR = "PUBLICINSPECTION_PROFILE"
+SAMPLE_INTERVAL = 0.005
+TOP_ALLOCATIONS = 15
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__)
+]
+
+class StackSampler :
+    """Samples one thread's Python stack on a background thread and counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval = SAMPLE_INTERVAL) :
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+
+    @staticmethod
+    def collapse(frame) :
+        names = []
+        while frame is not None :
+            code = frame.f_code
+            names.append("{}:{}".format(os.path.basename(code.co_filename), getattr(code, "co_qualname", code.co_name)))
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self) :
+        while not self._stop.wait(self.interval) :
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None :
+                stack = StackSampler.collapse(frame)
+                self.counts[stack] = self.counts.get(stack, 0) + 1
+
+    def start(self) :
+        self._thread.start()
+
+    def stop(self) :
+        self._stop.set()
+        self._thread.join()
+
+    def lines(self) :
+        return ["{} {}".format(stack, count) for stack, count in sorted(self.counts.items())]
+
+class ToolProfiler :
+    """cProfile, sampled collapsed stacks and tracemalloc allocations of one tool run, split by stage."""
+
+    def __init__(self, name, interval = SAMPLE_INTERVAL) :
+        self.name = name
+        self.timer = TimeUtil()
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.stages = []
+        self._stage_snapshots = []
+        self._started_tracemalloc = False
+
+    @staticmethod
+    def requested(configured = False) :
+        value = os.environ.get(PROFILE_ENV_VAR)
+        if value is not None :
+            return value.strip().lower() not in ("", "0", "false", "no")
+        return bool(configured)
+
+    @staticmethod
+    def snapshot() :
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def start(self) :
+        if not tracemalloc.is_tracing() :
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._start_snapshot = ToolProfiler.snapshot()
+        ToolboxLogger.stage_listener = self
+        self.sampler.start()
+        self.profile.enable()
+
+    def stop(self) :
+        self.profile.disable()
+        self.sampler.stop()
+        ToolboxLogger.stage_listener = None
+        self._end_snapshot = ToolProfiler.snapshot()
+        self.peak = tracemalloc.get_traced_memory()[1]
+        if self._started_tracemalloc :
+            tracemalloc.stop()
+        self.timer.stopTimer()
+
+    def begin(self, name) :
+        self._stage_snapshots.append((name, time.perf_counter(), ToolProfiler.snapshot()))
+
+    def end(self, name) :
+        stage, started, snapshot = self._stage_snapshots.pop()
+        statistics = ToolProfiler.snapshot().compare_to(snapshot, "lineno")
+        self.stages.append((stage, time.perf_counter() - started, statistics[:TOP_ALLOCATIONS]))
+
+    @staticmethod
+    def _allocation_lines(statistics) :
+        return ["    {}".format(statistic) for statistic in statistics]
+
+    def memoryReport(self) :
+        lines = ["{} - peak traced memory: {:.1f} KiB".format(self.name, self.peak / 1024.0), ""]
+        for stage, seconds, statistics in self.stages :
+            lines.append("Stage {} ({:.3f}s)".format(stage, seconds))
+            lines.extend(self._allocation_lines(statistics))
+            lines.append("")
+        lines.append("Run total")
+        lines.extend(self._allocation_lines(self._end_snapshot.compare_to(self._start_snapshot, "lineno")[:TOP_ALLOCATIONS]))
+        return "\n".join(lines) + "\n"
+
+    def write(self, folder) :
+        if not os.path.exists(folder) :
+            os.makedirs(folder)
+        base = os.path.join(folder, "{}_{}".format(self.name, self.timer.startTime.strftime("%Y%m%d%H%M%S")))
+
+        self.profile.dump_stats("{}.prof".format(base))
+        with open("{}.collapsed.txt".format(base), "w") as f :
+            f.write("\n".join(self.sampler.lines()) + "\n")
+        with open("{}.memory.txt".format(base), "w") as f :
+            f.write(self.memoryReport())
+        return base
+
+class ToolProfilerHook :
+    """Tool run hook that profiles execute when PUBLICINSPECTION_PROFILE or PROFILE_ENABLED is set."""
+
+    def __init__(self) :
+        self.profiler = None
+
+    def start(self, tool) :
+        folder = getattr(tool, "profilePath", None)
+        if folder and ToolProfiler.requested(getattr(tool, "PROFILE_ENABLED", False)) :
+            self.profiler = ToolProfiler(type(tool).__name__)
+            self.profiler.start()
+
+    def finish(self, tool) :
+        profiler = self.profiler
+        if profiler is None :
+            return
+        self.profiler = None
+        profiler.stop()
+        base = profiler.write(tool.profilePath)
+        ToolboxLogger.info("Profile: {}.prof, .collapsed.txt, .memory.txt", base)
@@ -34,11 +34,15 @@ class PublicInspectionTools :
             return None
 
     @staticmethod
-    def CalculateBoundaries(aprx=None, legal_id=None) :
+    def CalculateBoundaries(aprx=None, legal_id=None, snapshot=False, workers=1, incremental=False, topology=False) :
         if aprx != None :
             configuration = PublicInspectionTools.getConfiguration()
             tool = CalculateBoundaries(configuration=configuration, aprx=aprx)
             tool.legal_id = legal_id
+            tool.use_snapshot = snapshot
+            tool.workers = workers
+            tool.incremental = incremental
+            tool.use_topology = topology
             tool.execute()
 
     @staticmethod
@@ -76,12 +80,24 @@ class PublicInspectionTools :
             return None
         
     @staticmethod
-    def CalculateCertificate(aprx=None,legal_id=None) :
+    def CalculateCertificate(aprx=None,legal_id=None, snapshot=False) :
         if aprx != None :   
             configuration = PublicInspectionTools.getConfiguration()
             tool = CalculateCertificate(configuration=configuration, aprx=aprx, legal_id=legal_id)
+            tool.use_snapshot = snapshot
             tool.execute()   
 
+    @staticmethod
+    def CalculateCertificates(aprx=None, legal_ids=None, all_approved=False, workers=1, visitor_contact=None, snapshot=False) :
+        if aprx != None :
+            configuration = PublicInspectionTools.getConfiguration()
+            tool = CalculateCertificate(configuration=configuration, aprx=aprx, visitor_contact=visitor_contact)
+            tool.legal_ids = legal_ids
+            tool.all_approved = all_approved
+            tool.workers = workers
+            tool.use_snapshot = snapshot
+            tool.execute()
+
     @staticmethod
     def getCalculateDashboard(aprx=None ):
         if aprx != None :   
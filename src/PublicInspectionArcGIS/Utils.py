@@ -9,6 +9,11 @@ import logging
 import sys
 import os
 import json
+import functools
+import threading
+import time
+import queue
+import contextvars
 
 from datetime import datetime
 from os import path
@@ -23,26 +28,165 @@ ARCGIS_HANDLER = 1
 STREAM_HANDLER = 2
 FILE_HANDLER = 4
 
+TRACE_ENV_VAR = "PUBLICINSPECTION_TRACE"
+TRACE_MAX_EVENTS = 500000
+TRACE_MAX_ARG_LENGTH = 80
+
+class SpanTracer :
+
+  enabled = False
+  _events = []
+  _dropped = 0
+  _origin = 0.0
+  _local = threading.local()
+
+  @staticmethod
+  def requested(configured = False) :
+    value = os.environ.get(TRACE_ENV_VAR)
+    if value is not None :
+      return value.strip().lower() not in ("", "0", "false", "no")
+    return bool(configured)
+
+  @classmethod
+  def start(cls) :
+    cls._events = []
+    cls._dropped = 0
+    cls._origin = time.perf_counter()
+    cls._local = threading.local()
+    cls.enabled = True
+
+  @classmethod
+  def stop(cls) :
+    cls.enabled = False
+    events = cls._events
+    cls._events = []
+    return events
+
+  @staticmethod
+  def argNames(func) :
+    code = getattr(func, "__code__", None)
+    return code.co_varnames[:code.co_argcount] if code else ()
+
+  @staticmethod
+  def keyArgs(names, args, kwargs) :
+    values = {}
+    for name, value in list(zip(names, args)) + list(kwargs.items()) :
+      if name != "self" and (value is None or isinstance(value, (str, int, float, bool))) :
+        value = value if not isinstance(value, str) or len(value) <= TRACE_MAX_ARG_LENGTH else value[:TRACE_MAX_ARG_LENGTH] + "..."
+        values[name] = value
+    return values
+
+  @classmethod
+  def begin(cls, name) :
+    stack = getattr(cls._local, "stack", None)
+    if stack is None :
+      stack = cls._local.stack = []
+    stack.append(name)
+    return time.perf_counter()
+
+  @classmethod
+  def end(cls, name, started, args, error = None) :
+    finished = time.perf_counter()
+    stack = getattr(cls._local, "stack", None)
+    if stack :
+      stack.pop()
+    if len(cls._events) >= TRACE_MAX_EVENTS :
+      cls._dropped += 1
+      return
+
+    if stack :
+      args["parent"] = stack[-1]
+    if error is not None :
+      args["error"] = "{}".format(error)
+    cls._events.append({
+      "name": name,
+      "cat": "log_method",
+      "ph": "X",
+      "ts": (started - cls._origin) * 1000000.0,
+      "dur": (finished - started) * 1000000.0,
+      "pid": os.getpid(),
+      "tid": threading.get_ident(),
+      "args": args
+    })
+
+  @classmethod
+  def write(cls, filename, events) :
+    folder = os.path.dirname(filename)
+    if folder and not os.path.exists(folder) :
+      os.makedirs(folder)
+    trace = {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"dropped": cls._dropped}}
+    with open(filename, 'w') as f:
+      json.dump(trace, f)
+
+class SpanTraceHook :
+
+  def start(self, tool) :
+    if SpanTracer.requested(getattr(tool, "TRACE_ENABLED", False)) and getattr(tool, "tracePath", None) :
+      SpanTracer.start()
+
+  def finish(self, tool) :
+    if not SpanTracer.enabled :
+      return
+    events = SpanTracer.stop()
+    filename = os.path.join(tool.tracePath, "{}_{}.trace.json".format(type(tool).__name__, TimeUtil.nowCode()))
+    SpanTracer.write(filename, events)
+    ToolboxLogger.info("Trace: {} spans -> {}".format(len(events), filename))
+
+class LazyMessage :
+  __slots__ = ("prefix", "indent", "message", "args")
+
+  def __init__(self, prefix, indent, message, args) :
+    self.prefix = prefix
+    self.indent = indent
+    self.message = message
+    self.args = args
+
+  def __str__(self) :
+    message = "{}".format(self.message).format(*self.args) if self.args else self.message
+    return "{}{}{}".format(self.prefix, self.indent, message)
+
+class DeferredQueueHandler(handlers.QueueHandler) :
+
+  def prepare(self, record) :
+    return record
+
 class ToolboxLogger :
 
   _logger = None
+  _listener = None
+  stage_listener = None
+  _indent = contextvars.ContextVar("toolbox_logger_indent", default = "")
+  indentSize = 2
 
   @classmethod
   def log_method(cls, func) :
-    cls.indent = ""
-    cls.indentSize = 2
+    names = SpanTracer.argNames(func)
+    name = func.__qualname__
 
     def inner(*args, **kwargs) :
-      cls._logger.debug("{}-->{}".format(cls.indent, func.__qualname__))
-      cls.indent += " ".ljust(cls.indentSize)
+      tracing = SpanTracer.enabled
+      if tracing :
+        started = SpanTracer.begin(name)
+      indent = cls._indent.get()
+      stage_listener = cls.stage_listener if len(indent) <= cls.indentSize else None
+      if stage_listener is not None :
+        stage_listener.begin(name)
+      cls._logger.debug("%s-->%s", indent, name)
+      token = cls._indent.set(indent + " ".ljust(cls.indentSize))
+      error = None
       try :
         result = func(*args, **kwargs)
       except Exception as e:
-        cls._logger.debug("Exception: {}".format(e))
+        error = e
+        cls._logger.debug("Exception: %s", e)
         raise e
       finally :
-        cls.indent = cls.indent[:-2]
-        cls._logger.debug("{}<--{}".format(cls.indent, func.__qualname__))
+        cls._indent.reset(token)
+        cls._logger.debug("%s<--%s", indent, name)
+        if stage_listener is not None :
+          stage_listener.end(name)
+        if tracing :
+          SpanTracer.end(name, started, SpanTracer.keyArgs(names, args, kwargs), error)
 
       return result
     
@@ -52,8 +196,11 @@ class ToolboxLogger :
   def initLogger(cls, source = "ToolboxLogger", log_path = LOG_PATH, log_file = LOG_FILE, handler_type = ARCGIS_HANDLER) :
     loggerFactory = LoggerFactory()
     cls._logger = loggerFactory.getLogger(source, log_path, log_file, handler_type = handler_type)
-    cls.indent = ""
-    cls.indentSize = 2
+    cls._indent.set("")
+
+  @classmethod
+  def _handlers(cls) :
+    return list(cls._logger.handlers) + (list(cls._listener.handlers) if cls._listener else [])
 
   @classmethod
   def setInfoLevel(cls) :
@@ -61,7 +208,15 @@ class ToolboxLogger :
     cls._logger.setLevel(logging.INFO)
     cls.info("Level: INFO")
     
-    for h in cls._logger.handlers :
+    for h in cls._handlers() :
+      h.setLevel(cls._logger.logLevel)
+
+  @classmethod
+  def setWarningLevel(cls) :
+    cls._logger.logLevel = logging.WARNING
+    cls._logger.setLevel(logging.WARNING)
+
+    for h in cls._handlers() :
       h.setLevel(cls._logger.logLevel)
 
   @classmethod
@@ -70,24 +225,64 @@ class ToolboxLogger :
     cls._logger.setLevel(logging.DEBUG)
     cls.info("Level: DEBUG")
 
-    for h in cls._logger.handlers :
+    for h in cls._handlers() :
       h.setLevel(cls._logger.logLevel)
 
   @classmethod
-  def debug(cls, message) :
-    cls._logger.debug("%s", "{}{}".format(cls.indent, message))
+  def startQueue(cls) :
+    if cls._listener is not None :
+      return
+    targets = list(cls._logger.handlers)
+    log_queue = queue.SimpleQueue()
+    for h in targets :
+      cls._logger.removeHandler(h)
+    cls._logger.addHandler(DeferredQueueHandler(log_queue))
+    cls._listener = handlers.QueueListener(log_queue, *targets, respect_handler_level = True)
+    cls._listener.start()
+
+  @classmethod
+  def stopQueue(cls) :
+    if cls._listener is None :
+      return
+    listener = cls._listener
+    cls._listener = None
+    listener.stop()
+    for h in list(cls._logger.handlers) :
+      if isinstance(h, DeferredQueueHandler) :
+        cls._logger.removeHandler(h)
+    for h in listener.handlers :
+      cls._logger.addHandler(h)
+
+  @classmethod
+  def isDebugEnabled(cls) :
+    return cls._logger.isEnabledFor(logging.DEBUG)
+
+  @classmethod
+  def debug(cls, message, *args) :
+    if cls._logger.isEnabledFor(logging.DEBUG) :
+      cls._logger.debug("%s", LazyMessage("", cls._indent.get(), message, args))
 
   @classmethod
-  def info(cls, message) :
-    cls._logger.info("%s", "{}{}".format(cls.indent, message))
+  def info(cls, message, *args) :
+    if cls._logger.isEnabledFor(logging.INFO) :
+      cls._logger.info("%s", LazyMessage("", cls._indent.get(), message, args))
 
   @classmethod
-  def error(cls, message) :
-    cls._logger.error("%s", "ERROR! {}{}".format(cls.indent, message))
+  def error(cls, message, *args) :
+    cls._logger.error("%s", LazyMessage("ERROR! ", cls._indent.get(), message, args))
 
   @classmethod
-  def warning(cls, message) :
-    cls._logger.warning("%s", "WARNING! {}{}".format(cls.indent, message))
+  def warning(cls, message, *args) :
+    cls._logger.warning("%s", LazyMessage("WARNING! ", cls._indent.get(), message, args))
+
+class QueuedLoggingHook :
+
+  def start(self, tool) :
+    if getattr(tool, "LOG_QUEUE_ENABLED", False) :
+      ToolboxLogger.startQueue()
+
+  def finish(self, tool) :
+    ToolboxLogger.stopQueue()
 
 
 if WINDOWS:
@@ -239,3 +434,41 @@ class TimeUtil :
   @staticmethod
   def nowCode() :
     return datetime.now().strftime("%Y%m%d%H%M%S")
+
+class ToolRunHooks :
+
+  _hooks = []
+  _depth = 0
+
+  @classmethod
+  def register(cls, hook) :
+    if not any(type(h) == type(hook) for h in cls._hooks) :
+      cls._hooks.append(hook)
+
+  @classmethod
+  def run(cls, func) :
+
+    @functools.wraps(func)
+    def inner(self, *args, **kwargs) :
+      tool = getattr(self, "tool", None) or self
+      cls._depth += 1
+      outermost = cls._depth == 1
+      started = []
+      try :
+        if outermost :
+          for hook in cls._hooks :
+            try :
+              hook.start(tool)
+              started.append(hook)
+            except Exception as e :
+              ToolboxLogger.debug("Run hook '{}' failed to start: {}".format(type(hook).__name__, e))
+        return func(self, *args, **kwargs)
+      finally :
+        cls._depth -= 1
+        for hook in reversed(started) :
+          try :
+            hook.finish(tool)
+          except Exception as e :
+            ToolboxLogger.debug("Run hook '{}' failed to finish: {}".format(type(hook).__name__, e))
+
+    return inner
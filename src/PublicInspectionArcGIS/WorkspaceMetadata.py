@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import os
+import datetime
+
+try :
+    import arcpy
+except ImportError :
+    arcpy = None
+
+from PublicInspectionArcGIS.Utils import ToolboxLogger, JsonFile
+
+METADATA_FILE_NAME = "WorkspaceMetadata.json"
+SCHEMA_TABLE_NAME = "a00000004.gdbtable"
+TYPE_TAG = "__type__"
+TAGGED_TYPES = {t.__name__: t for t in (datetime.datetime, datetime.date, datetime.time)}
+
+class WorkspaceMetadata :
+    """Catalog, field list, OID field and domain defaults of a workspace, persisted per schema modification time."""
+
+    _workspaces = {}
+
+    def __init__(self, workspace_path, stamp, catalog = None, tables = None) :
+        self.workspace_path = workspace_path
+        self.stamp = stamp
+        self.catalog = catalog if catalog is not None else {}
+        self.tables = tables if tables is not None else {}
+
+    @staticmethod
+    def key(workspace_path) :
+        return os.path.normcase(os.path.abspath(workspace_path))
+
+    @staticmethod
+    def metadataPath(workspace_path) :
+        return os.path.join(os.path.dirname(os.path.abspath(workspace_path)), METADATA_FILE_NAME)
+
+    @staticmethod
+    def schemaStamp(workspace_path) :
+        schema_table = os.path.join(workspace_path, SCHEMA_TABLE_NAME)
+        path = schema_table if os.path.exists(schema_table) else workspace_path
+        return os.path.getmtime(path) if os.path.exists(path) else None
+
+    @staticmethod
+    def readRecords(workspace_path) :
+        records = JsonFile.readFile(WorkspaceMetadata.metadataPath(workspace_path))
+        return records if isinstance(records, dict) else {}
+
+    @classmethod
+    def get(cls, workspace_path) :
+        key = cls.key(workspace_path)
+        stamp = cls.schemaStamp(workspace_path)
+
+        metadata = cls._workspaces.get(key)
+        if metadata is not None and metadata.stamp == stamp :
+            return metadata
+
+        record = cls.readRecords(workspace_path).get(key)
+        if record is not None and record.get("stamp") == stamp :
+            ToolboxLogger.debug("Workspace metadata loaded: {}".format(workspace_path))
+            metadata = cls(workspace_path, stamp, record.get("catalog"), cls.decodeTables(record.get("tables")))
+        else :
+            metadata = cls(workspace_path, stamp)
+            metadata.populateCatalog(workspace_path)
+            metadata.save()
+
+        cls._workspaces[key] = metadata
+        return metadata
+
+    @classmethod
+    def invalidate(cls, workspace_path) :
+        key = cls.key(workspace_path)
+        cls._workspaces.pop(key, None)
+
+        records = cls.readRecords(workspace_path)
+        if records.pop(key, None) is not None :
+            JsonFile.writeFile(cls.metadataPath(workspace_path), records)
+        ToolboxLogger.debug("Workspace metadata invalidated: {}".format(workspace_path))
+
+    def populateCatalog(self, workspace) :
+        for d in arcpy.Describe(workspace).children :
+            if d.datatype == "FeatureDataset" :
+                self.populateCatalog(d.catalogPath)
+            else :
+                self.catalog.setdefault(d.name, d.catalogPath)
+
+    def findTablePath(self, name) :
+        if name not in self.catalog :
+            self.catalog = {}
+            self.populateCatalog(self.workspace_path)
+            self.save()
+        return self.catalog[name]
+
+    @staticmethod
+    def encodeValue(value) :
+        """JSON form of a domain default: dates and times are tagged with their type; other values that JSON
+        cannot hold return None."""
+        if type(value) in TAGGED_TYPES.values() :
+            return {TYPE_TAG: type(value).__name__, "value": value.isoformat()}
+        if value is None or isinstance(value, (str, int, float, bool)) :
+            return value
+        return None
+
+    @staticmethod
+    def decodeValue(value) :
+        if isinstance(value, dict) and value.get(TYPE_TAG) in TAGGED_TYPES :
+            return TAGGED_TYPES[value[TYPE_TAG]].fromisoformat(value["value"])
+        return value
+
+    @classmethod
+    def encodeTables(cls, tables) :
+        """Tables whose domain defaults cannot be encoded are left out and read again from the schema next run."""
+        encoded = {}
+        for table_path, info in tables.items() :
+            defaults = [[name, cls.encodeValue(value)] for name, value in info["domain_defaults"]]
+            if all(encoded_value is not None for name, encoded_value in defaults) :
+                encoded[table_path] = dict(info, domain_defaults=defaults)
+        return encoded
+
+    @classmethod
+    def decodeTables(cls, tables) :
+        if tables is None :
+            return None
+        return {table_path: dict(info, domain_defaults=[[name, cls.decodeValue(value)] for name, value in info["domain_defaults"]])
+            for table_path, info in tables.items()}
+
+    def tableInfo(self, table_path) :
+        info = self.tables.get(table_path)
+        if info is None :
+            fields = arcpy.ListFields(table_path)
+            oid_fields = [f.name for f in fields if f.type == "OID"]
+            info = {
+                "fields": [[f.name, f.type] for f in fields],
+                "oid_field": oid_fields[0] if oid_fields else None,
+                "domain_defaults": [[f.name, f.defaultValue] for f in fields if f.domain != '' and f.defaultValue not in ('', None)]
+            }
+            self.tables[table_path] = info
+            self.save()
+        return info
+
+    def fieldTypes(self, table_path) :
+        return {name.lower(): type for name, type in self.tableInfo(table_path)["fields"]}
+
+    def oidField(self, table_path) :
+        return self.tableInfo(table_path)["oid_field"]
+
+    def domainDefaults(self, table_path) :
+        return self.tableInfo(table_path)["domain_defaults"]
+
+    def save(self) :
+        records = self.readRecords(self.workspace_path)
+        records[self.key(self.workspace_path)] = {"stamp": self.stamp, "catalog": self.catalog, "tables": self.encodeTables(self.tables)}
+        try :
+            JsonFile.writeFile(self.metadataPath(self.workspace_path), records)
+        except OSError as e :
+            ToolboxLogger.debug("Workspace metadata not saved: {}".format(e))
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from PublicInspectionArcGIS.Utils import STREAM_HANDLER, ToolboxLogger
+
+@pytest.fixture(scope="session", autouse=True)
+def logger() :
+    ToolboxLogger.initLogger(handler_type=STREAM_HANDLER)
+    ToolboxLogger.setInfoLevel()
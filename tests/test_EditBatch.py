@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from PublicInspectionArcGIS.SqliteDataAccess import SqliteDataAccess
+
+@pytest.fixture
+def da(tmp_path) :
+    da = SqliteDataAccess(str(tmp_path / "batch.sqlite"))
+    da.createTable("Boundary", [("description", "TEXT"), ("state", "TEXT")])
+    da.createTable("SpatialUnit_Boundary", [("spatialunit_id", "GUID"), ("boundary_id", "GUID")])
+    yield da
+    da.close()
+
+def descriptions(da) :
+    return sorted(row["description"] for row in da.search("Boundary", ["description"]))
+
+def test_flush_inserts_and_returns_registers(da) :
+    with da.batch() as batch :
+        batch.insert("Boundary", ["description"], [("a",), ("b",)])
+        batch.insert("Boundary", ["description"], [("c",)])
+        assert len(batch) == 3
+        boundaries = batch.flush()["Boundary"]
+        assert len(batch) == 0
+        assert [b["description"] for b in boundaries] == ["a", "b", "c"]
+        assert all(b["GlobalID"] for b in boundaries)
+
+        batch.insert("SpatialUnit_Boundary", ["spatialunit_id", "boundary_id"], [("su", b["GlobalID"]) for b in boundaries])
+
+    links = da.search("SpatialUnit_Boundary", ["boundary_id"])
+    assert sorted(link["boundary_id"] for link in links) == sorted(b["GlobalID"] for b in boundaries)
+
+def test_updates_and_deletes_apply_in_queued_order(da) :
+    da.insert("Boundary", ["description", "state"], [("a", "new"), ("b", "new"), ("c", "new")])
+    with da.batch() as batch :
+        batch.update("Boundary", ["state"], ["done"], "description = 'a'")
+        batch.delete("Boundary", "state = 'done'")
+        batch.update("Boundary", ["state"], ["done"], "description = 'b'")
+
+    rows = da.search("Boundary", ["description", "state"])
+    assert [(row["description"], row["state"]) for row in rows] == [("b", "done"), ("c", "new")]
+
+def test_unflushed_edits_are_applied_on_exit(da) :
+    with da.batch() as batch :
+        batch.insert("Boundary", ["description"], [("a",)])
+        assert descriptions(da) == []
+    assert descriptions(da) == ["a"]
+
+def test_exception_rolls_back_flushed_edits(da) :
+    with pytest.raises(RuntimeError) :
+        with da.batch() as batch :
+            batch.insert("Boundary", ["description"], [("a",)])
+            batch.flush()
+            assert descriptions(da) == ["a"]
+            raise RuntimeError("abort")
+    assert descriptions(da) == []
+    assert da._edit_depth == 0
+
+def test_nested_batches_commit_with_the_outer_session(da) :
+    with da.batch() as outer :
+        outer.insert("Boundary", ["description"], [("outer",)])
+        with da.batch() as inner :
+            inner.insert("Boundary", ["description"], [("inner",)])
+        assert da._edit_depth == 1
+    assert descriptions(da) == ["inner", "outer"]
+    assert da._edit_depth == 0
+
+def test_failed_inner_batch_rolls_back_the_outer_session(da) :
+    da.insert("Boundary", ["description"], [("kept",)])
+    with da.batch() as outer :
+        outer.insert("Boundary", ["description"], [("outer",)])
+        outer.flush()
+        with pytest.raises(RuntimeError) :
+            with da.batch() as inner :
+                inner.insert("Boundary", ["description"], [("inner",)])
+                raise RuntimeError("abort")
+    assert descriptions(da) == ["kept"]
+    assert da._edit_depth == 0
+
+def test_failing_statement_rolls_back_the_whole_flush(da) :
+    with pytest.raises(Exception) :
+        with da.batch() as batch :
+            batch.insert("Boundary", ["description"], [("a",)])
+            batch.insert("Boundary", ["missing_field"], [("b",)])
+    assert descriptions(da) == []
+    assert da._edit_depth == 0
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from PublicInspectionArcGIS.SpatialIndex import SpatialIndex
+
+def grid(count, size = 10.0, gap = 0.0) :
+    return [(column * (size + gap), row * (size + gap), column * (size + gap) + size, row * (size + gap) + size)
+        for row in range(count) for column in range(count)]
+
+def test_neighbors_of_touching_cells() :
+    index = SpatialIndex(grid(3))
+    assert index.neighbors(4) == [0, 1, 2, 3, 5, 6, 7, 8]
+    assert index.neighbors(0) == [1, 3, 4]
+
+def test_neighbors_exclude_self_and_distant_extents() :
+    index = SpatialIndex([(0, 0, 1, 1), (100, 100, 101, 101)])
+    assert index.neighbors(0) == []
+    assert index.neighbors(1) == []
+
+def test_gap_equal_to_tolerance_is_a_neighbor() :
+    index = SpatialIndex(grid(2, gap = 2.0))
+    assert index.neighbors(0, 1.0) == []
+    assert index.neighbors(0, 2.0) == [1, 2, 3]
+
+def test_gap_just_beyond_tolerance_is_not_a_neighbor() :
+    index = SpatialIndex(grid(2, gap = 2.0))
+    assert index.neighbors(0, 1.999) == []
+    assert index.neighbors(0, 2.001) == [1, 2, 3]
+
+def test_tolerance_reaches_across_cells() :
+    index = SpatialIndex([(0, 0, 1, 1), (50, 0, 51, 1)], cell_size = 1.0)
+    assert index.neighbors(0, 48.0) == []
+    assert index.neighbors(0, 49.0) == [1]
+
+def test_query_with_negative_coordinates() :
+    index = SpatialIndex([(-20, -20, -10, -10), (-10, -10, 0, 0), (5, 5, 6, 6)])
+    assert index.query((-15, -15, -14, -14)) == [0]
+    assert index.query((-10, -10, -10, -10)) == [0, 1]
+    assert index.query((-1, -1, 4, 4), 1.0) == [1, 2]
+
+def test_query_degenerate_extents() :
+    index = SpatialIndex([(0, 0, 0, 0), (3, 3, 3, 3)])
+    assert index.cell_size == 1.0
+    assert index.query((0, 0, 0, 0)) == [0]
+    assert index.query((1, 1, 2, 2), 1.0) == [0, 1]
+
+def test_large_extent_spanning_many_cells() :
+    extents = grid(4) + [(0, 0, 40, 40)]
+    index = SpatialIndex(extents)
+    assert index.neighbors(16) == list(range(16))
+    assert 16 in index.neighbors(5)
+
+def test_query_results_are_sorted_and_unique() :
+    index = SpatialIndex(grid(5), cell_size = 3.0)
+    keys = index.query((0, 0, 50, 50))
+    assert keys == sorted(set(keys)) == list(range(25))
+
+def test_partition_covers_every_key_once() :
+    index = SpatialIndex(grid(6))
+    tiles = index.partition(4)
+    assert len(tiles) == 4
+    assert sorted(key for tile in tiles for key in tile) == list(range(36))
+    assert SpatialIndex([]).partition(4) == []